@@ -0,0 +1,118 @@
+# === admission.py - 音頻處理的併發上限與負載卸除 ===
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+
+class StageBusy(Exception):
+    """等待階段名額逾時"""
+
+
+class AdmissionController:
+    """控制同時處理的音頻訊息數量，並為解碼 / STT / 聲紋嵌入各階段設置名額"""
+
+    def __init__(self, max_in_flight=4, max_queue=8, queue_timeout=5,
+                 max_rss_mb=450, stage_limits=None, stage_timeout=15):
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_rss_mb = max_rss_mb
+        self.stage_timeout = stage_timeout
+        self.slots = threading.BoundedSemaphore(max_in_flight)
+        self.stages = {
+            name: threading.BoundedSemaphore(limit)
+            for name, limit in (stage_limits or {"decode": 2, "stt": 4, "embedding": 1}).items()
+        }
+        self.lock = threading.Lock()
+        self.waiting = 0
+        self.in_flight = 0
+        self.counters = {"admitted": 0, "queued": 0, "shed_queue_full": 0,
+                         "shed_timeout": 0, "shed_memory": 0, "stage_timeout": 0}
+        self._rss_checked_at = 0
+        self._rss_mb = 0
+
+    def _count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def rss_mb(self):
+        """目前行程 RSS（每秒最多查詢一次）"""
+        now = time.monotonic()
+        if now - self._rss_checked_at > 1:
+            try:
+                self._rss_mb = psutil.Process(os.getpid()).memory_info().rss / 1024 / 1024
+            except Exception as e:
+                logger.warning(f"RSS check failed: {e}")
+            self._rss_checked_at = now
+        return self._rss_mb
+
+    def try_admit(self):
+        """嘗試取得處理名額；回傳 False 表示應回覆「忙碌中」"""
+        rss = self.rss_mb()
+        if rss > self.max_rss_mb:
+            self._count("shed_memory")
+            logger.warning(f"⚠️ Shedding audio work, RSS {rss:.1f}MB > {self.max_rss_mb}MB")
+            return False
+
+        if not self.slots.acquire(blocking=False):
+            with self.lock:
+                if self.waiting >= self.max_queue:
+                    self.counters["shed_queue_full"] += 1
+                    logger.warning("⚠️ Shedding audio work, queue full")
+                    return False
+                self.waiting += 1
+                self.counters["queued"] += 1
+            try:
+                acquired = self.slots.acquire(timeout=self.queue_timeout)
+            finally:
+                with self.lock:
+                    self.waiting -= 1
+            if not acquired:
+                self._count("shed_timeout")
+                logger.warning("⚠️ Shedding audio work, queue wait timed out")
+                return False
+
+        with self.lock:
+            self.in_flight += 1
+            self.counters["admitted"] += 1
+        return True
+
+    def release(self):
+        with self.lock:
+            self.in_flight -= 1
+        self.slots.release()
+
+    @contextmanager
+    def stage(self, name):
+        """限制單一階段的併發數；逾時拋出 StageBusy"""
+        semaphore = self.stages[name]
+        if not semaphore.acquire(timeout=self.stage_timeout):
+            self._count("stage_timeout")
+            raise StageBusy(f"Stage '{name}' is busy")
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+    def status(self):
+        with self.lock:
+            return dict(self.counters, in_flight=self.in_flight, waiting=self.waiting,
+                        rss_mb=round(self._rss_mb, 1), max_rss_mb=self.max_rss_mb)
+
+
+# 全局控制器實例
+admission = AdmissionController(
+    max_in_flight=int(os.environ.get('ADMISSION_MAX_IN_FLIGHT', 4)),
+    max_queue=int(os.environ.get('ADMISSION_MAX_QUEUE', 8)),
+    max_rss_mb=float(os.environ.get('ADMISSION_MAX_RSS_MB', 450)),
+    stage_limits={
+        "decode": int(os.environ.get('ADMISSION_DECODE_LIMIT', 2)),
+        "stt": int(os.environ.get('ADMISSION_STT_LIMIT', 4)),
+        "embedding": int(os.environ.get('ADMISSION_EMBEDDING_LIMIT', 1)),
+    }
+)
@@ -0,0 +1,416 @@
+# === asgi.py - 非同步 webhook 伺服器模式 ===
+# 用法：uvicorn asgi:app --workers 2（或 gunicorn -k uvicorn.workers.UvicornWorker asgi:app）
+# 與 Flask 模式提供相同的 POST /callback（簽章錯誤回 400、重複事件略過），驗證後立即回應 200，
+# 事件在事件迴圈中以 task 處理：音頻下載與回覆走 aiohttp，Google STT 用 SpeechAsyncClient，
+# 使用者狀態以 Firestore AsyncClient 預先載入，封存用的 GCS 上傳以 JSON API 非同步送出；
+# 解碼（ffmpeg）與 SpeechBrain 嵌入交給 CPU 執行緒池，其餘同步後端與文字訊息處理交給 I/O 執行緒池。
+# 等待外部服務時不佔用執行緒，一個 worker 可同時處理大量學習者的音頻評分。
+import asyncio
+import io
+import json
+import logging
+import os
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+import aiohttp
+from linebot.exceptions import InvalidSignatureError
+from linebot.models import AudioMessage, MessageEvent, TextSendMessage
+
+import thai_learning as bot
+from lazy import Lazy, lazy_import
+from metrics import counter, render_prometheus, timed
+from reply_templates import request_body
+from scorer_chain import ScoringRequest, scorer_chain
+from user_store import FirestoreUserStore
+
+logger = logging.getLogger(__name__)
+
+speech = lazy_import("google.cloud.speech")
+
+MAX_IN_FLIGHT = int(os.environ.get('ASGI_MAX_IN_FLIGHT', 200))
+STT_LIMIT = int(os.environ.get('ASGI_STT_LIMIT', 50))
+CPU_BACKENDS = {"speechbrain"}  # 在 CPU 執行緒池執行的同步評分後端
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+io_pool = ThreadPoolExecutor(int(os.environ.get('ASGI_IO_THREADS', 16)), thread_name_prefix="asgi-io")
+# ffmpeg 在子行程執行、torch 推論時釋放 GIL，執行緒池即可平行處理
+cpu_pool = ThreadPoolExecutor(int(os.environ.get('ASGI_CPU_THREADS', os.cpu_count() or 2)), thread_name_prefix="asgi-cpu")
+
+asgi_events = counter(
+    "asgi_events_total",
+    "Webhook events handled by the ASGI server",
+    label_names=("kind", "outcome"),
+)
+
+
+async def run_in(pool, fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+
+
+# === HTTP（aiohttp） ===
+class RetryingSession:
+    """aiohttp 連線池；429 / 5xx 或連線失敗時依 Retry-After 或指數退避重試（與 line_client.PooledHttpClient 相同策略）"""
+
+    def __init__(self, headers=None, retries=3, backoff=0.5, timeout=30):
+        self.headers = headers or {}
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.session = None
+
+    async def request(self, method, url, single_use=False, **kwargs):
+        """回傳回應內容；最後一次仍失敗或 4xx 時拋出 ClientResponseError。
+        single_use（回覆權杖只能使用一次）時只在連線建立失敗、請求尚未送出時重試"""
+        if self.session is None:
+            self.session = aiohttp.ClientSession(headers=self.headers, timeout=self.timeout)
+        for attempt in range(self.retries + 1):
+            retry_after = None
+            try:
+                async with self.session.request(method, url, **kwargs) as response:
+                    if single_use or response.status not in RETRY_STATUSES or attempt == self.retries:
+                        body = await response.read()
+                        if response.status >= 400:
+                            raise aiohttp.ClientResponseError(
+                                response.request_info, (), status=response.status, message=body.decode(errors="replace")
+                            )
+                        return body
+                    retry_after = response.headers.get("Retry-After")
+            except aiohttp.ClientConnectorError:
+                if attempt == self.retries:
+                    raise
+            await asyncio.sleep(float(retry_after) if retry_after else self.backoff * 2 ** attempt)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+
+
+class AsyncLineClient:
+    """下載音頻內容與回覆訊息"""
+
+    def __init__(self, token, endpoint, data_endpoint):
+        self.http = RetryingSession(headers={"Authorization": f"Bearer {token}"})
+        self.endpoint = endpoint
+        self.data_endpoint = data_endpoint
+
+    async def get_content(self, message_id):
+        with timed("line_content_download"):
+            return await self.http.request("GET", f"{self.data_endpoint}/v2/bot/message/{message_id}/content")
+
+    async def reply(self, reply_token, messages):
+        with timed("line_reply"):
+            await self.http.request(
+                "POST", f"{self.endpoint}/v2/bot/message/reply", single_use=True,
+                data=request_body(messages, replyToken=reply_token), headers={"Content-Type": "application/json"},
+            )
+
+
+line = AsyncLineClient(bot.LINE_CHANNEL_ACCESS_TOKEN, bot.LINE_API_ENDPOINT, bot.LINE_API_DATA_ENDPOINT)
+
+
+# === Google Cloud 非同步用戶端 ===
+def init_async_speech_client():
+    bot.google_speech_client.load()  # 設定 GOOGLE_APPLICATION_CREDENTIALS
+    return speech.SpeechAsyncClient()
+
+
+def init_async_firestore():
+    from firebase_admin import get_app
+    from google.cloud import firestore
+
+    bot.db.load()  # 初始化 Firebase app
+    app = get_app()
+    return firestore.AsyncClient(project=app.project_id, credentials=app.credential.get_credential())
+
+
+async_speech_client = Lazy("google_speech_async", init_async_speech_client)
+async_db = Lazy("firestore_async", init_async_firestore)
+
+
+class AsyncGcsUploader:
+    """以 GCS JSON API 上傳（公開讀取），存取權杖沿用同步 storage.Client 的憑證並在到期前更新"""
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.http = RetryingSession()
+        self.credentials = None
+        self.lock = asyncio.Lock()
+
+    def _refresh(self):
+        from google.auth.transport.requests import Request
+
+        if self.credentials is None:
+            self.credentials = bot.gcs_client.load()._credentials
+        if not self.credentials.valid:
+            self.credentials.refresh(Request())
+        return self.credentials.token
+
+    async def upload(self, data, name, content_type):
+        async with self.lock:
+            token = await run_in(io_pool, self._refresh)
+        url = (f"https://storage.googleapis.com/upload/storage/v1/b/{self.bucket}/o"
+               f"?uploadType=media&predefinedAcl=publicRead&name={quote(name, safe='')}")
+        with timed("gcs_upload"):
+            await self.http.request("POST", url, data=data, headers={
+                "Authorization": f"Bearer {token}", "Content-Type": content_type
+            })
+        return f"https://storage.googleapis.com/{self.bucket}/{name}"
+
+
+gcs = AsyncGcsUploader(bot.GCS_BUCKET_NAME)
+
+
+# === 評分 ===
+stt_slots = asyncio.Semaphore(STT_LIMIT)  # 同時送出的 STT 請求上限
+
+
+async def score_google_stt_async(scoring_request):
+    """評分鏈 google_stt 後端的非同步版本：PCM 直接內嵌於請求，不需先上傳 GCS"""
+    if not scoring_request.pcm:
+        return None
+    config = speech.RecognitionConfig(
+        encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+        sample_rate_hertz=16000,
+        language_code="th-TH"
+    )
+    async with stt_slots:
+        with timed("google_stt"):
+            response = await async_speech_client.load().recognize(
+                config=config, audio=speech.RecognitionAudio(content=scoring_request.pcm)
+            )
+    if not response.results:
+        logger.warning("Unable to recognize speech content")
+        return None
+    recognized_text = response.results[0].alternatives[0].transcript
+    logger.info(f"Recognized text: {recognized_text}")
+    return bot.text_similarity_result(recognized_text, scoring_request.reference_text)
+
+
+ASYNC_BACKENDS = {"google_stt": score_google_stt_async}
+
+
+async def run_backend(name, fn, scoring_request):
+    return await run_in(cpu_pool if name in CPU_BACKENDS else io_pool, fn, scoring_request)
+
+
+def decode(audio_content, user_id):
+    """解碼為 WAV 暫存檔並讀出檔案內容與 PCM（在 CPU 執行緒池執行）"""
+    audio_id, wav_path = bot.decode_audio_content(audio_content, user_id)
+    if not wav_path:
+        return audio_id, None, None, None
+    with open(wav_path, "rb") as f:
+        data = f.read()
+    with wave.open(io.BytesIO(data), "rb") as wav_file:
+        pcm = wav_file.readframes(wav_file.getnframes())
+    return audio_id, wav_path, data, pcm
+
+
+background = set()  # 封存上傳等背景 task，保留參照避免被回收
+
+
+def spawn(coro):
+    task = asyncio.get_running_loop().create_task(coro)
+    background.add(task)
+    task.add_done_callback(background.discard)
+    return task
+
+
+async def archive_audio(data, audio_id):
+    try:
+        await gcs.upload(data, f"user_audio/{audio_id}.wav", "audio/wav")
+    except Exception as e:
+        logger.error(f"Error uploading file to GCS: {str(e)}")
+
+
+async def score_audio(event, reference_text, ref_audio_url):
+    """與 score_user_audio 相同的評分流程，回傳 process_audio_message 使用的 (參考文本, result, audio_ok)"""
+    started = time.perf_counter()
+    user_id = event.source.user_id
+    try:
+        audio_content = await line.get_content(event.message.id)
+        audio_id, wav_path, data, pcm = await run_in(cpu_pool, decode, audio_content, user_id)
+    except Exception as e:
+        logger.error(f"Audio processing error: {str(e)}")
+        wav_path = None
+    if not wav_path:
+        bot.pronunciation_results.inc(backend="none", outcome="audio_error")
+        return reference_text, None, False
+
+    spawn(archive_audio(data, audio_id))
+    try:
+        result = await scorer_chain.score_async(
+            ScoringRequest(reference_text, audio_file_path=wav_path, ref_audio_url=ref_audio_url, pcm=pcm),
+            ASYNC_BACKENDS,
+            run_backend
+        )
+    finally:
+        try:
+            os.remove(wav_path)
+        except OSError:
+            pass
+
+    bot.time_to_feedback.observe(time.perf_counter() - started, path="asgi")
+    if result:
+        bot.pronunciation_results.inc(backend=result["backend"], outcome="correct" if result["is_correct"] else "incorrect")
+    else:
+        bot.pronunciation_results.inc(backend="simulated", outcome="all_backends_failed")
+    return reference_text, result, True
+
+
+# === 事件處理 ===
+in_flight = 0
+
+
+async def prefetch_user(user_id):
+    """使用者不在記憶體中時先以非同步用戶端載入，之後的同步處理不會阻塞在 Firestore 讀取"""
+    manager = bot.user_data_manager
+    if manager.is_resident(user_id):
+        return
+    if not isinstance(manager.store, FirestoreUserStore):
+        await run_in(io_pool, manager.get_user_data, user_id)
+        return
+    try:
+        stored = await manager.store.load_async(async_db.load(), user_id)
+        loaded = (manager.merge_pending(user_id, stored), False)
+    except Exception as e:
+        logger.error(f"Failed to load user data for {user_id}: {e}")
+        loaded = (None, True)
+    manager.get_user_data(user_id, loaded=loaded)
+
+
+def finish_audio(event, scored):
+    """評分完成後的回饋、考試進度與訊息（同步邏輯與 Flask 模式共用）"""
+    with bot.line_bot_api.coalescing():
+        bot.process_audio_message(event, scored)
+
+
+async def handle_audio(event):
+    global in_flight
+    user_id = event.source.user_id
+    if in_flight >= MAX_IN_FLIGHT:
+        logger.warning(f"Audio message from user {user_id} shed by ASGI admission control")
+        asgi_events.inc(kind="audio", outcome="shed")
+        await line.reply(event.reply_token, [
+            TextSendMessage(text="⏳ Many learners are practicing right now. Please try again in a moment.")
+        ])
+        return
+
+    in_flight += 1
+    hold = None
+    try:
+        await prefetch_user(user_id)
+        reference = bot.audio_reference(user_id)
+        scored = None
+        if reference is not None:
+            if user_id in bot.exam_sessions:
+                # 考試模式：評分期間即保留回覆權杖，超過預算時先回覆「評分中」
+                hold = bot.reply_scheduler.hold(event.reply_token, user_id, bot.EXAM_INTERIM_MESSAGE).acquire()
+            scored = await score_audio(event, *reference)
+        await run_in(io_pool, finish_audio, event, scored)
+        asgi_events.inc(kind="audio", outcome="ok")
+    finally:
+        in_flight -= 1
+        if hold is not None:
+            # 最外層：送出 process_audio_message 累積的結果（回覆為阻塞呼叫，交給執行緒池）
+            await run_in(io_pool, hold.release)
+
+
+def dispatch(event):
+    """依 WebhookHandler 註冊的處理函式分派單一事件（鍵的格式與 line-bot-sdk 相同）"""
+    handlers = bot.handler._handlers
+    func = None
+    if isinstance(event, MessageEvent):
+        func = handlers.get(f"{type(event).__name__}_{type(event.message).__name__}")
+    if func is None:
+        func = handlers.get(type(event).__name__, bot.handler._default)
+    if func is not None:
+        func(event)
+
+
+async def handle_event(event):
+    kind = "audio" if isinstance(event, MessageEvent) and isinstance(event.message, AudioMessage) else "other"
+    try:
+        if kind == "audio":
+            await handle_audio(event)
+        else:
+            await run_in(io_pool, dispatch, event)
+            asgi_events.inc(kind=kind, outcome="ok")
+    except Exception as e:
+        asgi_events.inc(kind=kind, outcome="error")
+        logger.error(f"Error handling {type(event).__name__}: {str(e)}", exc_info=True)
+
+
+# === ASGI 應用程式 ===
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def respond(send, status, body, content_type=b"text/plain; charset=utf-8"):
+    if isinstance(body, str):
+        body = body.encode()
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", content_type), (b"content-length", str(len(body)).encode())]})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def callback(scope, receive, send):
+    with timed("callback"):
+        body = (await read_body(receive)).decode("utf-8")
+        signature = dict(scope["headers"]).get(b"x-line-signature", b"").decode()
+        try:
+            events = bot.handler.parser.parse(body, signature)
+            duplicate = bot.is_duplicate_event(json.loads(body))
+        except InvalidSignatureError as e:
+            logger.error(f"Signature verification failed: {str(e)}")
+            return await respond(send, 400, "Bad Request")
+        except Exception as e:
+            logger.error(f"Unknown error occurred while processing callback: {str(e)}")
+            return await respond(send, 500, "Internal Server Error")
+        if not duplicate:
+            for event in events:
+                spawn(handle_event(event))
+        await respond(send, 200, "OK")
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            # 等待處理中的事件（回覆權杖仍有效時送出結果）
+            if background:
+                await asyncio.wait(list(background), timeout=float(os.environ.get('ASGI_SHUTDOWN_TIMEOUT', 20)))
+            await line.http.close()
+            await gcs.http.close()
+            io_pool.shutdown(wait=False)
+            cpu_pool.shutdown(wait=False)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+    if scope["type"] != "http":
+        return
+    route = (scope["method"], scope["path"])
+    if route == ("POST", "/callback"):
+        return await callback(scope, receive, send)
+    if route == ("GET", "/metrics"):
+        return await respond(send, 200, render_prometheus(), b"text/plain; version=0.0.4")
+    if route == ("GET", "/status/asgi"):
+        return await respond(send, 200, json.dumps({
+            "in_flight": in_flight,
+            "background_tasks": len(background),
+            "init": bot.init_status(),
+        }), b"application/json")
+    await respond(send, 404, "Not Found")
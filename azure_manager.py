@@ -0,0 +1,202 @@
+# === azure_manager.py - Azure 發音評估工作階段 ===
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from lazy import lazy_import
+from metrics import histogram
+
+logger = logging.getLogger(__name__)
+
+# Azure Speech SDK 匯入約需一秒，延到第一次建立設定時
+speechsdk = lazy_import("azure.cognitiveservices.speech")
+
+azure_latency = histogram(
+    "azure_assessment_latency_seconds",
+    "Latency of Azure pronunciation assessment (recognizer creation to result)",
+    label_names=("outcome",),
+)
+
+
+class AzurePronunciationManager:
+    """重複使用 SpeechConfig 與各參考文本的評估設定，以 push stream 從記憶體送入 PCM"""
+
+    def __init__(self, speech_key, speech_region, language="th-TH", max_concurrency=4, max_configs=256):
+        self.speech_key = speech_key
+        self.speech_region = speech_region
+        self.language = language
+        self.max_configs = max_configs
+        self.speech_config = None
+        self.assessment_configs = OrderedDict()  # reference_text -> PronunciationAssessmentConfig
+        self.lock = threading.RLock()
+        self.semaphore = threading.BoundedSemaphore(max_concurrency)
+        self.acquire_timeout = 10  # 秒
+        self.stream_format = None
+
+    def is_configured(self):
+        return bool(self.speech_key) and self.speech_key != 'YOUR_AZURE_SPEECH_KEY'
+
+    def get_speech_config(self):
+        """SpeechConfig 只建立一次（連同 push stream 的音訊格式）"""
+        with self.lock:
+            if self.speech_config is None:
+                self.stream_format = speechsdk.audio.AudioStreamFormat(
+                    samples_per_second=16000, bits_per_sample=16, channels=1
+                )
+                self.speech_config = speechsdk.SpeechConfig(subscription=self.speech_key, region=self.speech_region)
+                self.speech_config.speech_recognition_language = self.language
+                logger.info(f"Azure Speech Config created, language: {self.language}")
+            return self.speech_config
+
+    def get_assessment_config(self, reference_text):
+        """依參考文本快取發音評估設定（LRU）"""
+        with self.lock:
+            config = self.assessment_configs.get(reference_text)
+            if config is not None:
+                self.assessment_configs.move_to_end(reference_text)
+                return config
+
+            config = speechsdk.PronunciationAssessmentConfig(
+                reference_text=reference_text,
+                grading_system=speechsdk.PronunciationAssessmentGradingSystem.HundredMark,
+                granularity=speechsdk.PronunciationAssessmentGranularity.FullText,
+                enable_miscue=True
+            )
+            self.assessment_configs[reference_text] = config
+            if len(self.assessment_configs) > self.max_configs:
+                self.assessment_configs.popitem(last=False)
+            return config
+
+    def assess(self, pcm, reference_text):
+        """評估一段 16kHz/16bit/單聲道 PCM；失敗時回傳 {"success": False, ...}"""
+        if not pcm:
+            return {"success": False, "error": "Audio content is empty"}
+        return self.assess_chunks([pcm], reference_text)
+
+    def assess_chunks(self, pcm_chunks, reference_text):
+        """邊接收 PCM 區塊邊送入 push stream（串流模式也使用此入口）"""
+        # 限制同時存在的識別器數量
+        if not self.semaphore.acquire(timeout=self.acquire_timeout):
+            logger.warning("⚠️ Azure recognizer pool busy")
+            return {"success": False, "busy": True, "error": "Azure recognizer pool busy"}
+
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            # 識別器綁定音訊輸入，無法跨請求重複使用；設定物件則共用
+            speech_config = self.get_speech_config()
+            stream = speechsdk.audio.PushAudioInputStream(stream_format=self.stream_format)
+            audio_config = speechsdk.audio.AudioConfig(stream=stream)
+            recognizer = speechsdk.SpeechRecognizer(
+                speech_config=speech_config,
+                audio_config=audio_config
+            )
+            self.get_assessment_config(reference_text).apply_to(recognizer)
+
+            # 先啟動識別，由寫入執行緒陸續送入音訊；識別器判斷語句結束後即回傳，不等待其餘音訊
+            future = recognizer.recognize_once_async()
+            recognized = threading.Event()
+
+            def write():
+                try:
+                    for chunk in pcm_chunks:
+                        if recognized.is_set():
+                            break
+                        stream.write(chunk)
+                except Exception as e:
+                    logger.warning(f"⚠️ Azure push stream writer stopped: {e}")
+                finally:
+                    stream.close()
+
+            threading.Thread(target=write, name="azure-push-stream", daemon=True).start()
+            result = future.get()
+            recognized.set()
+
+            if result.reason == speechsdk.ResultReason.RecognizedSpeech:
+                pronunciation_result = speechsdk.PronunciationAssessmentResult(result)
+                accuracy_score = pronunciation_result.accuracy_score
+                pronunciation_score = pronunciation_result.pronunciation_score
+                completeness_score = pronunciation_result.completeness_score
+                fluency_score = pronunciation_result.fluency_score
+                overall_score = int((accuracy_score + pronunciation_score + completeness_score + fluency_score) / 4)
+
+                outcome = "success"
+                logger.info(f"Azure pronunciation assessment completed. Score: {overall_score}, Recognized text: {result.text}")
+                return {
+                    "success": True,
+                    "recognized_text": result.text,
+                    "reference_text": reference_text,
+                    "overall_score": overall_score,
+                    "accuracy_score": accuracy_score,
+                    "pronunciation_score": pronunciation_score,
+                    "completeness_score": completeness_score,
+                    "fluency_score": fluency_score
+                }
+
+            detail_info = ""
+            if result.reason == speechsdk.ResultReason.Canceled:
+                cancellation = result.cancellation_details
+                detail_info = f"Cancellation reason: {cancellation.reason}"
+                if cancellation.reason == speechsdk.CancellationReason.Error:
+                    detail_info += f", Error details: {cancellation.error_details}"
+            else:
+                outcome = "no_match"
+            logger.warning(f"Azure recognition failed. Reason: {result.reason}, Details: {detail_info or 'No additional information'}")
+            return {
+                "success": False,
+                "no_match": outcome == "no_match",
+                "error": f"Unable to recognize speech. Reason: {result.reason}",
+                "details": detail_info
+            }
+
+        except Exception as e:
+            logger.error(f"❌ Azure pronunciation assessment error: {e}")
+            return {"success": False, "error": str(e)}
+        finally:
+            azure_latency.observe(time.perf_counter() - start, outcome=outcome)
+            self.semaphore.release()
+
+
+# 全局管理器實例
+azure_manager = AzurePronunciationManager(
+    speech_key=os.environ.get('AZURE_SPEECH_KEY', 'YOUR_AZURE_SPEECH_KEY'),
+    speech_region=os.environ.get('AZURE_SPEECH_REGION', 'eastasia'),
+    language=os.environ.get('AZURE_SPEECH_LANGUAGE', 'th-TH'),
+    max_concurrency=int(os.environ.get('AZURE_MAX_CONCURRENCY', 4))
+)
+
+
+def assess_pronunciation(pcm, reference_text):
+    """主要入口函數"""
+    return azure_manager.assess(pcm, reference_text)
+
+
+def score_azure(scoring_request):
+    """評分鏈後端：Azure 發音評估"""
+    from admission import admission
+
+    with admission.stage("stt"):
+        result = azure_manager.assess(scoring_request.pcm, scoring_request.reference_text)
+    return to_chain_result(result)
+
+
+def to_chain_result(result):
+    """將 Azure 評估結果轉換為評分鏈格式；無法識別（NoMatch）屬於使用者音頻問題，回傳 None 而非錯誤；
+    本地識別器名額不足時拋出 StageBusy（不計入熔斷）"""
+    if result.get("no_match"):
+        return None
+    if result.get("busy"):
+        from admission import StageBusy
+        raise StageBusy(result["error"])
+    if not result.get("success"):
+        raise ValueError(result.get("error", "Azure assessment failed"))
+    score = result["overall_score"]
+    return {
+        "score": score,
+        "is_correct": score >= 60,
+        "recognized_text": result["recognized_text"],
+        "similarity": result["accuracy_score"] / 100,
+        "details": result,
+    }
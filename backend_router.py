@@ -0,0 +1,136 @@
+# === backend_router.py - 評分後端熔斷與路由 ===
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def percentile(sorted_values, fraction):
+    """已排序數列的百分位數（最近排名法）"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class CircuitBreaker:
+    """單一後端的熔斷器：以滾動視窗統計延遲與錯誤率"""
+
+    def __init__(self, name, window_seconds=60, max_samples=200, min_calls=5,
+                 error_rate_threshold=0.5, slow_call_seconds=10, open_seconds=30):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.error_rate_threshold = error_rate_threshold
+        self.slow_call_seconds = slow_call_seconds  # 超過此延遲的成功呼叫也算失敗
+        self.open_seconds = open_seconds
+        self.samples = deque(maxlen=max_samples)  # (timestamp, latency, ok)
+        self.state = CLOSED
+        self.opened_at = None
+        self.probe_in_flight = False
+        self.lock = threading.Lock()
+
+    def _trim(self, now):
+        while self.samples and now - self.samples[0][0] > self.window_seconds:
+            self.samples.popleft()
+
+    def allow(self):
+        """是否可以呼叫此後端；半開狀態一次只放行一個探測請求"""
+        with self.lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if time.time() - self.opened_at < self.open_seconds:
+                    return False
+                self.state = HALF_OPEN
+                logger.info(f"🔌 Circuit half-open, probing backend: {self.name}")
+            if self.probe_in_flight:
+                return False
+            self.probe_in_flight = True
+            return True
+
+    def record(self, latency, ok):
+        """記錄一次呼叫結果並更新狀態"""
+        now = time.time()
+        ok = ok and latency <= self.slow_call_seconds
+        with self.lock:
+            if self.state == HALF_OPEN:
+                self.probe_in_flight = False
+                if ok:
+                    self.state = CLOSED
+                    self.samples.clear()
+                    logger.info(f"✅ Circuit closed, backend recovered: {self.name}")
+                else:
+                    self.state = OPEN
+                    self.opened_at = now
+                    logger.warning(f"⚠️ Probe failed, circuit re-opened: {self.name}")
+                self.samples.append((now, latency, ok))
+                return
+
+            self.samples.append((now, latency, ok))
+            self._trim(now)
+            if self.state == CLOSED and len(self.samples) >= self.min_calls:
+                failures = sum(1 for _, _, sample_ok in self.samples if not sample_ok)
+                if failures / len(self.samples) >= self.error_rate_threshold:
+                    self.state = OPEN
+                    self.opened_at = now
+                    logger.warning(f"🚫 Circuit opened for backend {self.name}: {failures}/{len(self.samples)} failures")
+
+    def cancel(self):
+        """放行後未實際呼叫後端（例如本地名額不足）：不記錄結果，釋放半開狀態的探測名額"""
+        with self.lock:
+            if self.state == HALF_OPEN:
+                self.probe_in_flight = False
+
+    def status(self):
+        with self.lock:
+            self._trim(time.time())
+            latencies = sorted(latency for _, latency, _ in self.samples)
+            calls = len(self.samples)
+            failures = sum(1 for _, _, ok in self.samples if not ok)
+            return {
+                "state": self.state,
+                "calls": calls,
+                "error_rate": round(failures / calls, 3) if calls else 0.0,
+                "p50_seconds": percentile(latencies, 0.50),
+                "p95_seconds": percentile(latencies, 0.95),
+                "p99_seconds": percentile(latencies, 0.99),
+                "opened_at": self.opened_at,
+            }
+
+
+class BackendRouter:
+    """管理各評分後端的熔斷器"""
+
+    def __init__(self, **breaker_options):
+        self.breaker_options = breaker_options
+        self.breakers = {}
+        self.lock = threading.Lock()
+
+    def breaker(self, name):
+        with self.lock:
+            breaker = self.breakers.get(name)
+            if breaker is None:
+                breaker = CircuitBreaker(name, **self.breaker_options)
+                self.breakers[name] = breaker
+            return breaker
+
+    def allow(self, name):
+        return self.breaker(name).allow()
+
+    def record(self, name, latency, ok):
+        self.breaker(name).record(latency, ok)
+
+    def cancel(self, name):
+        self.breaker(name).cancel()
+
+    def status(self):
+        with self.lock:
+            names = list(self.breakers)
+        return {name: self.breaker(name).status() for name in names}
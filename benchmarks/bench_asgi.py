@@ -0,0 +1,244 @@
+# === Webhook 負載測試：Flask（gunicorn sync）vs ASGI 模式 ===
+# 用法：
+#   1. python -m benchmarks.bench_asgi prepare --user-store /tmp/bench_users.db --users 500
+#      （建立已選好練習詞彙的測試使用者；兩種模式都以 USER_STORE=sqlite 使用同一個檔案）
+#   2. 以相同的環境變數分別啟動兩種模式，LINE API 指向本測試的假伺服器：
+#        USER_STORE=sqlite USER_STORE_PATH=/tmp/bench_users.db LINE_CHANNEL_SECRET=bench-secret \
+#        LINE_API_ENDPOINT=http://127.0.0.1:8099 LINE_API_DATA_ENDPOINT=http://127.0.0.1:8099 \
+#        gunicorn -w 2 -b :5000 thai_learning:app          # 或 uvicorn asgi:app --workers 2 --port 8000
+#   3. python -m benchmarks.bench_asgi run --target flask=http://127.0.0.1:5000 \
+#        --target asgi=http://127.0.0.1:8000 --concurrency 10,50,200 --line-latency 0.2
+# 每位使用者送出一則已簽章的音頻訊息事件；假 LINE 伺服器提供音檔下載（可加入延遲模擬網路），
+# 並記錄回覆送達時間。報告 webhook 回應與「送出事件到收到評分回覆」的 p50 / p99、吞吐量與逾時數。
+# 評分後端依伺服器的設定執行（兩種模式應使用相同的後端設定）。
+import argparse
+import base64
+import hashlib
+import hmac
+import io
+import json
+import math
+import statistics
+import threading
+import time
+import urllib.request
+import uuid
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_wav(seconds=1.5, rate=16000):
+    """測試用音檔：含泛音的正弦波（16kHz 單聲道）"""
+    frames = bytearray()
+    for i in range(int(seconds * rate)):
+        t = i / rate
+        sample = 0.3 * math.sin(2 * math.pi * 220 * t) + 0.1 * math.sin(2 * math.pi * 660 * t)
+        frames += int(sample * 32767).to_bytes(2, "little", signed=True)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(rate)
+        wav_file.writeframes(bytes(frames))
+    return buffer.getvalue()
+
+
+class FakeLine(ThreadingHTTPServer):
+    """音檔下載與 reply / push；依 replyToken 或收件者記錄第一次送達時間"""
+
+    daemon_threads = True
+    request_queue_size = 1024  # 高併發時避免連線被拒
+
+    def __init__(self, port, latency=0.0):
+        super().__init__(("127.0.0.1", port), FakeLineHandler)
+        self.latency = latency
+        self.audio = make_wav()
+        self.lock = threading.Lock()
+        self.delivered = {}  # replyToken / userId -> 時間
+
+    def record(self, key):
+        with self.lock:
+            self.delivered.setdefault(key, time.monotonic())
+
+
+class FakeLineHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _respond(self, status, body, content_type="application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        if self.path.startswith("/v2/bot/message/") and self.path.endswith("/content"):
+            return self._respond(200, self.server.audio, "audio/wav")
+        self._respond(404, b"{}")
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        time.sleep(self.server.latency)
+        if self.path == "/v2/bot/message/reply":
+            self.server.record(body.get("replyToken"))
+        elif self.path == "/v2/bot/message/push":
+            self.server.record(body.get("to"))
+        self._respond(200, b"{}")
+
+
+def audio_event_body(user_id, reply_token):
+    return json.dumps({
+        "destination": "Ubench",
+        "events": [{
+            "type": "message",
+            "mode": "active",
+            "timestamp": int(time.time() * 1000),
+            "webhookEventId": str(uuid.uuid4()),
+            "deliveryContext": {"isRedelivery": False},
+            "source": {"type": "user", "userId": user_id},
+            "replyToken": reply_token,
+            "message": {"type": "audio", "id": str(uuid.uuid4().int)[:18], "duration": 1500},
+        }],
+    }).encode()
+
+
+def sign(secret, body):
+    return base64.b64encode(hmac.new(secret.encode(), body, hashlib.sha256).digest()).decode()
+
+
+def send_event(url, secret, user_id, reply_token, timeout):
+    body = audio_event_body(user_id, reply_token)
+    request = urllib.request.Request(
+        f"{url}/callback", data=body, method="POST",
+        headers={"Content-Type": "application/json", "X-Line-Signature": sign(secret, body)}
+    )
+    started = time.monotonic()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except Exception:
+        status = None
+    return started, time.monotonic(), status
+
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(math.ceil(q * len(values))) - 1)]
+
+
+def run_level(server, name, url, secret, concurrency, users, timeout):
+    """同時 concurrency 位使用者各送出一則音頻訊息，等待所有回覆或逾時"""
+    tokens = [f"rt-{name}-{concurrency}-{i}-{uuid.uuid4().hex[:6]}" for i in range(concurrency)]
+    with ThreadPoolExecutor(concurrency) as pool:
+        sent = list(pool.map(
+            lambda i: send_event(url, secret, users[i % len(users)], tokens[i], timeout), range(concurrency)
+        ))
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with server.lock:
+            if all(token in server.delivered for token in tokens):
+                break
+        time.sleep(0.05)
+
+    webhook = [end - start for start, end, status in sent if status == 200]
+    feedback = []
+    with server.lock:
+        for (start, _, _), token in zip(sent, tokens):
+            if token in server.delivered:
+                feedback.append(server.delivered[token] - start)
+    first = min(start for start, _, _ in sent)
+    last = max(start + f for (start, _, _), f in zip(sent, feedback)) if feedback else first
+    return {
+        "target": name,
+        "concurrency": concurrency,
+        "webhook_p50": percentile(webhook, 0.5),
+        "webhook_p99": percentile(webhook, 0.99),
+        "feedback_p50": percentile(feedback, 0.5),
+        "feedback_p99": percentile(feedback, 0.99),
+        "throughput": len(feedback) / (last - first) if last > first else float("nan"),
+        "errors": sum(1 for _, _, status in sent if status != 200),
+        "timeouts": concurrency - len(feedback),
+    }
+
+
+def prepare(args):
+    from user_store import SQLiteUserStore
+    from vocab_pack import default_pack_path, load_vocabulary
+
+    index = load_vocabulary(default_pack_path())
+    word = next(word for i, word in enumerate(index.words) if index.audio_url[i])
+    store = SQLiteUserStore(args.user_store)
+    store.save({f"Ubench{i:05d}": {"current_vocab": word}
+                for i in range(args.users)})
+    print(f"{args.users} users practicing {word!r} saved to {args.user_store}")
+
+
+def run(args):
+    server = FakeLine(args.line_port, latency=args.line_latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    users = [f"Ubench{i:05d}" for i in range(args.users)]
+    levels = [int(level) for level in args.concurrency.split(",")]
+    results = []
+    for target in args.target:
+        name, url = target.split("=", 1)
+        for concurrency in levels:
+            result = run_level(server, name, url.rstrip("/"), args.secret, concurrency, users, args.timeout)
+            results.append(result)
+            print(f"{name:6} c={concurrency:<4} webhook p50 {result['webhook_p50'] * 1000:7.0f} ms "
+                  f"p99 {result['webhook_p99'] * 1000:7.0f} ms | feedback p50 {result['feedback_p50']:6.2f} s "
+                  f"p99 {result['feedback_p99']:6.2f} s | {result['throughput']:6.1f} msg/s | "
+                  f"errors {result['errors']} timeouts {result['timeouts']}")
+            time.sleep(args.pause)
+    server.shutdown()
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    # 各目標在 p99 回饋時間低於 --slo 的最高併發數
+    for target in args.target:
+        name = target.split("=", 1)[0]
+        ok = [r["concurrency"] for r in results
+              if r["target"] == name and r["timeouts"] == 0 and r["feedback_p99"] <= args.slo]
+        print(f"{name}: highest concurrency with feedback p99 <= {args.slo:.0f}s and no timeouts: "
+              f"{max(ok) if ok else 'none'}")
+    if len(args.target) > 1:
+        print("median feedback across levels: " + ", ".join(
+            f"{t.split('=', 1)[0]} {statistics.median([r['feedback_p50'] for r in results if r['target'] == t.split('=', 1)[0]]):.2f}s"
+            for t in args.target
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the /callback webhook in Flask and ASGI modes")
+    commands = parser.add_subparsers(dest="command", required=True)
+    prep = commands.add_parser("prepare")
+    prep.add_argument("--user-store", required=True)
+    prep.add_argument("--users", type=int, default=500)
+    bench = commands.add_parser("run")
+    bench.add_argument("--target", action="append", required=True, help="name=url, e.g. asgi=http://127.0.0.1:8000")
+    bench.add_argument("--concurrency", default="10,50,200")
+    bench.add_argument("--users", type=int, default=500)
+    bench.add_argument("--secret", default="bench-secret")
+    bench.add_argument("--line-port", type=int, default=8099)
+    bench.add_argument("--line-latency", type=float, default=0.2, help="seconds added to each fake LINE call")
+    bench.add_argument("--timeout", type=float, default=60.0)
+    bench.add_argument("--slo", type=float, default=8.0, help="feedback p99 target in seconds")
+    bench.add_argument("--pause", type=float, default=2.0)
+    bench.add_argument("--json", help="write raw results to this file")
+    args = parser.parse_args()
+    if args.command == "prepare":
+        prepare(args)
+    else:
+        run(args)
+
+
+if __name__ == "__main__":
+    main()
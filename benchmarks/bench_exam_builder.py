@@ -0,0 +1,98 @@
+# === 考試出題效能：逐題掃描分類 vs 預先計算的干擾選項池 ===
+# 用法：python -m benchmarks.bench_exam_builder [--words 10000] [--exams 2000]
+# 以合成的大型詞彙量測舊版 generate_exam（每題重建剩餘詞彙清單）與 ExamBuilder 的出題時間。
+import argparse
+import random
+import time
+
+from exam_builder import ExamBuilder
+from vocabulary import VocabularyIndex
+
+CONSONANTS = "กขคงจชซดตทนบปผพฟมยรลวสหอฮ"
+VOWELS = ["ะ", "า", "ิ", "ี", "ุ", "ู", "ำ", "ไ", "เ", "โ"]
+ROMAN = ["k", "kh", "kh", "ng", "j", "ch", "s", "d", "t", "th", "n", "b", "p", "ph", "ph", "f", "m", "y", "r",
+         "l", "w", "s", "h", "o", "h"]
+ROMAN_VOWELS = ["a", "aa", "i", "ii", "u", "uu", "am", "ai", "e", "o"]
+CATEGORIES = 8
+
+
+def make_thai_data(size, seed=1):
+    rng = random.Random(seed)
+    basic_words, categories = {}, {f"cat{c}": {"name": f"Category {c}", "words": []} for c in range(CATEGORIES)}
+    for i in range(size):
+        thai, roman = [], []
+        for _ in range(rng.randint(1, 3)):
+            c, v = rng.randrange(len(CONSONANTS)), rng.randrange(len(VOWELS))
+            thai.append(CONSONANTS[c] + VOWELS[v])
+            roman.append(ROMAN[c] + ROMAN_VOWELS[v])
+        word = f"word{i}"
+        basic_words[word] = {
+            "thai": "".join(thai),
+            "pronunciation": "-".join(roman),
+            "image_url": f"https://example.com/images/{word}.jpg",
+            "audio_url": f"https://example.com/audio/{word}.mp3",
+        }
+        categories[f"cat{i % CATEGORIES}"]["words"].append(word)
+    return {"basic_words": basic_words, "categories": categories}
+
+
+def legacy_generate_exam(thai_data, category=None):
+    # 原本的 generate_exam：每道選擇題都掃描整個分類以排除已出過的詞
+    if category:
+        word_items = [(w, thai_data["basic_words"][w]) for w in thai_data["categories"][category]["words"]]
+    else:
+        word_items = list(thai_data["basic_words"].items())
+    selected = random.sample(word_items, min(10, len(word_items)))
+    questions, used_words = [], set()
+    for i, (word, data) in enumerate(selected):
+        used_words.add(word)
+        if i < 2:
+            questions.append({"type": "pronounce", "word": word, "image_url": data["image_url"],
+                              "thai": data["thai"]})
+            continue
+        remaining_words = [(w, d) for w, d in word_items if w not in used_words]
+        wrong = random.sample(remaining_words, min(2, len(remaining_words)))
+        choices = [(word, data)] + wrong
+        random.shuffle(choices)
+        questions.append({"type": "audio_choice", "audio_url": data["audio_url"],
+                          "choices": [{"word": w, "image_url": d["image_url"]} for w, d in choices],
+                          "answer": word})
+    return questions
+
+
+def per_exam(build, exams):
+    start = time.perf_counter()
+    for _ in range(exams):
+        build()
+    return (time.perf_counter() - start) / exams
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare legacy exam generation with precomputed distractor pools")
+    parser.add_argument("--words", type=int, default=10000)
+    parser.add_argument("--exams", type=int, default=2000)
+    args = parser.parse_args()
+
+    thai_data = make_thai_data(args.words)
+    vocab = VocabularyIndex.from_thai_data(thai_data)
+
+    start = time.perf_counter()
+    builder = ExamBuilder(vocab)
+    build_seconds = time.perf_counter() - start
+
+    print(f"{args.words} words, {CATEGORIES} categories, {args.exams} exams per case")
+    print(f"distractor pools built in {build_seconds:.2f} s")
+    for category in (None, "cat0"):
+        label = category or "all words"
+        legacy = per_exam(lambda: legacy_generate_exam(thai_data, category), args.exams)
+        pooled = per_exam(lambda: builder.build(category), args.exams)
+        print(f"{label:10s} legacy {legacy * 1e6:9.1f} us/exam, builder {pooled * 1e6:7.1f} us/exam "
+              f"({legacy / pooled:.0f}x faster)")
+
+    word_id = builder.scopes["cat0"][0]
+    print(f"example: {vocab.thai[word_id]} ({vocab.pronunciation[word_id]}) -> "
+          + ", ".join(f"{vocab.thai[j]} ({vocab.pronunciation[j]})" for j in builder.pools["cat0"][word_id][:4]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# === 記憶翻牌遊戲畫面渲染：每次重建 vs 快取片段 ===
+# 用法：python -m benchmarks.bench_memory_board [--flips 20000]
+# 模擬一局遊戲的翻牌順序，量測每次翻牌產生 Flex carousel JSON 的時間（不含 LINE SDK 轉換）。
+import argparse
+import json
+import random
+import time
+
+from benchmarks.bench_user_memory import make_vocabulary, slotted_cards
+from memory_board import id_mask, render_board
+from vocabulary import VocabularyIndex
+
+
+def legacy_render(cards, game_state):
+    # 原本 create_flex_memory_game 的做法：每次翻牌重建所有卡片，並以串列判斷狀態
+    matched_ids = [c for pair in game_state['matched_pairs'] for c in pair]
+    flipped_ids = game_state['flipped_cards']
+    bubbles = [{
+        "type": "bubble",
+        "header": {"type": "box", "layout": "vertical", "contents": [
+            {"type": "text", "text": "Thai Memory Card Game", "weight": "bold", "size": "xl", "color": "#ffffff"},
+            {"type": "text", "text": game_state['category_name'], "size": "md", "color": "#ffffff"}
+        ], "backgroundColor": "#4A86E8", "paddingBottom": "10px"},
+        "body": {"type": "box", "layout": "vertical", "contents": [
+            {"type": "box", "layout": "horizontal", "justifyContent": "center", "contents": [
+                {"type": "text", "text": "⏱️Time Remaining:", "size": "sm", "color": "#555555", "flex": 2},
+                {"type": "text", "text": f"{game_state['remaining_time']} sec", "size": "sm", "color": "#111111", "flex": 1}
+            ]}
+        ]}
+    }]
+    for row_cards in [cards[i:i + 4] for i in range(0, len(cards), 4)]:
+        card_contents = []
+        for card in row_cards:
+            if card.id in matched_ids or card.id in flipped_ids:
+                if card.kind == 'image':
+                    card_box = {"type": "box", "layout": "vertical", "width": "60px", "height": "80px",
+                                "backgroundColor": "#E6F5FF", "cornerRadius": "4px", "borderWidth": "1px",
+                                "borderColor": "#AAAAAA", "contents": [
+                                    {"type": "image", "url": card.content, "size": "full", "aspectMode": "cover", "aspectRatio": "1:1"},
+                                    {"type": "text", "text": card.word, "size": "xxs", "align": "center", "wrap": True, "maxLines": 2}]}
+                else:
+                    card_box = {"type": "box", "layout": "vertical", "width": "60px", "height": "80px",
+                                "backgroundColor": "#FFF4E6", "cornerRadius": "4px", "borderWidth": "1px",
+                                "borderColor": "#AAAAAA", "contents": [
+                                    {"type": "text", "text": "🎵", "size": "lg", "align": "center", "color": "#FF6B6E"},
+                                    {"type": "text", "text": card.thai, "size": "xxs", "align": "center", "wrap": True, "maxLines": 2}],
+                                "action": {"type": "message", "text": f"Play Audio:{card.word}"}}
+            else:
+                card_box = {"type": "box", "layout": "vertical", "width": "60px", "height": "80px",
+                            "backgroundColor": "#4A86E8" if card.kind == "image" else "#FFA94D",
+                            "cornerRadius": "4px", "borderWidth": "1px", "borderColor": "#0B5ED7", "contents": [
+                                {"type": "text", "text": "🖼️" if card.kind == "image" else "🎧", "color": "#FFFFFF", "align": "center", "gravity": "center", "size": "xl"},
+                                {"type": "text", "text": f"{card.id}", "color": "#FFFFFF", "align": "center", "size": "sm"}],
+                            "action": {"type": "message", "text": f"Flip Card:{card.id}"}}
+            card_contents.append(card_box)
+        bubbles.append({"type": "bubble", "body": {"type": "box", "layout": "horizontal", "contents": card_contents}})
+    return {"type": "carousel", "contents": bubbles}
+
+
+def cached_render(cards, game_state):
+    face_up = id_mask(game_state['flipped_cards'])
+    for pair in game_state['matched_pairs']:
+        face_up |= id_mask(pair)
+    return render_board(cards, face_up, game_state['category_name'], game_state['remaining_time'])
+
+
+def play(cards):
+    """一局遊戲中每次翻牌後的狀態：隨機翻牌，配對成功就保留"""
+    by_id = {card.id: card for card in cards}
+    hidden = [card.id for card in cards]
+    matched, states = [], []
+    while hidden:
+        first, second = random.sample(hidden, 2) if len(hidden) > 2 else hidden
+        states.append({'flipped_cards': [first], 'matched_pairs': list(matched)})
+        if by_id[first].match_id == second:
+            matched.append([first, second])
+            hidden.remove(first)
+            hidden.remove(second)
+            states.append({'flipped_cards': [], 'matched_pairs': list(matched)})
+        else:
+            states.append({'flipped_cards': [first, second], 'matched_pairs': list(matched)})
+    for state in states:
+        state.update(category_name="Animals", remaining_time=60)
+    return states
+
+
+def per_flip(render, games):
+    flips = sum(len(states) for _, states in games)
+    start = time.perf_counter()
+    for cards, states in games:
+        for state in states:
+            render(cards, state)
+    return (time.perf_counter() - start) / flips
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare rebuilding the memory game board with cached card fragments")
+    parser.add_argument("--flips", type=int, default=20000)
+    args = parser.parse_args()
+
+    basic_words = make_vocabulary()
+    table = VocabularyIndex.from_thai_data({'basic_words': basic_words})
+    keys = list(basic_words)
+
+    print(f"about {args.flips} flips per board size")
+    for pairs in (5, 16):
+        games, flips = [], 0
+        while flips < args.flips:
+            cards = slotted_cards(table, random.sample(keys, pairs))
+            random.shuffle(cards)
+            states = play(cards)
+            games.append((cards, states))
+            flips += len(states)
+        legacy = per_flip(legacy_render, games)
+        cached = per_flip(cached_render, games)
+        cards, states = games[0]
+        for state in states:
+            assert json.dumps(legacy_render(cards, state)) == json.dumps(cached_render(cards, state))
+        print(f"{pairs * 2:2d} cards: legacy {legacy * 1e6:6.1f} us/flip, cached {cached * 1e6:6.1f} us/flip "
+              f"({legacy / cached:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# === 預先載入共用資源：各 worker 自行載入 vs master 載入後 fork ===
+# 用法：python -m benchmarks.bench_preload [--workers 4] [--words 10000]
+# 以 os.fork 模擬 gunicorn：比較每個 worker 自己建立詞彙索引與出題器，以及 master 預先載入並
+# gc.freeze() 後再 fork 兩種方式，從 /proc/<pid>/smaps_rollup 讀取各 worker 的獨佔（Private）與共用記憶體。
+# 預設使用合成詞彙包（--words 0 改用 vocab/ 內的詞彙包）；不含 SpeechBrain 模型。
+import argparse
+import gc
+import os
+import time
+
+from exam_builder import ExamBuilder
+
+
+def smaps(pid):
+    """{欄位: kB}，只取 Rss / Pss / Shared_* / Private_*"""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key.startswith(("Rss", "Pss", "Shared_", "Private_")) and rest.strip().endswith("kB"):
+                values[key] = int(rest.split()[0])
+    return values
+
+
+def load_assets(words):
+    if words:
+        from benchmarks.bench_exam_builder import make_thai_data
+        from vocabulary import VocabularyIndex
+        index = VocabularyIndex.from_thai_data(make_thai_data(words))
+    else:
+        from vocab_pack import default_pack_path, load_vocabulary
+        index = load_vocabulary(default_pack_path())
+    return index, ExamBuilder(index)
+
+
+def worker(assets, words, ready):
+    """模擬 worker：沒有繼承資源時自行載入，之後持續出題（讀取共用資源）"""
+    if assets is None:
+        assets = load_assets(words)
+    index, builder = assets
+    gc.collect()  # worker 內的 GC 會走訪所有未凍結的物件
+    os.write(ready, b"x")
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        builder.build(length=10)
+        time.sleep(0.01)
+
+
+def run(mode, workers, words):
+    assets = None
+    if mode == "preload":
+        gc.disable()
+        assets = load_assets(words)
+        gc.freeze()
+        gc.enable()
+    read, write = os.pipe()
+    pids = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            os.close(read)
+            try:
+                worker(assets, words, write)
+            finally:
+                os._exit(0)
+        pids.append(pid)
+    os.close(write)
+    for _ in range(workers):
+        os.read(read, 1)
+    time.sleep(1.0)  # 讓各 worker 出題一段時間
+    reports = [smaps(pid) for pid in pids]
+    for pid in pids:
+        os.kill(pid, 9)
+        os.waitpid(pid, 0)
+    if mode == "preload":
+        gc.unfreeze()
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-worker private memory with and without preloading in the master")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--words", type=int, default=10000)
+    args = parser.parse_args()
+
+    for mode in ("per-worker", "preload"):
+        reports = run(mode, args.workers, args.words)
+        private = [(r["Private_Clean"] + r["Private_Dirty"]) / 1024 for r in reports]
+        shared = [(r["Shared_Clean"] + r["Shared_Dirty"]) / 1024 for r in reports]
+        pss = sum(r["Pss"] for r in reports) / 1024
+        print(f"{mode:10} unique per worker {sum(private) / len(private):6.1f} MB, "
+              f"shared per worker {sum(shared) / len(shared):6.1f} MB, "
+              f"total PSS of {args.workers} workers {pss:6.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# === 固定回覆從代入欄位到請求內容：解析後重新序列化 vs 直接拼接 ===
+# 用法：python -m benchmarks.bench_reply_templates [--requests 50000]
+# 量測 render() 之後組出 reply 請求內容的時間：舊做法與 LINE SDK 相同（as_json_dict() 解析後再 json.dumps 整個請求），
+# 新做法以 request_body() 把模板的 JSON 字串直接拼進請求。兩者產生的內容解析後相同。
+import argparse
+import json
+import time
+
+from benchmarks.bench_exam_builder import make_thai_data
+from reply_templates import build_reply_templates, request_body
+from vocabulary import VocabularyIndex
+
+TONE_EXAMPLES = [
+    {"thai": "กา", "meaning": "crow", "pronunciation": "gaa", "tone": "中"},
+    {"thai": "ก่า", "meaning": "(low)", "pronunciation": "gàa", "tone": "低"},
+    {"thai": "ก้า", "meaning": "(falling)", "pronunciation": "gâa", "tone": "降"},
+]
+
+
+def render_messages(templates, vocab, word_id):
+    # 發音練習回覆：兩則有欄位的模板（每次代入）＋固定的選單
+    word = vocab.words[word_id]
+    return [
+        templates.render("echo_instructions", thai=vocab.thai[word_id], pronunciation=vocab.pronunciation[word_id]),
+        templates.render("echo_options", word=word),
+        templates.render("vocabulary_options"),
+    ]
+
+
+def legacy_body(messages, reply_token):
+    # LINE SDK 的 reply_message：每則訊息 as_json_dict() 後整個請求再 json.dumps
+    return json.dumps({
+        "replyToken": reply_token,
+        "messages": [message.as_json_dict() for message in messages],
+        "notificationDisabled": False,
+    })
+
+
+def spliced_body(messages, reply_token):
+    return request_body(messages, replyToken=reply_token, notificationDisabled=False)
+
+
+def per_request(templates, vocab, encode, requests):
+    start = time.perf_counter()
+    for i in range(requests):
+        encode(render_messages(templates, vocab, i % len(vocab.words)), f"token{i}")
+    return (time.perf_counter() - start) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark building LINE reply bodies from pre-serialized templates")
+    parser.add_argument("--words", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=50000)
+    args = parser.parse_args()
+
+    thai_data = make_thai_data(args.words)
+    thai_data["tone_examples"] = TONE_EXAMPLES
+    vocab = VocabularyIndex.from_thai_data(thai_data)
+    templates = build_reply_templates(vocab)
+
+    messages = render_messages(templates, vocab, 0)
+    assert json.loads(legacy_body(messages, "t")) == json.loads(spliced_body(messages, "t"))
+
+    legacy = per_request(templates, vocab, legacy_body, args.requests)
+    spliced = per_request(templates, vocab, spliced_body, args.requests)
+    print(f"{args.requests} reply bodies, 3 template messages each")
+    print(f"parse + dumps  {legacy * 1e6:7.2f} us/request")
+    print(f"spliced        {spliced * 1e6:7.2f} us/request ({legacy / spliced:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
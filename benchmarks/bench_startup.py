@@ -0,0 +1,92 @@
+# === worker 啟動時間：重量級 SDK 匯入成本與應用程式匯入時載入了哪些 SDK ===
+# 用法：python -m benchmarks.bench_startup [--runs 3] [--skip-app]
+# 每次以新的直譯器執行 `python -X importtime -c "import <模組>"`，取多次中的最小值：
+# 先分別量測各 SDK 單獨匯入的時間，再匯入 thai_learning（WARM_UP=0，不啟動暖機），
+# 列出匯入完成時已載入的重量級 SDK —— 延遲匯入後這份清單應為空。
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = [
+    "torch",
+    "speechbrain",
+    "azure.cognitiveservices.speech",
+    "google.cloud.speech",
+    "google.cloud.storage",
+    "firebase_admin",
+    "numpy",
+    "pydub",
+]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_profile(module, env=None):
+    """回傳 (牆鐘秒數, {模組: 累計微秒})；匯入失敗時回傳 (None, 錯誤訊息)"""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    elapsed = time.perf_counter() - start
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cum, name = line[len("import time:"):].split("|")
+        cumulative[name.strip()] = int(cum)
+    if proc.returncode:
+        return None, proc.stderr.strip().splitlines()[-1]
+    return elapsed, cumulative
+
+
+def best_of(module, runs, env=None):
+    best = None
+    for _ in range(runs):
+        elapsed, profile = import_profile(module, env)
+        if elapsed is None:
+            return None, profile
+        if best is None or elapsed < best[0]:
+            best = (elapsed, profile)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure SDK import cost and which SDKs the app imports at startup")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--skip-app", action="store_true", help="only measure the SDKs")
+    args = parser.parse_args()
+
+    baseline, _ = best_of("os", args.runs)
+    print(f"interpreter start-up: {baseline * 1000:.0f} ms")
+    print(f"{'module':34} {'import':>10}")
+    for module in HEAVY_MODULES:
+        elapsed, profile = best_of(module, args.runs)
+        if elapsed is None:
+            print(f"{module:34} {'n/a':>10}  ({profile})")
+            continue
+        print(f"{module:34} {profile.get(module, 0) / 1000:>7.0f} ms")
+
+    if args.skip_app:
+        return
+
+    env = dict(os.environ)
+    env.setdefault("FIREBASE_CREDENTIALS", "{}")
+    env["WARM_UP"] = "0"
+    elapsed, profile = best_of("thai_learning", args.runs, env)
+    if elapsed is None:
+        print(f"thai_learning: import failed ({profile})")
+        return
+    loaded = [module for module in HEAVY_MODULES if module in profile]
+    print(f"thai_learning import: {profile['thai_learning'] / 1000:.0f} ms "
+          f"(process {elapsed * 1000:.0f} ms)")
+    print(f"heavy SDKs loaded at import: {', '.join(loaded) if loaded else 'none'}")
+    for module in loaded:
+        print(f"  {module:32} {profile[module] / 1000:>7.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# === 串流 vs 批次：首次回饋時間比較 ===
+# 用法：python -m benchmarks.bench_streaming recording1.m4a recording2.m4a ... [--kbps 256]
+# 以相同錄音模擬 LINE 分段下載，分別量測批次路徑與串流路徑取得識別結果所需時間。
+# 批次路徑在此不含 GCS 上傳，因此實際差距會比報告數值更大。
+import argparse
+import io
+import statistics
+import time
+
+from google.cloud import speech
+from pydub import AudioSegment
+
+from streaming_recognizer import StreamingRecognizer
+
+
+def simulated_download(content, kbps, chunk_size=1024):
+    """依指定頻寬分段產生音頻內容，模擬 LINE iter_content()"""
+    delay = chunk_size / (kbps * 1024 / 8)
+    for i in range(0, len(content), chunk_size):
+        time.sleep(delay)
+        yield content[i:i + chunk_size]
+
+
+def run_batch(client, content, kbps):
+    started = time.perf_counter()
+    downloaded = b''.join(simulated_download(content, kbps))
+    audio = AudioSegment.from_file(io.BytesIO(downloaded)).set_frame_rate(16000).set_channels(1).set_sample_width(2)
+    response = client.recognize(
+        config=speech.RecognitionConfig(
+            encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+            sample_rate_hertz=16000,
+            language_code="th-TH"
+        ),
+        audio=speech.RecognitionAudio(content=audio.raw_data)
+    )
+    transcript = response.results[0].alternatives[0].transcript if response.results else None
+    return time.perf_counter() - started, transcript
+
+
+def run_streaming(recognizer, content, kbps):
+    started = time.perf_counter()
+    backend, payload, _ = recognizer.recognize(simulated_download(content, kbps), "")
+    return time.perf_counter() - started, payload if backend else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare time to first recognition result for batch and streaming paths")
+    parser.add_argument("recordings", nargs="+")
+    parser.add_argument("--kbps", type=float, default=256, help="simulated LINE download bandwidth")
+    args = parser.parse_args()
+
+    client = speech.SpeechClient()
+    recognizer = StreamingRecognizer(mode="google", client_factory=lambda: client)
+
+    batch_times, streaming_times = [], []
+    for path in args.recordings:
+        with open(path, "rb") as f:
+            content = f.read()
+        batch_time, batch_text = run_batch(client, content, args.kbps)
+        streaming_time, streaming_text = run_streaming(recognizer, content, args.kbps)
+        batch_times.append(batch_time)
+        streaming_times.append(streaming_time)
+        print(f"{path}: batch {batch_time:.2f}s ({batch_text!r}), streaming {streaming_time:.2f}s ({streaming_text!r})")
+
+    print(f"median time-to-first-feedback: batch {statistics.median(batch_times):.2f}s, "
+          f"streaming {statistics.median(streaming_times):.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# === 使用者狀態記憶體用量：字典 vs __slots__ 紀錄 ===
+# 用法：python -m benchmarks.bench_user_memory [--users 100000]
+# 以 tracemalloc 量測模擬使用者的狀態（以及每人一局記憶翻牌遊戲的卡片）所佔用的記憶體。
+import argparse
+import gc
+import random
+import tracemalloc
+from datetime import datetime
+
+from records import Card, UserState
+from vocabulary import VocabularyIndex
+
+URL_BASE = "https://firebasestorage.googleapis.com/v0/b/thai-learning.appspot.com/o/"
+
+
+def make_vocabulary(size=80):
+    return {
+        f"word{i}": {
+            "thai": f"คำ{i}",
+            "image_url": f"{URL_BASE}images%2Fword{i}.jpg?alt=media",
+            "audio_url": f"{URL_BASE}audio%2Fword{i}.mp3?alt=media",
+        }
+        for i in range(size)
+    }
+
+
+def dict_user():
+    # 原本 UserData.get_user_data 建立的結構
+    return {
+        'score': 0,
+        'current_activity': None,
+        'current_vocab': None,
+        'current_category': None,
+        'game_state': {},
+        'vocab_mastery': {},
+        'learning_progress': {},
+        'last_active': datetime.now().strftime("%Y-%m-%d"),
+        'streak': 0
+    }
+
+
+def dict_cards(basic_words, words):
+    # 原本 MemoryGame.initialize_game 建立的卡片
+    cards, card_id = [], 1
+    for word in words:
+        data = basic_words[word]
+        cards.append({'id': card_id, 'type': 'image', 'content': data['image_url'], 'match_id': card_id + 1,
+                      'word': word, 'meaning': word, 'thai': data['thai']})
+        cards.append({'id': card_id + 1, 'type': 'audio', 'content': data['audio_url'], 'match_id': card_id,
+                      'word': word, 'meaning': word, 'thai': data['thai']})
+        card_id += 2
+    return cards
+
+
+def slotted_cards(table, words):
+    cards, card_id = [], 1
+    for word in words:
+        vocab = table.id_of(word)
+        cards.append(Card(card_id, 'image', vocab, card_id + 1, table))
+        cards.append(Card(card_id + 1, 'audio', vocab, card_id, table))
+        card_id += 2
+    return cards
+
+
+def measure(build, count):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    items = [build() for _ in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del items
+    return (after - before) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure user state memory with dicts versus slotted records")
+    parser.add_argument("--users", type=int, default=100000)
+    args = parser.parse_args()
+
+    basic_words = make_vocabulary()
+    table = VocabularyIndex.from_thai_data({'basic_words': basic_words})
+    keys = list(basic_words)
+    picks = [random.sample(keys, 5) for _ in range(64)]
+
+    user_dict = measure(dict_user, args.users)
+    user_slots = measure(UserState, args.users)
+    cards_dict = measure(lambda: dict_cards(basic_words, random.choice(picks)), args.users)
+    cards_slots = measure(lambda: slotted_cards(table, random.choice(picks)), args.users)
+
+    print(f"{args.users} simulated users")
+    print(f"user state:        dict {user_dict:8.0f} B/user, slots {user_slots:8.0f} B/user "
+          f"({1 - user_slots / user_dict:.0%} less)")
+    print(f"memory game cards: dict {cards_dict:8.0f} B/user, slots {cards_slots:8.0f} B/user "
+          f"({1 - cards_slots / cards_dict:.0%} less)")
+    total_dict, total_slots = user_dict + cards_dict, user_slots + cards_slots
+    print(f"total:             dict {total_dict * args.users / 2**20:8.1f} MiB, "
+          f"slots {total_slots * args.users / 2**20:8.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
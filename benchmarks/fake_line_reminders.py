@@ -0,0 +1,145 @@
+# === 連續學習提醒：對本地假 LINE 端點完整執行一次 ===
+# 用法：python -m benchmarks.fake_line_reminders [--users 3000] [--fail-after 3] [--rate 20]
+# 在本機啟動模擬 LINE multicast API 的 HTTP 伺服器，以暫存 SQLite 使用者資料執行提醒工作：
+# 先讓端點在第 N 個請求後持續回應 500（模擬中斷），再恢復端點重新執行，
+# 確認每位即將中斷連續學習的使用者剛好收到一次提醒、每批不超過 500 人、請求速率不超過設定值。
+# 這是提醒工作的端對端測試（需手動執行）；任何檢查失敗時以 AssertionError 結束。
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from line_client import LineClient, PooledHttpClient
+from reminders import MULTICAST_LIMIT, StreakReminderJob
+from user_store import SQLiteUserStore
+
+
+class FakeLine(ThreadingHTTPServer):
+    """只實作 POST /v2/bot/message/multicast；以 X-Line-Retry-Key 去除重複請求"""
+
+    def __init__(self, fail_after=None):
+        super().__init__(("127.0.0.1", 0), FakeLineHandler)
+        self.fail_after = fail_after
+        self.lock = threading.Lock()
+        self.accepted = []  # (時間, 收件者清單)
+        self.retry_keys = set()
+        self.errors = 0
+
+    @property
+    def endpoint(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class FakeLineHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _respond(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.path != "/v2/bot/message/multicast":
+            return self._respond(404, {"message": "Not found"})
+        if len(body["to"]) > MULTICAST_LIMIT:
+            return self._respond(400, {"message": "Size must be between 1 and 500"})
+        with server.lock:
+            if server.fail_after is not None and len(server.accepted) >= server.fail_after:
+                server.errors += 1
+                return self._respond(500, {"message": "Internal server error"})
+            key = self.headers.get("X-Line-Retry-Key")
+            if key in server.retry_keys:
+                return self._respond(409, {"message": "The retry key is already accepted"})
+            server.retry_keys.add(key)
+            server.accepted.append((time.monotonic(), body["to"]))
+        self._respond(200, {})
+
+
+def seed_users(store, count, today):
+    """建立使用者：約六成昨天有學習（其中部分 streak 為 0），其餘今天已學習或更早之前"""
+    yesterday = (today - timedelta(days=1)).isoformat()
+    at_risk, changes = set(), {}
+    for i in range(count):
+        user_id = f"U{i:08d}"
+        roll = random.random()
+        if roll < 0.6:
+            streak = random.choice([0, 1, 2, 5, 30])
+            changes[user_id] = {"last_active": yesterday, "streak": streak}
+            if streak:
+                at_risk.add(user_id)
+        elif roll < 0.8:
+            changes[user_id] = {"last_active": today.isoformat(), "streak": 3}
+        else:
+            changes[user_id] = {"last_active": (today - timedelta(days=5)).isoformat(), "streak": 1}
+    store.save(changes)
+    return at_risk
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the streak reminder job end to end against a local fake LINE endpoint")
+    parser.add_argument("--users", type=int, default=3000)
+    parser.add_argument("--fail-after", type=int, default=3)
+    parser.add_argument("--rate", type=float, default=20.0)
+    args = parser.parse_args()
+
+    today = date.today()
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteUserStore(os.path.join(tmp, "users.db"))
+        at_risk = seed_users(store, args.users, today)
+
+        server = FakeLine(fail_after=args.fail_after)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        client = LineClient(
+            "fake-token",
+            endpoint=server.endpoint,
+            http_client=partial(PooledHttpClient, retries=2, backoff=0.01)
+        )
+
+        start = time.monotonic()
+        try:
+            StreakReminderJob(store, client, rate=args.rate).run(today)
+            print("first run finished without interruption")
+        except Exception as e:
+            print(f"first run interrupted after {len(server.accepted)} requests: {e}")
+
+        server.fail_after = None
+        state = StreakReminderJob(store, client, rate=args.rate).run(today)
+        elapsed = time.monotonic() - start
+        server.shutdown()
+
+        received = Counter(user_id for _, to in server.accepted for user_id in to)
+        assert set(received) == at_risk, "reminders must reach exactly the at-risk users"
+        assert max(received.values()) == 1, "no user may be reminded twice"
+        assert max(len(to) for _, to in server.accepted) <= MULTICAST_LIMIT
+        times = [t for t, _ in server.accepted]
+        gaps = [b - a for a, b in zip(times, times[1:])]
+
+        print(f"{args.users} users, {len(at_risk)} at risk")
+        print(f"resumed run: {state}")
+        print(f"{len(server.accepted)} multicast requests, {server.errors} failed attempts, "
+              f"max {max(len(to) for _, to in server.accepted)} recipients per request")
+        if gaps:
+            print(f"min gap between requests {min(gaps) * 1000:.0f} ms (limit {1000 / args.rate:.0f} ms), "
+                  f"total {elapsed:.2f} s")
+        # 再執行一次不應送出任何訊息
+        before = len(server.accepted)
+        StreakReminderJob(store, client, rate=args.rate).run(today)
+        assert len(server.accepted) == before
+        print("third run was a no-op")
+
+
+if __name__ == "__main__":
+    main()
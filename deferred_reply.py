@@ -0,0 +1,166 @@
+# === deferred_reply.py - 延後使用回覆權杖 ===
+# 評分期間先保留回覆權杖：在延遲預算內完成就用（免費的）reply 送出結果，
+# 超過預算才先回覆「評分中」提示，結果改用推播。所有保留中的權杖共用一個計時執行緒。
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+from metrics import counter, histogram
+
+logger = logging.getLogger(__name__)
+
+MAX_REPLY_MESSAGES = 5
+
+deferred_replies = counter(
+    "deferred_reply_total",
+    "Held reply tokens by how the result was delivered",
+    label_names=("outcome",),
+)
+push_messages_saved = counter(
+    "line_push_saved_total",
+    "Messages delivered with a held reply token instead of a push",
+)
+deferred_reply_latency = histogram(
+    "deferred_reply_seconds",
+    "Time from receiving the event to delivering the result",
+    label_names=("outcome",),
+)
+
+
+class DeferredReply:
+    """一個保留中的回覆權杖；以 with 區塊包住評分流程，send() 的訊息在區塊結束時一起送出。
+    可巢狀使用（同一權杖再次 hold 時回傳同一物件），只有最外層區塊結束時才送出"""
+
+    def __init__(self, client, reply_token, user_id, interim, deadline, on_done=None):
+        self.client = client
+        self.reply_token = reply_token
+        self.user_id = user_id
+        self.interim = interim if isinstance(interim, list) else [interim]
+        self.deadline = deadline
+        self.started = time.monotonic()
+        self.state = "holding"  # holding -> interim（已送出提示）或 done
+        self.messages = []
+        self.depth = 0  # 進入中的 with 區塊數
+        self.on_done = on_done  # 最外層結束後呼叫（排程器藉此移除保留中的權杖）
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            self.depth += 1
+        return self
+
+    def release(self):
+        """離開一層區塊；最外層離開時送出結果"""
+        with self.lock:
+            self.depth -= 1
+            if self.depth > 0:
+                return
+        self.close()
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+    def send(self, messages):
+        """加入結果訊息；提示訊息已送出時直接推播"""
+        if not isinstance(messages, (list, tuple)):
+            messages = [messages]
+        with self.lock:
+            if self.state == "holding":
+                self.messages.extend(messages)
+                return
+        self.client.push_message(self.user_id, list(messages))
+
+    def expire(self):
+        """超過預算：用回覆權杖送出提示訊息（由排程執行緒呼叫）"""
+        # 只在鎖內切換狀態並取出訊息，網路呼叫在鎖外進行，避免 send() / close() 被阻塞
+        with self.lock:
+            if self.state != "holding":
+                return
+            self.state = "interim"
+            messages, self.messages = self.messages, []
+        try:
+            self.client.reply_message(self.reply_token, self.interim)
+        except Exception as e:
+            logger.warning(f"Failed to send interim reply to {self.user_id}: {e}")
+        if messages:
+            self.client.push_message(self.user_id, messages)
+
+    def close(self):
+        """送出累積的結果：仍在預算內就用回覆，超出 5 則的部分推播"""
+        with self.lock:
+            state, self.state = self.state, "done"
+            messages, self.messages = self.messages, []
+        has_messages = bool(messages)
+        if state == "holding" and messages:
+            replied = messages[:MAX_REPLY_MESSAGES]
+            try:
+                self.client.reply_message(self.reply_token, replied)
+                messages = messages[len(replied):]
+                push_messages_saved.inc(len(replied))
+            except Exception as e:
+                logger.warning(f"Deferred reply to {self.user_id} failed, falling back to push: {e}")
+        if messages:
+            self.client.push_message(self.user_id, messages)
+        if state == "done":
+            return
+        if self.on_done is not None:
+            self.on_done(self)
+        if state == "holding":
+            # 沒有任何訊息時不使用回覆權杖
+            outcome = "reply" if has_messages else "empty"
+        else:
+            outcome = "interim"
+        deferred_replies.inc(outcome=outcome)
+        deferred_reply_latency.observe(time.monotonic() - self.started, outcome=outcome)
+
+
+class ReplyScheduler:
+    """保留回覆權杖並在預算到期時送出提示訊息"""
+
+    def __init__(self, client, budget=8.0):
+        self.client = client
+        self.budget = budget
+        self.heap = []
+        self.active = {}  # reply_token -> 使用中的 DeferredReply（最外層區塊結束時移除，到期不移除）
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def hold(self, reply_token, user_id, interim, budget=None):
+        """保留回覆權杖；回傳的 DeferredReply 需以 with 區塊（或 acquire / release）使用。
+        同一權杖已在保留中時回傳同一個物件，內層區塊結束時不送出（ASGI 模式在評分前即開始保留，見 asgi.py）"""
+        with self.condition:
+            reply = self.active.get(reply_token)
+            if reply is not None and reply.state != "done":
+                return reply
+        deadline = time.monotonic() + (self.budget if budget is None else budget)
+        reply = DeferredReply(self.client, reply_token, user_id, interim, deadline, on_done=self._forget)
+        with self.condition:
+            self.active[reply_token] = reply
+            heapq.heappush(self.heap, (deadline, next(self.sequence), reply))
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="deferred-reply", daemon=True)
+                self.thread.start()
+            self.condition.notify()
+        return reply
+
+    def _forget(self, reply):
+        with self.condition:
+            if self.active.get(reply.reply_token) is reply:
+                del self.active[reply.reply_token]
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.heap or self.heap[0][0] > time.monotonic():
+                    timeout = self.heap[0][0] - time.monotonic() if self.heap else None
+                    self.condition.wait(timeout)
+                # 到期後仍留在 active：提示已用掉權杖，內層 hold 需取得同一物件改以推播送出結果
+                _, _, reply = heapq.heappop(self.heap)
+            if reply.state == "holding":
+                reply.expire()
@@ -0,0 +1,129 @@
+# === exam_builder.py - 考試出題與干擾選項 ===
+# 每個分類（以及全部詞彙）預先算好每個詞的干擾選項池，依泰文拼寫與羅馬拼音的相似度排序，
+# 出題時只需從池中抽取，不必掃描整個分類。
+import random
+
+from vocabulary import normalize_english
+
+EXAM_LENGTH = 10
+PRONOUNCE_QUESTIONS = 2  # 前兩題是發音題，其餘是選擇題
+CHOICES = 3  # 正確答案 + 2 個干擾選項
+POOL_SIZE = 8  # 每個詞保留的干擾選項數
+WINDOW = 8  # 排序後取前後幾個鄰居作為候選詞
+
+
+def bigrams(text):
+    text = f" {text} "
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def romanization_key(pronunciation):
+    return normalize_english((pronunciation or "").replace("-", " "))
+
+
+class ExamBuilder:
+    """依詞彙索引建立各分類的干擾選項池，並以 O(k) 抽樣出題"""
+
+    def __init__(self, vocab, pool_size=POOL_SIZE, window=WINDOW):
+        self.vocab = vocab
+        self.pool_size = pool_size
+        self.window = window
+        self.roman = [romanization_key(p) for p in vocab.pronunciation]
+        self.thai_grams = [bigrams(thai) for thai in vocab.normalized_thai]
+        self.roman_grams = [bigrams(roman) for roman in self.roman]
+        self.scopes = {None: range(len(vocab))}
+        self.scopes.update(vocab.category_ids)
+        self.pools = {key: self._build_pools(ids) for key, ids in self.scopes.items()}
+
+    def _build_pools(self, ids):
+        """為範圍內每個詞找出最容易混淆的 pool_size 個詞。
+
+        候選詞取自泰文與羅馬拼音（正序、反序）排序後前後 window 個鄰居，
+        即共用字首或字尾的詞，避免兩兩比較整個分類。
+        """
+        thai, roman = self.vocab.normalized_thai, self.roman
+        orders = [
+            sorted(ids, key=thai.__getitem__),
+            sorted(ids, key=lambda i: thai[i][::-1]),
+            sorted(ids, key=roman.__getitem__),
+            sorted(ids, key=lambda i: roman[i][::-1]),
+        ]
+        candidates = {word_id: set() for word_id in ids}
+        for order in orders:
+            for pos, word_id in enumerate(order):
+                candidates[word_id].update(order[max(0, pos - self.window):pos + self.window + 1])
+
+        thai_grams, roman_grams = self.thai_grams, self.roman_grams
+        pools = {}
+        for word_id, others in candidates.items():
+            word_thai, word_roman = thai[word_id], roman[word_id]
+            grams_t, grams_r = thai_grams[word_id], roman_grams[word_id]
+            size_t, size_r = len(grams_t), len(grams_r)
+            scored = []
+            for other in others:
+                # 拼寫或發音完全相同的詞無法區分，不作為干擾選項
+                if thai[other] == word_thai or roman[other] == word_roman:
+                    continue
+                # Dice 係數：泰文拼寫相似度 + 羅馬拼音相似度
+                other_t, other_r = thai_grams[other], roman_grams[other]
+                scored.append((
+                    2 * len(grams_t & other_t) / ((size_t + len(other_t)) or 1)
+                    + 2 * len(grams_r & other_r) / ((size_r + len(other_r)) or 1),
+                    other
+                ))
+            scored.sort(reverse=True)
+            pools[word_id] = tuple(other for _, other in scored[:self.pool_size])
+        return pools
+
+    def distractors(self, word_id, category=None, count=CHOICES - 1, exclude=()):
+        """從干擾選項池抽取 count 個不重複的詞；池不足時以隨機抽樣補足"""
+        pool = [other for other in self.pools[category].get(word_id, ()) if other not in exclude]
+        chosen = random.sample(pool, min(count, len(pool)))
+        if len(chosen) < count:
+            chosen += self._random_fill(self.scopes[category], count - len(chosen), {word_id, *exclude, *chosen})
+        return chosen
+
+    def _random_fill(self, scope, count, taken, attempts=32):
+        chosen = []
+        for _ in range(attempts):
+            if len(chosen) == count:
+                return chosen
+            other = scope[random.randrange(len(scope))]
+            if other not in taken:
+                taken.add(other)
+                chosen.append(other)
+        # 範圍很小時才會走到這裡
+        rest = [other for other in scope if other not in taken]
+        return chosen + random.sample(rest, min(count - len(chosen), len(rest)))
+
+    def build(self, category=None, length=EXAM_LENGTH):
+        """生成考試題目，確保單次考試不重複出題"""
+        vocab = self.vocab
+        scope = self.scopes[category]
+        selected_ids = random.sample(scope, min(length, len(scope)))
+
+        questions = []
+        used_ids = set()  # 已出過題的詞不作為干擾選項
+        for i, word_id in enumerate(selected_ids):
+            used_ids.add(word_id)
+            if i < PRONOUNCE_QUESTIONS:
+                questions.append({
+                    "type": "pronounce",
+                    "word": vocab.words[word_id],
+                    "image_url": vocab.image_url[word_id],
+                    "thai": vocab.thai[word_id],
+                })
+                continue
+
+            choice_ids = [word_id] + self.distractors(word_id, category, exclude=used_ids)
+            random.shuffle(choice_ids)
+            questions.append({
+                "type": "audio_choice",
+                "audio_url": vocab.audio_url[word_id],
+                "choices": [
+                    {"word": vocab.words[j], "image_url": vocab.image_url[j]}
+                    for j in choice_ids
+                ],
+                "answer": vocab.words[word_id]
+            })
+        return questions
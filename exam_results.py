@@ -0,0 +1,227 @@
+# === exam_results.py - 考試結果的非同步批次寫入 ===
+# 考試結果寫入 users/{id}/exams/{auto-id}，並在同一個 batch 更新 users/{id}/summary/exams
+# 的滾動統計，讓考試歷史圖表不必掃描整個 exams 子集合。
+import atexit
+import logging
+import threading
+
+from metrics import counter, timed
+
+logger = logging.getLogger(__name__)
+
+exam_flushes = counter(
+    "exam_results_flushed_total",
+    "Exam results written by the exam result queue",
+    label_names=("outcome",),
+)
+
+FIRESTORE_BATCH_LIMIT = 500
+RECENT_LIMIT = 30  # 統計文件中保留最近幾次考試（供歷史圖表使用）
+
+
+def stats_ref(db, user_id):
+    return db.collection("users").document(user_id).collection("summary").document("exams")
+
+
+def empty_exam_stats():
+    return {
+        "exams_taken": 0,
+        "questions_total": 0,
+        "correct_total": 0,
+        "answer_seconds_sum": 0.0,
+        "answers_timed": 0,
+        "by_type": {},  # exam_type -> {"count", "correct", "questions", "best_ratio"}
+        "recent": [],   # 最近 RECENT_LIMIT 次 {"timestamp", "exam_type", "score", "total"}
+    }
+
+
+def apply_exam_stats(stats, results):
+    """將一批考試結果套用到統計上，回傳新的統計（不修改原物件）"""
+    updated = empty_exam_stats()
+    if stats:
+        updated.update(stats)
+    by_type = {k: dict(v) for k, v in updated["by_type"].items()}
+    recent = list(updated["recent"])
+
+    for result in results:
+        updated["exams_taken"] += 1
+        updated["questions_total"] += result["total"]
+        updated["correct_total"] += result["score"]
+        for answer in result.get("answers", []):
+            if answer.get("seconds") is not None:
+                updated["answer_seconds_sum"] += answer["seconds"]
+                updated["answers_timed"] += 1
+
+        ratio = result["score"] / result["total"] if result["total"] else 0
+        entry = by_type.setdefault(result["exam_type"], {"count": 0, "correct": 0, "questions": 0, "best_ratio": 0})
+        entry["count"] += 1
+        entry["correct"] += result["score"]
+        entry["questions"] += result["total"]
+        entry["best_ratio"] = max(entry["best_ratio"], ratio)
+
+        recent.append({
+            "timestamp": result["timestamp"],
+            "exam_type": result["exam_type"],
+            "score": result["score"],
+            "total": result["total"],
+        })
+
+    updated["by_type"] = by_type
+    updated["recent"] = recent[-RECENT_LIMIT:]
+    return updated
+
+
+class FirestoreExamBackend:
+    """以 batched write 寫入考試紀錄與統計文件"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def commit(self, results):
+        by_user = {}
+        for result in results:
+            by_user.setdefault(result["user_id"], []).append(result)
+
+        chunk, ops = [], 0
+        for user_id, user_results in by_user.items():
+            if chunk and ops + len(user_results) + 1 > FIRESTORE_BATCH_LIMIT:
+                self._commit_users(chunk)
+                chunk, ops = [], 0
+            chunk.append((user_id, user_results))
+            ops += len(user_results) + 1
+        if chunk:
+            self._commit_users(chunk)
+
+    def _commit_users(self, chunk):
+        refs = [stats_ref(self.db, user_id) for user_id, _ in chunk]
+        snapshots = {snap.reference.path: snap for snap in self.db.get_all(refs)}
+
+        batch = self.db.batch()
+        for (user_id, user_results), ref in zip(chunk, refs):
+            for result in user_results:
+                exam_ref = self.db.collection("users").document(user_id).collection("exams").document(result["id"])
+                batch.set(exam_ref, {k: v for k, v in result.items() if k not in ("user_id", "id")})
+
+            snap = snapshots.get(ref.path)
+            if snap is not None and snap.exists:
+                stats = apply_exam_stats(snap.to_dict(), user_results)
+                batch.update(ref, stats, option=self.db.write_option(last_update_time=snap.update_time))
+            else:
+                batch.create(ref, apply_exam_stats(None, user_results))
+        batch.commit()
+
+    def load_stats(self, user_id):
+        snap = stats_ref(self.db, user_id).get()
+        return snap.to_dict() if snap.exists else None
+
+
+class InMemoryExamBackend:
+    """測試用的記憶體後端"""
+
+    def __init__(self):
+        self.exams = {}  # user_id -> {exam_id: doc}
+        self.stats = {}
+        self.lock = threading.Lock()
+
+    def commit(self, results):
+        with self.lock:
+            by_user = {}
+            for result in results:
+                self.exams.setdefault(result["user_id"], {})[result["id"]] = dict(result)
+                by_user.setdefault(result["user_id"], []).append(result)
+            for user_id, user_results in by_user.items():
+                self.stats[user_id] = apply_exam_stats(self.stats.get(user_id), user_results)
+
+    def load_stats(self, user_id):
+        with self.lock:
+            stats = self.stats.get(user_id)
+            return dict(stats) if stats else None
+
+
+class ExamResultQueue:
+    """考試結束時只放入佇列，由背景執行緒批次寫入"""
+
+    def __init__(self, backend, flush_interval=5.0, max_pending=100, max_queued=10000):
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_queued = max_queued  # 持續寫入失敗時佇列的上限，超出時捨棄最舊的結果
+        self.pending = []
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def enqueue(self, result):
+        """result 需包含 id, user_id, exam_type, score, total, timestamp, answers"""
+        with self.lock:
+            self.pending.append(result)
+            self._trim()
+            should_flush = len(self.pending) >= self.max_pending
+        if should_flush:
+            self.wakeup.set()
+
+    def _trim(self):
+        # 呼叫端需持有 self.lock
+        overflow = len(self.pending) - self.max_queued
+        if overflow > 0:
+            del self.pending[:overflow]
+            exam_flushes.inc(overflow, outcome="dropped")
+            logger.error(f"❌ Exam result queue full, dropped {overflow} oldest results")
+
+    def pending_for(self, user_id):
+        with self.lock:
+            return [r for r in self.pending if r["user_id"] == user_id]
+
+    def load_stats(self, user_id):
+        """讀取統計文件並套用尚未寫入的結果"""
+        stats = self.backend.load_stats(user_id)
+        pending = self.pending_for(user_id)
+        if pending:
+            stats = apply_exam_stats(stats, pending)
+        return stats
+
+    def flush(self):
+        with self.flush_lock:
+            with self.lock:
+                if not self.pending:
+                    return 0
+                results, self.pending = self.pending, []
+
+            try:
+                with timed("firestore_exam_flush"):
+                    self.backend.commit(results)
+            except Exception as e:
+                logger.error(f"❌ Exam result flush failed, re-queueing {len(results)} results: {e}")
+                exam_flushes.inc(len(results), outcome="error")
+                with self.lock:
+                    self.pending = results + self.pending
+                    self._trim()
+                return 0
+
+            exam_flushes.inc(len(results), outcome="ok")
+            logger.info(f"✅ Flushed {len(results)} exam results")
+            return len(results)
+
+    def _run(self):
+        while not self.closed:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Exam result queue loop error: {e}")
+
+    def close(self):
+        self.closed = True
+        self.wakeup.set()
+        self.flush()
+
+
+def create_exam_result_queue(backend, **kwargs):
+    """建立佇列並在程式結束時自動寫入剩餘結果"""
+    queue = ExamResultQueue(backend, **kwargs)
+    atexit.register(queue.close)
+    return queue
@@ -0,0 +1,29 @@
+# === gunicorn.conf.py - worker 共用資源預先載入 ===
+# gunicorn 啟動時自動讀取此檔（在 master 執行）。PRELOAD_SHARED=1 時在 fork worker 之前
+# 載入唯讀共用資源並 gc.freeze()，之後的 GC 不會碰觸這些物件，記憶體頁面維持 copy-on-write 共用。
+# 不使用 preload_app：應用程式的背景執行緒（寫入、重載、清理）無法跨 fork，仍由各 worker 自行匯入。
+# 其餘設定（bind、workers、timeout）沿用命令列參數。
+import gc
+import os
+
+PRELOAD_SHARED = os.environ.get("PRELOAD_SHARED") == "1"
+
+if PRELOAD_SHARED:
+    import logging
+
+    from preload import preload
+
+    logging.basicConfig(level=logging.INFO)
+    # 載入期間暫停 GC，避免 freeze 前的回收在各頁面留下零碎的空洞
+    gc.disable()
+    preload(
+        model=os.environ.get("PRELOAD_MODEL", "1") == "1",
+        references=os.environ.get("PRELOAD_REFERENCES", "1") == "1",
+    )
+    gc.freeze()
+    gc.enable()
+
+
+def post_fork(server, worker):
+    if PRELOAD_SHARED:
+        worker.log.info(f"Worker {worker.pid} sharing {gc.get_freeze_count()} preloaded objects")
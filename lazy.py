@@ -0,0 +1,117 @@
+# === lazy.py - 延遲匯入與延遲初始化 ===
+# torch、Azure Speech SDK、Google Cloud 與 Firebase 的匯入與用戶端建立都很慢；
+# 改為第一次使用時才匯入 / 建立，或在 worker 開始服務後由背景暖機執行緒預先完成，
+# 讓 worker 啟動時不必等待這些後端。
+import importlib
+import logging
+import threading
+import time
+
+from metrics import histogram
+
+logger = logging.getLogger(__name__)
+
+init_latency = histogram(
+    "lazy_init_seconds",
+    "Time spent importing or constructing a deferred backend",
+    label_names=("name", "kind"),
+)
+
+# 名稱 -> LazyModule / Lazy，供狀態查詢與暖機使用
+_registry = {}
+
+
+class LazyModule:
+    """第一次存取屬性時才匯入的模組"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self.seconds = None
+        _registry[name] = self
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def load(self):
+        module = self._module
+        if module is None:
+            start = time.perf_counter()
+            module = importlib.import_module(self._name)  # importlib 本身有匯入鎖
+            self.seconds = time.perf_counter() - start
+            init_latency.observe(self.seconds, name=self._name, kind="import")
+            self._module = module
+            logger.info(f"Imported {self._name} in {self.seconds:.2f}s")
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __repr__(self):
+        return f"<lazy module {self._name!r} {'loaded' if self.loaded else 'not loaded'}>"
+
+
+class Lazy:
+    """第一次使用時才建立的物件；屬性存取會轉給實際物件。factory 回傳 None 視為失敗，下次再試"""
+
+    def __init__(self, name, factory):
+        self._name = name
+        self._factory = factory
+        self._value = None
+        self._lock = threading.Lock()
+        self.seconds = None
+        _registry[name] = self
+
+    @property
+    def loaded(self):
+        return self._value is not None
+
+    def load(self):
+        value = self._value
+        if value is None:
+            with self._lock:
+                value = self._value
+                if value is None:
+                    start = time.perf_counter()
+                    value = self._factory()
+                    self.seconds = time.perf_counter() - start
+                    init_latency.observe(self.seconds, name=self._name, kind="init")
+                    self._value = value
+                    if value is not None:
+                        logger.info(f"Initialized {self._name} in {self.seconds:.2f}s")
+        return value
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __repr__(self):
+        return f"<lazy {self._name!r} {'loaded' if self.loaded else 'not loaded'}>"
+
+
+def lazy_import(name):
+    return _registry.get(name) or LazyModule(name)
+
+
+def warm_up(names, delay=0.0):
+    """在背景執行緒依序載入指定的後端（worker 已開始接受連線後才進行）"""
+    def run():
+        if delay:
+            time.sleep(delay)
+        for name in names:
+            try:
+                _registry[name].load()
+            except Exception as e:
+                logger.warning(f"Warm-up of {name} failed: {e}")
+
+    thread = threading.Thread(target=run, name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def init_status():
+    """{名稱: {"loaded": bool, "seconds": 載入耗時}}"""
+    return {
+        name: {"loaded": item.loaded, "seconds": item.seconds}
+        for name, item in sorted(_registry.items())
+    }
@@ -0,0 +1,263 @@
+# === line_client.py - LINE Messaging API 用戶端 ===
+# 以共用連線池（keep-alive）送出請求，429 / 5xx 時依 Retry-After 或指數退避自動重試；
+# 推播帶 X-Line-Retry-Key，重試不會重複送達（已被接受的 retry key 回應 409，視為成功）。
+# 回覆權杖只能使用一次，回覆只在連線建立失敗（請求未送出）時重試；本月額度用盡的 429 不重試。
+# coalescing() 區塊內連續推播給同一使用者的訊息合併成一次請求（LINE 上限 5 則），並統計推播訊息數與本月額度。
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from linebot import LineBotApi
+from linebot.exceptions import LineBotApiError
+from linebot.http_client import RequestsHttpClient, RequestsHttpResponse
+
+from metrics import counter, gauge, timed
+from reply_templates import request_body
+
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGES = 5  # 單次 reply / push 最多 5 則訊息
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+REPLY_PATH = "/v2/bot/message/reply"
+PUSH_PATH = "/v2/bot/message/push"
+MULTICAST_PATH = "/v2/bot/message/multicast"
+RATE_LIMIT_RETRIES = 2
+
+line_push_requests = counter(
+    "line_push_requests_total",
+    "Push API requests sent to LINE",
+    label_names=("outcome",),
+)
+line_push_messages = counter(
+    "line_push_messages_total",
+    "Messages delivered through the push API (counted against the monthly quota)",
+)
+line_push_coalesced = counter(
+    "line_push_coalesced_total",
+    "Push requests saved by merging consecutive pushes to the same user",
+)
+
+
+def is_quota_exhausted(error):
+    """429 是否為本月推播額度用盡（而非速率限制）"""
+    message = getattr(getattr(error, "error", None), "message", None) or ""
+    return error.status_code == 429 and "monthly limit" in message.lower()
+
+
+class LineRetry(Retry):
+    """POST 的 429 不在傳輸層重試：可能是本月額度用盡，無法從回應標頭區分（速率限制由 LineClient._push 重試）"""
+
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if status_code == 429 and method.upper() == "POST":
+            return False
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+class PooledHttpClient(RequestsHttpClient):
+    """以 requests.Session 取代每次新建連線的 RequestsHttpClient"""
+
+    def __init__(self, timeout=RequestsHttpClient.DEFAULT_TIMEOUT, pool_size=10, retries=3, backoff=0.5):
+        super().__init__(timeout)
+        self.pool_size = pool_size
+        retry = LineRetry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=None,  # POST 也重試：推播與 multicast 帶 retry key（回覆另見 mount_single_use）
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        # 只重試連線建立失敗：請求尚未送出，不會重複使用一次性的權杖
+        self.connect_only_retry = Retry(
+            total=retries, connect=retries, read=0, status=0, other=0,
+            backoff_factor=backoff,
+            allowed_methods=None,
+            respect_retry_after_header=False,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def mount_single_use(self, url_prefix):
+        """url_prefix 下的請求（如 reply）只在連線失敗時重試；逾時或 5xx 時 LINE 可能已處理請求"""
+        self.session.mount(url_prefix, HTTPAdapter(pool_maxsize=self.pool_size, max_retries=self.connect_only_retry))
+
+    def get(self, url, headers=None, params=None, stream=False, timeout=None):
+        response = self.session.get(
+            url, headers=headers, params=params, stream=stream,
+            timeout=self.timeout if timeout is None else timeout
+        )
+        return RequestsHttpResponse(response)
+
+    def post(self, url, headers=None, data=None, timeout=None):
+        response = self.session.post(url, headers=headers, data=data, timeout=self.timeout if timeout is None else timeout)
+        return RequestsHttpResponse(response)
+
+    def put(self, url, headers=None, data=None, timeout=None):
+        response = self.session.put(url, headers=headers, data=data, timeout=self.timeout if timeout is None else timeout)
+        return RequestsHttpResponse(response)
+
+    def delete(self, url, headers=None, data=None, timeout=None):
+        response = self.session.delete(url, headers=headers, data=data, timeout=self.timeout if timeout is None else timeout)
+        return RequestsHttpResponse(response)
+
+
+class LineClient(LineBotApi):
+    """加上計時、推播合併與額度統計的 LineBotApi"""
+
+    def __init__(self, channel_access_token, quota_refresh=300, **kwargs):
+        kwargs.setdefault("http_client", PooledHttpClient)
+        super().__init__(channel_access_token, **kwargs)
+        if isinstance(self.http_client, PooledHttpClient):
+            self.http_client.mount_single_use(self.endpoint + REPLY_PATH)
+        self.quota_refresh = quota_refresh
+        self._local = threading.local()
+        self._quota = None
+        self._quota_checked = None
+        self._quota_lock = threading.Lock()
+
+    def reply_message(self, reply_token, messages, notification_disabled=False, timeout=None):
+        # 先送出區塊內尚未送出的推播，維持訊息順序
+        self._flush_pending()
+        with timed("line_reply"):
+            self._send_messages(REPLY_PATH, messages, notification_disabled=notification_disabled,
+                                timeout=timeout, replyToken=reply_token)
+
+    def push_message(self, to, messages, retry_key=None, **kwargs):
+        if not isinstance(messages, (list, tuple)):
+            messages = [messages]
+        if not getattr(self._local, "active", False) or retry_key or kwargs:
+            self._flush_pending()
+            return self._push(to, list(messages), retry_key, **kwargs)
+
+        local = self._local
+        if local.to != to:
+            self._flush_pending()
+            local.to = to
+        local.messages.extend(messages)
+        local.calls += 1
+        while len(local.messages) > MAX_MESSAGES:
+            self._flush_pending(MAX_MESSAGES)
+
+    @contextmanager
+    def coalescing(self):
+        """區塊內的推播先暫存，同一使用者的連續推播合併送出；離開區塊時送出剩餘訊息"""
+        local = self._local
+        if getattr(local, "active", False):
+            yield
+            return
+        local.active, local.to, local.messages, local.calls, local.requests = True, None, [], 0, 0
+        try:
+            yield
+        finally:
+            self._flush_pending()
+            local.active = False
+            if local.calls > local.requests:
+                line_push_coalesced.inc(local.calls - local.requests)
+
+    def _flush_pending(self, limit=None):
+        """送出暫存的推播（最多 limit 則）；錯誤只記錄，原本的呼叫端已無法處理"""
+        local = self._local
+        if not getattr(local, "active", False) or not local.messages:
+            return
+        batch = local.messages[:limit] if limit else local.messages
+        local.messages = local.messages[len(batch):]
+        try:
+            for start in range(0, len(batch), MAX_MESSAGES):
+                local.requests += 1
+                self._push(local.to, batch[start:start + MAX_MESSAGES])
+        except Exception as e:
+            logger.error(f"Failed to push {len(batch)} coalesced messages to {local.to}: {e}")
+
+    def multicast(self, to, messages, retry_key=None, notification_disabled=False,
+                  custom_aggregation_units=None, timeout=None):
+        self._send_messages(MULTICAST_PATH, messages, retry_key, notification_disabled,
+                            custom_aggregation_units, timeout, to=to)
+
+    def _send_messages(self, path, messages, retry_key=None, notification_disabled=False,
+                       custom_aggregation_units=None, timeout=None, **fields):
+        """送出 reply / push / multicast：預先序列化的模板訊息直接拼進請求內容（見 reply_templates.request_body）。
+        retry key 只放在本次請求的標頭；SDK 會把它留在共用的 self.headers，並行推播時可能帶到別的請求"""
+        if not isinstance(messages, (list, tuple)):
+            messages = [messages]
+        fields["notificationDisabled"] = notification_disabled
+        if custom_aggregation_units is not None:
+            if not isinstance(custom_aggregation_units, (list, tuple)):
+                custom_aggregation_units = [custom_aggregation_units]
+            fields["customAggregationUnits"] = custom_aggregation_units
+        headers = {"Content-Type": "application/json"}
+        if retry_key:
+            headers["X-Line-Retry-Key"] = retry_key
+        self._post(path, data=request_body(messages, **fields), headers=headers, timeout=timeout)
+
+    def _push(self, to, messages, retry_key=None, **kwargs):
+        # 所有重試沿用同一個 retry key
+        retry_key = retry_key or str(uuid.uuid4())
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            try:
+                with timed("line_push"):
+                    result = self._send_messages(PUSH_PATH, messages, retry_key, to=to, **kwargs)
+                break
+            except LineBotApiError as e:
+                if e.status_code == 409:
+                    # 此 retry key 先前已被接受（回應遺失後由傳輸層重送），訊息已送達
+                    line_push_requests.inc(outcome="duplicate")
+                    return None
+                if e.status_code == 429 and not is_quota_exhausted(e) and attempt < RATE_LIMIT_RETRIES:
+                    time.sleep(retry_delay(e, attempt))
+                    continue
+                line_push_requests.inc(outcome="quota_exhausted" if is_quota_exhausted(e) else "error")
+                raise
+            except Exception:
+                line_push_requests.inc(outcome="error")
+                raise
+        line_push_requests.inc(outcome="ok")
+        line_push_messages.inc(len(messages))
+        return result
+
+    def push_quota(self):
+        """本月推播額度 {"limit": 上限或 None, "used": 已使用}；最多每 quota_refresh 秒向 LINE 查詢一次"""
+        with self._quota_lock:
+            now = time.monotonic()
+            if self._quota_checked is None or now - self._quota_checked >= self.quota_refresh:
+                self._quota_checked = now
+                try:
+                    quota = self.get_message_quota()
+                    consumption = self.get_message_quota_consumption()
+                    self._quota = {
+                        "limit": quota.value if quota.type == "limited" else None,
+                        "used": consumption.total_usage,
+                    }
+                except Exception as e:
+                    logger.warning(f"Failed to query LINE message quota: {e}")
+            return self._quota
+
+
+def retry_delay(error, attempt, backoff=0.5):
+    """速率限制的等待秒數：優先使用 Retry-After，否則指數退避"""
+    try:
+        return float((error.headers or {}).get("Retry-After"))
+    except (TypeError, ValueError):
+        return backoff * 2 ** attempt
+
+
+def register_quota_metrics(client):
+    def used():
+        quota = client.push_quota()
+        return {(): quota["used"]} if quota else {}
+
+    def remaining():
+        quota = client.push_quota()
+        if not quota or quota["limit"] is None:
+            return {}
+        return {(): quota["limit"] - quota["used"]}
+
+    gauge("line_push_quota_used", "Push messages used this month according to LINE", callback=used)
+    gauge("line_push_quota_remaining", "Push messages left in this month's quota", callback=remaining)
@@ -0,0 +1,234 @@
+# === maintenance.py - 背景維護排程 ===
+# 每個 worker 只有一個維護執行緒，依序執行已註冊的工作（模型清理、暫存檔過期等）；
+# 執行間隔加入隨機抖動，避免各 worker 同時醒來。leader_only 的工作只在取得檔案鎖的 worker 執行，
+# 該 worker 結束時鎖由系統釋放，其他 worker 在下一次排程時接手。
+import collections
+import fcntl
+import heapq
+import logging
+import os
+import random
+import threading
+import time
+
+from metrics import counter, gauge, histogram
+
+logger = logging.getLogger(__name__)
+
+job_latency = histogram(
+    "maintenance_job_seconds",
+    "Runtime of background maintenance jobs",
+    label_names=("job", "outcome"),
+)
+jobs_skipped = counter(
+    "maintenance_job_skipped_total",
+    "Leader-only maintenance runs skipped because this worker is not the leader",
+    label_names=("job",),
+)
+
+
+class LeaderLock:
+    """以 flock 選出一個 worker 作為 leader；不阻塞，取得後持有到行程結束"""
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+        self.pid = None
+
+    def is_leader(self):
+        if self.fd is not None and self.pid == os.getpid():
+            return True
+        # fork 繼承的檔案描述子與父行程共用同一把鎖，必須重新開檔
+        self.fd, self.pid = None, os.getpid()
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(self.pid).encode())
+        self.fd = fd
+        logger.info(f"Worker {self.pid} is now the maintenance leader")
+        return True
+
+
+class Job:
+    __slots__ = ("name", "interval", "func", "leader_only", "jitter",
+                 "last_run", "last_seconds", "last_outcome", "next_run")
+
+    def __init__(self, name, interval, func, leader_only, jitter):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.leader_only = leader_only
+        self.jitter = jitter
+        self.last_run = None
+        self.last_seconds = None
+        self.last_outcome = None
+        self.next_run = None
+
+    def delay(self):
+        return self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+
+class MaintenanceScheduler:
+    """register() 註冊工作，start() 在 worker 內啟動執行緒（gunicorn master 只註冊不啟動）"""
+
+    def __init__(self, lock_path, jitter=0.1):
+        self.leader = LeaderLock(lock_path)
+        self.jitter = jitter
+        self.jobs = {}
+        self.heap = []
+        self.condition = threading.Condition()
+        self.thread = None
+        self.pid = None
+
+    def register(self, name, interval, func, leader_only=False, jitter=None):
+        """每 interval 秒（±jitter 比例）執行一次 func；leader_only 時只有一個 worker 執行"""
+        job = Job(name, interval, func, leader_only, self.jitter if jitter is None else jitter)
+        with self.condition:
+            self.jobs[name] = job
+            if self.pid == os.getpid():
+                self._schedule(job)
+                self.condition.notify()
+        return job
+
+    def _schedule(self, job):
+        job.next_run = time.monotonic() + job.delay()
+        heapq.heappush(self.heap, (job.next_run, job.name))
+
+    def start(self):
+        """啟動維護執行緒；fork 後的子行程呼叫時會重新建立（執行緒不會跨 fork）"""
+        with self.condition:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            self.heap = []
+            for job in self.jobs.values():
+                self._schedule(job)
+            self.thread = threading.Thread(target=self._run, name="maintenance", daemon=True)
+            self.thread.start()
+
+    def run_now(self, name):
+        """立即執行一次（不影響下一次排程）"""
+        return self._execute(self.jobs[name])
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.heap or self.heap[0][0] > time.monotonic():
+                    self.condition.wait(self.heap[0][0] - time.monotonic() if self.heap else None)
+                _, name = heapq.heappop(self.heap)
+                job = self.jobs.get(name)
+                if job is None:
+                    continue
+            self._execute(job)
+            with self.condition:
+                self._schedule(job)
+
+    def _execute(self, job):
+        if job.leader_only and not self.leader.is_leader():
+            jobs_skipped.inc(job=job.name)
+            return None
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            result = job.func()
+            outcome = "ok"
+            return result
+        except Exception as e:
+            logger.error(f"Maintenance job {job.name} failed: {e}")
+        finally:
+            job.last_seconds = time.perf_counter() - start
+            job.last_run = time.time()
+            job.last_outcome = outcome
+            job_latency.observe(job.last_seconds, job=job.name, outcome=outcome)
+
+    def status(self):
+        now = time.monotonic()
+        return {
+            "leader": self.leader.fd is not None and self.leader.pid == os.getpid(),
+            "jobs": {
+                name: {
+                    "interval": job.interval,
+                    "leader_only": job.leader_only,
+                    "last_run": job.last_run,
+                    "last_seconds": job.last_seconds,
+                    "last_outcome": job.last_outcome,
+                    "next_run_in": None if job.next_run is None else round(job.next_run - now, 1),
+                }
+                for name, job in self.jobs.items()
+            },
+        }
+
+
+class TempFileIndex:
+    """記錄本 worker 建立的暫存檔（依建立時間排序），過期時只處理佇列前端，不需掃描整個目錄"""
+
+    def __init__(self, directory, max_age=3600):
+        self.directory = directory
+        self.max_age = max_age
+        self.entries = collections.deque()  # (建立時間, 路徑)
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def track(self, *paths):
+        now = time.time()
+        with self.lock:
+            for path in paths:
+                self.entries.append((now, path))
+
+    def expire(self):
+        """刪除超過 max_age 的暫存檔（正常流程已刪除的檔案直接略過）；回傳刪除數量"""
+        cutoff = time.time() - self.max_age
+        removed = 0
+        while True:
+            with self.lock:
+                if not self.entries or self.entries[0][0] > cutoff:
+                    break
+                _, path = self.entries.popleft()
+            try:
+                os.remove(path)
+                removed += 1
+                logger.info(f"Cleaned up temporary file: {path}")
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Failed to remove temporary file {path}: {e}")
+        return removed
+
+    def pending(self):
+        return len(self.entries)
+
+    def sweep(self):
+        """完整掃描目錄，清除已結束的 worker 遺留、不在任何索引中的過期檔案（由 leader 低頻執行）"""
+        cutoff = time.time() - self.max_age
+        removed = 0
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file() and entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+                        removed += 1
+                except OSError:
+                    pass
+        if removed:
+            logger.info(f"Swept {removed} orphaned temporary files from {self.directory}")
+        return removed
+
+
+# 全域排程器：各模組在匯入時註冊工作，thai_learning 在 worker 內呼叫 start()
+scheduler = MaintenanceScheduler(
+    os.environ.get(
+        "MAINTENANCE_LOCK",
+        os.path.join(os.environ.get("TEMP", "/tmp"), "thai_learning_maintenance.lock")
+    ),
+    jitter=float(os.environ.get("MAINTENANCE_JITTER", 0.1)),
+)
+
+gauge(
+    "maintenance_leader",
+    "1 when this worker runs the leader-only maintenance jobs",
+    callback=lambda: int(scheduler.status()["leader"])
+)
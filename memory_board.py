@@ -0,0 +1,113 @@
+# === memory_board.py - 記憶翻牌遊戲的 Flex 畫面 ===
+# 卡片正面只由（詞彙索引, 詞彙 ID, 卡片種類）決定，背面只由（卡片種類, 卡片編號）決定，
+# 兩者都快取成共用的 JSON 片段；每次翻牌只需依已翻開 / 已配對的位元遮罩挑選片段組成輪播。
+# 快取的片段會被多個訊息共用，呼叫端不可修改。
+from functools import lru_cache
+
+ROW_SIZE = 4  # 每列最多 4 張卡
+
+
+@lru_cache(maxsize=4096)
+def card_front(table, vocab, kind):
+    """翻開（或已配對）的卡片"""
+    if kind == 'image':
+        return {
+            "type": "box",
+            "layout": "vertical",
+            "width": "60px",
+            "height": "80px",
+            "backgroundColor": "#E6F5FF",
+            "cornerRadius": "4px",
+            "borderWidth": "1px",
+            "borderColor": "#AAAAAA",
+            "contents": [
+                {"type": "image", "url": table.image_url[vocab], "size": "full", "aspectMode": "cover", "aspectRatio": "1:1"},
+                {"type": "text", "text": table.words[vocab], "size": "xxs", "align": "center", "wrap": True, "maxLines": 2}
+            ]
+        }
+    return {
+        "type": "box",
+        "layout": "vertical",
+        "width": "60px",
+        "height": "80px",
+        "backgroundColor": "#FFF4E6",
+        "cornerRadius": "4px",
+        "borderWidth": "1px",
+        "borderColor": "#AAAAAA",
+        "contents": [
+            {"type": "text", "text": "🎵", "size": "lg", "align": "center", "color": "#FF6B6E"},
+            {"type": "text", "text": table.thai[vocab], "size": "xxs", "align": "center", "wrap": True, "maxLines": 2}
+        ],
+        "action": {"type": "message", "text": f"Play Audio:{table.words[vocab]}"}
+    }
+
+
+@lru_cache(maxsize=256)
+def card_back(kind, card_id):
+    """蓋著的卡片"""
+    return {
+        "type": "box",
+        "layout": "vertical",
+        "width": "60px",
+        "height": "80px",
+        "backgroundColor": "#4A86E8" if kind == "image" else "#FFA94D",
+        "cornerRadius": "4px",
+        "borderWidth": "1px",
+        "borderColor": "#0B5ED7",
+        "contents": [
+            {"type": "text", "text": "🖼️" if kind == "image" else "🎧", "color": "#FFFFFF", "align": "center", "gravity": "center", "size": "xl"},
+            {"type": "text", "text": f"{card_id}", "color": "#FFFFFF", "align": "center", "size": "sm"}
+        ],
+        "action": {"type": "message", "text": f"Flip Card:{card_id}"}
+    }
+
+
+def id_mask(card_ids):
+    """卡片編號集合 -> 位元遮罩"""
+    mask = 0
+    for card_id in card_ids:
+        mask |= 1 << card_id
+    return mask
+
+
+def info_bubble(category_name, remaining_time):
+    return {
+        "type": "bubble",
+        "header": {
+            "type": "box",
+            "layout": "vertical",
+            "contents": [
+                {"type": "text", "text": "Thai Memory Card Game", "weight": "bold", "size": "xl", "color": "#ffffff"},
+                {"type": "text", "text": category_name, "size": "md", "color": "#ffffff"}
+            ],
+            "backgroundColor": "#4A86E8",
+            "paddingBottom": "10px"
+        },
+        "body": {
+            "type": "box",
+            "layout": "vertical",
+            "contents": [
+                {
+                    "type": "box",
+                    "layout": "horizontal",
+                    "justifyContent": "center",
+                    "contents": [
+                        {"type": "text", "text": "⏱️Time Remaining:", "size": "sm", "color": "#555555", "flex": 2},
+                        {"type": "text", "text": f"{remaining_time} sec", "size": "sm", "color": "#111111", "flex": 1}
+                    ]
+                }
+            ]
+        }
+    }
+
+
+def render_board(cards, face_up, category_name, remaining_time):
+    """組成遊戲畫面的 carousel；face_up 是翻開或已配對卡片的位元遮罩"""
+    bubbles = [info_bubble(category_name, remaining_time)]
+    for start in range(0, len(cards), ROW_SIZE):
+        contents = [
+            card_front(card.table, card.vocab, card.kind) if face_up >> card.id & 1 else card_back(card.kind, card.id)
+            for card in cards[start:start + ROW_SIZE]
+        ]
+        bubbles.append({"type": "bubble", "body": {"type": "box", "layout": "horizontal", "contents": contents}})
+    return {"type": "carousel", "contents": bubbles}
@@ -0,0 +1,203 @@
+# === metrics.py - 指標收集與 Prometheus 輸出 ===
+import bisect
+import threading
+import time
+from contextlib import ContextDecorator, contextmanager
+
+# 預設延遲分桶（秒），涵蓋 LINE / GCS / STT 的常見延遲範圍
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0)
+
+
+class Histogram:
+    """帶標籤的延遲直方圖（累積分桶，與 Prometheus 格式相容）"""
+
+    def __init__(self, name, description="", label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self.lock = threading.Lock()
+        # 標籤值 tuple -> [各分桶計數..., +Inf 計數], 總和
+        self.counts = {}
+        self.sums = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def observe(self, value, **labels):
+        """記錄一次觀測值"""
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            counts = self.counts.get(key)
+            if counts is None:
+                counts = [0] * (len(self.buckets) + 1)
+                self.counts[key] = counts
+                self.sums[key] = 0.0
+            counts[index] += 1
+            self.sums[key] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """以 with 區塊計時並記錄"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        """回傳 {標籤 tuple: (累積分桶, 總數, 總和)}"""
+        with self.lock:
+            items = [(key, list(counts), self.sums[key]) for key, counts in self.counts.items()]
+        result = {}
+        for key, counts, total_sum in items:
+            cumulative = []
+            running = 0
+            for count in counts:
+                running += count
+                cumulative.append(running)
+            result[key] = (cumulative, running, total_sum)
+        return result
+
+
+class Counter:
+    """帶標籤的累加計數器"""
+
+    def __init__(self, name, description="", label_names=()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.values)
+
+
+class CallbackGauge:
+    """輸出時才向 callback 取值的量測值；callback 回傳數字或 {標籤 tuple: 數值}"""
+
+    def __init__(self, name, description="", label_names=(), callback=None):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self.callback = callback
+
+    def snapshot(self):
+        value = self.callback()
+        if isinstance(value, dict):
+            return value
+        return {(): value}
+
+
+# 全局註冊表
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _get_or_create(name, factory):
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = factory()
+            _registry[name] = metric
+        return metric
+
+
+def histogram(name, description="", label_names=(), buckets=DEFAULT_BUCKETS):
+    """取得（或建立）指定名稱的直方圖"""
+    return _get_or_create(name, lambda: Histogram(name, description, label_names, buckets))
+
+
+def counter(name, description="", label_names=()):
+    """取得（或建立）指定名稱的計數器"""
+    return _get_or_create(name, lambda: Counter(name, description, label_names))
+
+
+def gauge(name, description="", label_names=(), callback=None):
+    """註冊以 callback 取值的量測值"""
+    return _get_or_create(name, lambda: CallbackGauge(name, description, label_names, callback))
+
+
+# === 各處理階段計時 ===
+stage_latency = histogram(
+    "stage_latency_seconds",
+    "Latency of each request-handling stage",
+    label_names=("stage", "outcome"),
+)
+
+
+class timed(ContextDecorator):
+    """計時 API，可當作 with 區塊或裝飾器使用；發生例外時 outcome 為 error
+
+        with timed("gcs_upload"):
+            ...
+
+        @timed("text_message")
+        def handle_text_message(event):
+            ...
+    """
+
+    def __init__(self, stage, metric=None):
+        self.stage = stage
+        self.metric = metric or stage_latency
+        self._local = threading.local()
+
+    def __enter__(self):
+        # 以執行緒區域堆疊保存起始時間，讓同一個裝飾器可被並行與遞迴呼叫
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append(time.perf_counter())
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._local.stack.pop()
+        self.metric.observe(elapsed, stage=self.stage, outcome="error" if exc_type else "ok")
+        return False
+
+
+# === Prometheus 文字格式輸出 ===
+def _format_labels(label_names, key, extra=None):
+    pairs = list(zip(label_names, key))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def render_prometheus():
+    """輸出所有已註冊指標（text/plain; version=0.0.4）"""
+    with _registry_lock:
+        metrics = sorted(_registry.values(), key=lambda m: m.name)
+
+    lines = []
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.description}")
+        if isinstance(metric, Histogram):
+            lines.append(f"# TYPE {metric.name} histogram")
+            for key, (cumulative, count, total_sum) in sorted(metric.snapshot().items()):
+                for bound, bucket_count in zip(metric.buckets, cumulative):
+                    lines.append(f"{metric.name}_bucket{_format_labels(metric.label_names, key, ('le', repr(float(bound))))} {bucket_count}")
+                lines.append(f"{metric.name}_bucket{_format_labels(metric.label_names, key, ('le', '+Inf'))} {count}")
+                lines.append(f"{metric.name}_sum{_format_labels(metric.label_names, key)} {total_sum}")
+                lines.append(f"{metric.name}_count{_format_labels(metric.label_names, key)} {count}")
+        else:
+            metric_type = "counter" if isinstance(metric, Counter) else "gauge"
+            lines.append(f"# TYPE {metric.name} {metric_type}")
+            try:
+                values = metric.snapshot()
+            except Exception:
+                continue
+            for key, value in sorted(values.items()):
+                lines.append(f"{metric.name}{_format_labels(metric.label_names, key)} {value}")
+    return "\n".join(lines) + "\n"
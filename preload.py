@@ -0,0 +1,179 @@
+# === preload.py - 在 gunicorn master 預先載入唯讀共用資源 ===
+# PRELOAD_SHARED=1 時由 gunicorn.conf.py 在 fork 之前呼叫 preload()：詞彙索引、出題器、
+# 參考音檔嵌入與 SpeechBrain 模型只載入一次，gc.freeze() 後各 worker 以 copy-on-write 共用記憶體頁面。
+# 應用程式（及其背景執行緒）仍在各 worker 內匯入；worker 從這裡取得已載入的資源而不重新載入。
+#
+# 用法：python -m preload build-references [--out vocab/ref_embeddings.npz]   預先計算參考音檔嵌入
+#       python -m preload report <gunicorn master pid>                        各 worker 的獨佔 / 共用記憶體
+import logging
+import os
+import time
+
+import psutil
+
+from metrics import gauge
+
+logger = logging.getLogger(__name__)
+
+REFERENCES_PATH = os.environ.get(
+    "REFERENCE_EMBEDDINGS", os.path.join(os.path.dirname(os.path.abspath(__file__)), "vocab", "ref_embeddings.npz")
+)
+
+# 名稱 -> 預先載入的資源；只在 master 寫入，worker 唯讀
+_shared = {}
+
+
+def preload(model=True, references=True):
+    """在 master 載入共用資源（不執行推論，避免 fork 前啟動 torch 執行緒池）"""
+    from exam_builder import ExamBuilder
+    from vocab_pack import default_pack_path, load_vocabulary
+
+    start = time.perf_counter()
+    path = default_pack_path()
+    mtime = os.stat(path).st_mtime_ns
+    index = load_vocabulary(path)
+    _shared["vocabulary"] = (path, mtime, index)
+    _shared["exam_builder"] = ExamBuilder(index)
+
+    if references and os.path.exists(REFERENCES_PATH):
+        _shared["references"] = load_references(REFERENCES_PATH)
+
+    if model:
+        from speechbrain_manager import speech_manager
+        if speech_manager.pin(quantize=os.environ.get("PRELOAD_QUANTIZE") == "1"):
+            _shared["speechbrain"] = speech_manager.model
+
+    _shared["pid"] = os.getpid()
+    logger.info(f"Preloaded {', '.join(sorted(k for k in _shared if k != 'pid'))} "
+                f"in {time.perf_counter() - start:.1f}s (pid {os.getpid()})")
+
+
+def shared(name):
+    return _shared.get(name)
+
+
+def is_preloaded():
+    """目前行程是否繼承了 master 預先載入的資源"""
+    return "pid" in _shared
+
+
+# === 參考音檔嵌入 ===
+def load_references(path):
+    """npz：urls（N）與 embeddings（N × 維度，float32）；整個矩陣是一塊連續記憶體"""
+    import numpy as np
+
+    with np.load(path) as data:
+        embeddings = np.ascontiguousarray(data["embeddings"], dtype=np.float32)
+        rows = {url: row for row, url in enumerate(data["urls"].tolist())}
+    embeddings.setflags(write=False)
+    logger.info(f"Loaded {len(rows)} reference embeddings from {path}")
+    return rows, embeddings
+
+
+def reference_embedding(url):
+    """回傳參考音檔的嵌入向量（numpy 唯讀 view），沒有預先計算時回傳 None"""
+    references = _shared.get("references")
+    if references is None or not url:
+        return None
+    row = references[0].get(url)
+    return None if row is None else references[1][row]
+
+
+def build_references(out, limit=None):
+    """下載詞彙包中所有參考音檔並計算嵌入（與 verify_files 相同，未正規化）"""
+    import tempfile
+
+    import numpy as np
+    import requests
+
+    from speechbrain_manager import speech_manager
+    from vocab_pack import default_pack_path, load_vocabulary
+
+    index = load_vocabulary(default_pack_path())
+    if not speech_manager.init_model():
+        raise RuntimeError("SpeechBrain model could not be loaded")
+    urls = sorted({url for url in index.audio_url if url})[:limit]
+    done, embeddings = [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        for i, url in enumerate(urls):
+            try:
+                response = requests.get(url, timeout=30)
+                response.raise_for_status()
+                path = os.path.join(tmp, "ref" + os.path.splitext(url)[1])
+                with open(path, "wb") as f:
+                    f.write(response.content)
+                embeddings.append(speech_manager.embed_file(path))
+                done.append(url)
+            except Exception as e:
+                logger.warning(f"Skipping reference audio {url}: {e}")
+            if (i + 1) % 100 == 0:
+                logger.info(f"{i + 1}/{len(urls)} reference audio files processed")
+    np.savez(out, urls=np.array(done), embeddings=np.stack(embeddings).astype(np.float32))
+    logger.info(f"Saved {len(done)} reference embeddings to {out}")
+
+
+# === 記憶體報告 ===
+def memory_report(pid=None):
+    """RSS 中各 worker 獨佔（USS）與共用的部分，以及依共用行程數分攤的 PSS（位元組）"""
+    info = psutil.Process(pid).memory_full_info()
+    return {
+        "rss": info.rss,
+        "uss": info.uss,
+        "pss": getattr(info, "pss", info.uss),
+        "shared": info.rss - info.uss,
+    }
+
+
+def register_memory_metrics():
+    gauge(
+        "process_memory_bytes",
+        "Memory of this worker: rss, uss (unique), pss (proportional) and shared",
+        label_names=("kind",),
+        callback=lambda: {(kind, ): value for kind, value in memory_report().items()}
+    )
+
+
+def worker_report(master_pid):
+    """gunicorn master 與各 worker 的記憶體（MB）"""
+    master = psutil.Process(master_pid)
+    rows = []
+    for proc in [master] + master.children():
+        try:
+            report = memory_report(proc.pid)
+        except psutil.Error as e:
+            logger.warning(f"Cannot read memory of pid {proc.pid}: {e}")
+            continue
+        rows.append((proc.pid, "master" if proc.pid == master_pid else "worker",
+                     {kind: value / 1024 / 1024 for kind, value in report.items()}))
+    return rows
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Shared asset preloading for gunicorn workers")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build-references", help="compute reference audio embeddings")
+    build.add_argument("--out", default=REFERENCES_PATH)
+    build.add_argument("--limit", type=int, default=None)
+    report = commands.add_parser("report", help="per-worker unique and shared memory")
+    report.add_argument("master_pid", type=int)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "build-references":
+        build_references(args.out, args.limit)
+        return
+
+    rows = worker_report(args.master_pid)
+    print(f"{'pid':>8} {'role':7} {'rss':>9} {'unique':>9} {'shared':>9} {'pss':>9}")
+    for pid, role, mb in rows:
+        print(f"{pid:>8} {role:7} {mb['rss']:>7.1f}MB {mb['uss']:>7.1f}MB {mb['shared']:>7.1f}MB {mb['pss']:>7.1f}MB")
+    workers = [mb for _, role, mb in rows if role == "worker"]
+    if workers:
+        print(f"{len(workers)} workers: {sum(mb['uss'] for mb in workers):.1f}MB unique in total, "
+              f"{sum(mb['pss'] for _, _, mb in rows):.1f}MB PSS including master")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+# === progress_cache.py - 使用者進度的本地讀取快取 ===
+import copy
+import logging
+import threading
+from collections import OrderedDict
+
+from metrics import counter, gauge
+
+logger = logging.getLogger(__name__)
+
+cache_requests = counter(
+    "progress_cache_requests_total",
+    "Progress cache lookups",
+    label_names=("kind", "result"),
+)
+
+
+class ProgressCache:
+    """以 LRU 限制大小的讀取快取；鍵為 (kind, user_id)，kind 為 "progress" 或 "summary" """
+
+    def __init__(self, max_entries=2000, listener_factory=None):
+        self.max_entries = max_entries
+        # listener_factory(user_id, on_change) -> unsubscribe()；提供時以 Firestore 快照監聽保持跨 worker 一致
+        self.listener_factory = listener_factory
+        self.entries = OrderedDict()
+        self.listeners = {}  # user_id -> unsubscribe
+        # 讀取中的鍵：key -> [讀取中的 loader 數, 世代]；讀取期間 update / 失效會遞增世代，
+        # 讀取完成時世代已改變就不存入（loader 可能讀到寫入前的舊資料，會覆蓋 write-through 的結果）
+        self.loading = {}
+        self.lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, kind, user_id, loader):
+        """命中時回傳副本；未命中時呼叫 loader() 讀取並存入快取"""
+        key = (kind, user_id)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                cache_requests.inc(kind=kind, result="hit")
+                return copy.deepcopy(self.entries[key])
+            self.misses += 1
+            loading = self.loading.setdefault(key, [0, 0])
+            loading[0] += 1
+            generation = loading[1]
+        cache_requests.inc(kind=kind, result="miss")
+
+        value = None
+        try:
+            value = loader()
+        finally:
+            with self.lock:
+                loading[0] -= 1
+                if loading[0] == 0:
+                    del self.loading[key]
+                if value is not None and loading[1] == generation:
+                    self.entries[key] = copy.deepcopy(value)
+                    self.entries.move_to_end(key)
+                    self._watch(user_id)
+                    self._evict()
+        return value
+
+    def update(self, kind, user_id, fn):
+        """寫入時同步更新快取中的項目（write-through）；不在快取中則略過"""
+        key = (kind, user_id)
+        with self.lock:
+            self._bump(key)
+            if key in self.entries:
+                self.entries[key] = fn(self.entries[key])
+
+    def discard(self, kind, user_id):
+        with self.lock:
+            self._bump((kind, user_id))
+            self.entries.pop((kind, user_id), None)
+
+    def invalidate(self, user_id):
+        with self.lock:
+            for key in (("progress", user_id), ("summary", user_id)):
+                self._bump(key)
+                self.entries.pop(key, None)
+
+    def _bump(self, key):
+        loading = self.loading.get(key)
+        if loading is not None:
+            loading[1] += 1
+
+    def _watch(self, user_id):
+        if self.listener_factory is None or user_id in self.listeners:
+            return
+        try:
+            self.listeners[user_id] = self.listener_factory(user_id, lambda: self.invalidate(user_id))
+        except Exception as e:
+            logger.warning(f"Failed to attach progress listener for {user_id}: {e}")
+
+    def _cached(self, user_id):
+        return ("progress", user_id) in self.entries or ("summary", user_id) in self.entries
+
+    def _unwatch(self, user_id):
+        unsubscribe = self.listeners.pop(user_id, None)
+        if unsubscribe:
+            try:
+                unsubscribe()
+            except Exception:
+                pass
+
+    def _evict(self):
+        while len(self.entries) > self.max_entries:
+            (_, user_id), _ = self.entries.popitem(last=False)
+            if not self._cached(user_id):
+                self._unwatch(user_id)
+
+        # 失效後未再讀取的使用者也要停止監聽
+        if len(self.listeners) > self.max_entries:
+            for user_id in [u for u in self.listeners if not self._cached(u)]:
+                self._unwatch(user_id)
+
+    def status(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "listeners": len(self.listeners),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+            }
+
+
+def firestore_summary_listener(db):
+    """建立以摘要文件快照監聽變更的 listener_factory（每次寫入都會更新摘要文件）"""
+    from progress_summary import summary_ref
+
+    def factory(user_id, on_change):
+        first = [True]
+
+        def on_snapshot(doc_snapshots, changes, read_time):
+            # 第一次回呼是目前狀態，不需要失效
+            if first[0]:
+                first[0] = False
+                return
+            on_change()
+
+        watch = summary_ref(db, user_id).on_snapshot(on_snapshot)
+        return watch.unsubscribe
+
+    return factory
+
+
+def register_cache_metrics(cache):
+    gauge(
+        "progress_cache_hit_ratio",
+        "Hit ratio of the per-process progress cache",
+        callback=lambda: cache.status()["hit_ratio"]
+    )
+    gauge(
+        "progress_cache_entries",
+        "Entries held by the per-process progress cache",
+        callback=lambda: cache.status()["entries"]
+    )
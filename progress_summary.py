@@ -0,0 +1,120 @@
+# === progress_summary.py - 每位使用者的學習進度摘要 ===
+# 摘要文件位於 users/{id}/summary/progress，與進度寫入放在同一個 batch 中更新，
+# 讓「學習進度」畫面只需讀取一份文件。
+import logging
+
+logger = logging.getLogger(__name__)
+
+HISTOGRAM_BUCKETS = 10  # 0-9, 10-19, ..., 90-100
+RANKED_WORDS = 10  # 摘要中保留分數最高 / 最低的詞彙數（各詞彙的分數只存在於 progress 文件）
+
+
+def summary_ref(db, user_id):
+    return db.collection("users").document(user_id).collection("summary").document("progress")
+
+
+def empty_summary():
+    return {
+        "word_count": 0,
+        "practice_count": 0,
+        "score_sum": 0,
+        "best_word": None,
+        "best_score": None,
+        "worst_word": None,
+        "worst_score": None,
+        "histogram": [0] * HISTOGRAM_BUCKETS,
+        "top": [],     # 分數最高的 RANKED_WORDS 個 {"word", "score"}（遞減）
+        "bottom": [],  # 分數最低的 RANKED_WORDS 個 {"word", "score"}（遞增）
+    }
+
+
+def score_bucket(score):
+    return min(HISTOGRAM_BUCKETS - 1, max(0, int(score) // 10))
+
+
+def _rank(entries, word, score, highest):
+    """更新排行（移除該詞的舊紀錄後重新插入），保留前 RANKED_WORDS 名"""
+    entries = [entry for entry in entries if entry["word"] != word]
+    entries.append({"word": word, "score": score})
+    entries.sort(key=lambda entry: entry["score"], reverse=highest)
+    return entries[:RANKED_WORDS]
+
+
+def apply_summary_updates(summary, updates):
+    """將 [(word, {"score", "times", "previous"}), ...] 套用到摘要上，回傳新的摘要（不修改原物件）。
+
+    previous 為該詞上一次的分數（取自 progress 文件；None 表示第一次練習）。
+    排行只保留前後 RANKED_WORDS 名：名單內的詞分數下降後可能被名單外的詞取代，
+    但名單外的詞要到下次練習時才會重新進入排行（名單全部被擠出前，最佳 / 最弱詞彙不受影響）。
+    """
+    result = empty_summary()
+    if summary:
+        result.update(summary)
+    legacy_scores = result.pop("scores", None)
+    if legacy_scores and not result["top"]:
+        # 舊版摘要保存所有詞彙的分數：轉換為排行後不再保存
+        ranked = sorted(legacy_scores.items(), key=lambda item: item[1])
+        result["bottom"] = [{"word": w, "score": v} for w, v in ranked[:RANKED_WORDS]]
+        result["top"] = [{"word": w, "score": v} for w, v in reversed(ranked[-RANKED_WORDS:])]
+    histogram = list(result["histogram"])
+    top, bottom = result["top"], result["bottom"]
+
+    for word, update in updates:
+        score = update["score"]
+        old = update.get("previous")
+        if old is None:
+            result["word_count"] += 1
+        else:
+            result["score_sum"] -= old
+            histogram[score_bucket(old)] -= 1
+        result["score_sum"] += score
+        histogram[score_bucket(score)] += 1
+        result["practice_count"] += update["times"]
+        top = _rank(top, word, score, highest=True)
+        bottom = _rank(bottom, word, score, highest=False)
+
+    result.update(
+        histogram=histogram, top=top, bottom=bottom,
+        best_word=top[0]["word"] if top else None, best_score=top[0]["score"] if top else None,
+        worst_word=bottom[0]["word"] if bottom else None, worst_score=bottom[0]["score"] if bottom else None
+    )
+    return result
+
+
+def build_summary(progress):
+    """由完整的 progress 子集合內容建立摘要（補建用）"""
+    updates = [(word, {"score": data.get("score", 0), "times": data.get("times", 1), "previous": None})
+               for word, data in progress.items()]
+    return apply_summary_updates(None, updates)
+
+
+def load_full_progress(db, user_id):
+    ref = db.collection("users").document(user_id).collection("progress")
+    return {doc.id: doc.to_dict() for doc in ref.stream()}
+
+
+def backfill_progress_summaries(db):
+    """為尚無摘要的現有使用者建立摘要文件（已有摘要者由寫入流程維護，不覆寫）"""
+    from google.api_core.exceptions import AlreadyExists
+
+    count = 0
+    for user_ref in db.collection("users").list_documents():
+        progress = load_full_progress(db, user_ref.id)
+        if not progress:
+            continue
+        try:
+            summary_ref(db, user_ref.id).create(build_summary(progress))
+        except AlreadyExists:
+            continue
+        count += 1
+        logger.info(f"Backfilled progress summary for user {user_ref.id} ({len(progress)} words)")
+    logger.info(f"✅ Progress summary backfill complete: {count} users")
+    return count
+
+
+if __name__ == "__main__":
+    # 一次性補建：python progress_summary.py
+    from thai_learning import db, progress_writer
+
+    progress_writer.flush()
+    backfill_progress_summaries(db)
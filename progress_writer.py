@@ -0,0 +1,225 @@
+# === progress_writer.py - 批次寫入的學習進度 ===
+import atexit
+import logging
+import threading
+from datetime import datetime
+
+from metrics import counter, timed
+from progress_summary import (
+    apply_summary_updates, build_summary, load_full_progress, summary_ref
+)
+
+logger = logging.getLogger(__name__)
+
+progress_flushes = counter(
+    "progress_writer_flushed_total",
+    "Progress updates written by the write-behind writer",
+    label_names=("outcome",),
+)
+
+FIRESTORE_BATCH_LIMIT = 500  # Firestore 單一 batch 最多 500 筆寫入
+
+
+class FirestoreProgressBackend:
+    """以 Firestore batched write 寫入 users/{id}/progress/{word}，並在同一個 batch 更新摘要文件"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def commit(self, updates):
+        # 依使用者分組；每位使用者佔 (詞彙數 + 1) 筆寫入。單一使用者超過一個 batch 時分成多段，
+        # 每段都在同一個 batch 更新摘要，各 batch 的詞彙與摘要仍一致（下一段重新讀取已更新的摘要）
+        by_user = {}
+        for (user_id, word), update in updates:
+            by_user.setdefault(user_id, []).append((word, update))
+
+        per_batch = FIRESTORE_BATCH_LIMIT - 1
+        chunk, ops = [], 0
+        for user_id, user_updates in by_user.items():
+            for start in range(0, len(user_updates), per_batch):
+                part = user_updates[start:start + per_batch]
+                if chunk and ops + len(part) + 1 > FIRESTORE_BATCH_LIMIT:
+                    self._commit_users(chunk)
+                    chunk, ops = [], 0
+                chunk.append((user_id, part))
+                ops += len(part) + 1
+        if chunk:
+            self._commit_users(chunk)
+
+    def _progress_ref(self, user_id, word):
+        return self.db.collection("users").document(user_id).collection("progress").document(word)
+
+    def _commit_users(self, chunk):
+        from google.cloud import firestore
+
+        refs = [summary_ref(self.db, user_id) for user_id, _ in chunk]
+        # 摘要不保存各詞彙的分數：與摘要一起讀取本次更新詞彙的 progress 文件，取得上一次的分數
+        progress_refs = [self._progress_ref(user_id, word) for user_id, user_updates in chunk for word, _ in user_updates]
+        snapshots = {snap.reference.path: snap for snap in self.db.get_all(refs + progress_refs)}
+
+        batch = self.db.batch()
+        for (user_id, user_updates), ref in zip(chunk, refs):
+            resolved = []
+            for word, update in user_updates:
+                progress_ref = self._progress_ref(user_id, word)
+                previous = snapshots.get(progress_ref.path)
+                previous = (previous.to_dict() or {}).get("score") if previous is not None and previous.exists else None
+                resolved.append((word, dict(update, previous=previous)))
+                batch.set(progress_ref, {
+                    "score": update["score"],
+                    "last_practice": update["last_practice"],
+                    "times": firestore.Increment(update["times"])
+                }, merge=True)
+            user_updates = resolved
+
+            snap = snapshots.get(ref.path)
+            if snap is not None and snap.exists:
+                # 以 update_time 作為前置條件，其他 worker 同時更新時整批失敗並重試
+                stored = snap.to_dict()
+                summary = apply_summary_updates(stored, user_updates)
+                if "scores" in stored:
+                    summary["scores"] = firestore.DELETE_FIELD  # 移除舊版摘要的逐詞分數
+                batch.update(ref, summary, option=self.db.write_option(last_update_time=snap.update_time))
+            else:
+                # 尚無摘要：先由既有進度建立，再套用本次更新
+                base = build_summary(load_full_progress(self.db, user_id))
+                batch.create(ref, apply_summary_updates(base, user_updates))
+        batch.commit()
+
+    def load_summary(self, user_id):
+        snap = summary_ref(self.db, user_id).get()
+        return snap.to_dict() if snap.exists else None
+
+
+class InMemoryProgressBackend:
+    """測試用的記憶體後端，行為與 Firestore 後端相同"""
+
+    def __init__(self):
+        self.docs = {}  # user_id -> {word: doc}
+        self.summaries = {}  # user_id -> summary
+        self.commits = 0
+        self.lock = threading.Lock()
+
+    def commit(self, updates):
+        with self.lock:
+            self.commits += 1
+            by_user = {}
+            for (user_id, word), update in updates:
+                doc = self.docs.setdefault(user_id, {}).setdefault(word, {"times": 0})
+                by_user.setdefault(user_id, []).append((word, dict(update, previous=doc.get("score"))))
+                doc["score"] = update["score"]
+                doc["last_practice"] = update["last_practice"]
+                doc["times"] += update["times"]
+            for user_id, user_updates in by_user.items():
+                self.summaries[user_id] = apply_summary_updates(self.summaries.get(user_id), user_updates)
+
+    def load(self, user_id):
+        with self.lock:
+            return {word: dict(doc) for word, doc in self.docs.get(user_id, {}).items()}
+
+    def load_summary(self, user_id):
+        with self.lock:
+            summary = self.summaries.get(user_id)
+            return dict(summary) if summary else None
+
+
+class ProgressWriter:
+    """在記憶體中合併進度更新，定時或累積到一定數量時批次寫入"""
+
+    def __init__(self, backend, flush_interval=2.0, max_pending=50, on_flush=None):
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.on_flush = on_flush  # on_flush(user_ids)：寫入成功後呼叫（例如讓快取重新讀取摘要）
+        self.pending = {}  # (user_id, word) -> {"score", "last_practice", "times", "previous"}
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def record(self, user_id, word, score, previous=None):
+        """加入一次練習結果；同一詞彙的多次練習會合併為一筆。
+        previous 為呼叫端所知的上一次分數，只用於讀取時套用尚未寫入的更新（寫入時以 progress 文件為準）"""
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self.lock:
+            update = self.pending.get((user_id, word))
+            if update is None:
+                self.pending[(user_id, word)] = {"score": score, "last_practice": now, "times": 1, "previous": previous}
+            else:
+                update["score"] = score
+                update["last_practice"] = now
+                update["times"] += 1
+            should_flush = len(self.pending) >= self.max_pending
+        if should_flush:
+            self.wakeup.set()
+
+    def load_summary(self, user_id):
+        """讀取摘要文件並套用尚未寫入的更新；尚無摘要時回傳 None"""
+        summary = self.backend.load_summary(user_id)
+        if summary is None:
+            return None
+        pending = self.pending_for(user_id)
+        if pending:
+            summary = apply_summary_updates(summary, list(pending.items()))
+        return summary
+
+    def pending_for(self, user_id):
+        """尚未寫入的更新（供讀取時覆蓋，確保讀到自己的寫入）"""
+        with self.lock:
+            return {word: dict(update) for (uid, word), update in self.pending.items() if uid == user_id}
+
+    def flush(self):
+        """立即寫入所有待處理更新；失敗時放回佇列等待下次重試"""
+        with self.flush_lock:
+            with self.lock:
+                if not self.pending:
+                    return 0
+                updates = list(self.pending.items())
+                self.pending = {}
+
+            try:
+                with timed("firestore_progress_flush"):
+                    self.backend.commit(updates)
+            except Exception as e:
+                logger.error(f"❌ Progress flush failed, re-queueing {len(updates)} updates: {e}")
+                progress_flushes.inc(len(updates), outcome="error")
+                with self.lock:
+                    for key, update in updates:
+                        newer = self.pending.get(key)
+                        if newer is not None:
+                            # 保留較新的分數，合併練習次數；上一次的分數仍是已寫入的值
+                            newer["times"] += update["times"]
+                            newer["previous"] = update["previous"]
+                        else:
+                            self.pending[key] = update
+                return 0
+
+            progress_flushes.inc(len(updates), outcome="ok")
+            logger.info(f"✅ Flushed {len(updates)} progress updates")
+            if self.on_flush:
+                self.on_flush({user_id for (user_id, _), _ in updates})
+            return len(updates)
+
+    def _run(self):
+        while not self.closed:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Progress writer loop error: {e}")
+
+    def close(self):
+        """停止背景執行緒並寫入剩餘更新（程式結束時呼叫）"""
+        self.closed = True
+        self.wakeup.set()
+        self.flush()
+
+
+def create_progress_writer(backend, **kwargs):
+    """建立寫入器並在程式結束時自動寫入剩餘資料"""
+    writer = ProgressWriter(backend, **kwargs)
+    atexit.register(writer.close)
+    return writer
@@ -0,0 +1,98 @@
+# === records.py - 使用者、考試與卡片的精簡資料結構 ===
+# 使用 __slots__ 取代字典，省去每個物件的 __dict__ 與重複的字串鍵；
+# 卡片只保存詞彙在詞彙索引中的 ID，不複製網址與文字。
+from datetime import datetime
+from typing import NamedTuple
+
+
+class UserState:
+    """單一使用者的學習狀態"""
+
+    __slots__ = (
+        'score', 'current_activity', 'current_vocab', 'current_category',
+        'game_state', 'vocab_mastery', 'learning_progress', 'last_active', 'streak', 'review',
+    )
+
+    def __init__(self, last_active=None):
+        self.score = 0
+        self.current_activity = None
+        self.current_vocab = None
+        self.current_category = None
+        self.game_state = {}  # 只存在於記憶體中的遊戲物件
+        self.vocab_mastery = {}  # word -> SM-2 複習狀態
+        self.learning_progress = {}
+        self.last_active = last_active or datetime.now().strftime("%Y-%m-%d")
+        self.streak = 0
+        self.review = None  # ReviewQueue，第一次使用時由 vocab_mastery 建立
+
+    def apply(self, fields):
+        """套用從儲存後端載入的欄位"""
+        for field, value in fields.items():
+            if field in self.__slots__:
+                setattr(self, field, value)
+        self.review = None
+
+
+class ExamSession:
+    """進行中的考試"""
+
+    __slots__ = ('questions', 'current', 'correct', 'exam_type', 'started_at', 'question_started', 'answers')
+
+    def __init__(self, questions, exam_type, started_at):
+        self.questions = questions
+        self.current = 0
+        self.correct = 0
+        self.exam_type = exam_type
+        self.started_at = started_at
+        self.question_started = None
+        self.answers = []  # 每題的作答結果與耗時
+
+    def __repr__(self):
+        return f"ExamSession({self.exam_type!r}, {self.current}/{len(self.questions)}, correct={self.correct})"
+
+
+class Card:
+    """記憶翻牌遊戲的卡片；文字與網址由詞彙索引取得"""
+
+    __slots__ = ('id', 'kind', 'vocab', 'match_id', 'table')
+
+    def __init__(self, card_id, kind, vocab, match_id, table):
+        self.id = card_id
+        self.kind = kind  # 'image' 或 'audio'
+        self.vocab = vocab  # 詞彙 ID
+        self.match_id = match_id
+        self.table = table  # VocabularyIndex
+
+    @property
+    def word(self):
+        return self.table.words[self.vocab]
+
+    @property
+    def thai(self):
+        return self.table.thai[self.vocab]
+
+    @property
+    def content(self):
+        if self.kind == 'image':
+            return self.table.image_url[self.vocab]
+        return self.table.audio_url[self.vocab]
+
+
+class BoardState(NamedTuple):
+    """記憶翻牌遊戲某一刻的唯讀快照；已翻開 / 已配對的卡片以卡片編號的位元遮罩表示"""
+
+    cards: tuple
+    flipped: int
+    matched: int
+    attempts: int
+    elapsed_time: float
+    remaining_time: float
+    is_completed: bool
+    is_timeout: bool
+    category: str
+    category_name: str
+    pending_reset: bool
+
+    @property
+    def face_up(self):
+        return self.flipped | self.matched
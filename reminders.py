@@ -0,0 +1,145 @@
+# === reminders.py - 連續學習提醒 ===
+# 每天挑出昨天有學習、今天還沒學習的使用者（連續學習即將中斷），以 LINE multicast 分批提醒。
+# 使用者逐頁讀取（只讀 streak 欄位），每湊滿一批（最多 500 人）就送出並記錄進度；請求速率受限，
+# 中斷後重新執行會從上次的位置繼續。端對端測試：python -m benchmarks.fake_line_reminders
+# 用法：python -m reminders [--date YYYY-MM-DD] [--dry-run]
+import argparse
+import hashlib
+import logging
+import os
+import time
+import uuid
+from datetime import date, timedelta
+
+from metrics import counter
+from reply_templates import Template, text_message
+
+logger = logging.getLogger(__name__)
+
+MULTICAST_LIMIT = 500  # LINE multicast 每次最多 500 位收件者
+RETRY_KEY_NAMESPACE = uuid.UUID("6c1f3a52-8d0e-4a7b-9b5e-2f4d7c9e1a30")
+
+reminders_sent = counter(
+    "streak_reminders_sent_total",
+    "Users reminded to keep their learning streak",
+)
+reminder_requests = counter(
+    "streak_reminder_requests_total",
+    "Multicast requests sent by the streak reminder job",
+    label_names=("outcome",),
+)
+
+reminder_message = Template("streak_reminder", text_message(
+    "🔥 Don't break your learning streak!\nPractice one Thai word today to keep it going.",
+    [('Start Learning', 'Start Learning'), ('Vocabulary', 'Vocabulary')]
+)).render()
+
+
+class StreakReminderJob:
+    """store 需提供 at_risk / load_checkpoint / save_checkpoint（見 user_store.py）"""
+
+    def __init__(self, store, client, messages=None, chunk_size=MULTICAST_LIMIT, rate=5.0, min_streak=1):
+        self.store = store
+        self.client = client
+        self.messages = messages or [reminder_message]
+        self.chunk_size = min(chunk_size, MULTICAST_LIMIT)
+        self.interval = 1.0 / rate if rate else 0.0
+        self.min_streak = min_streak
+        self.last_request = None
+
+    def _throttle(self):
+        if self.last_request is not None:
+            wait = self.last_request + self.interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+        self.last_request = time.monotonic()
+
+    def run(self, today=None, dry_run=False):
+        """提醒昨天活躍、streak >= min_streak 的使用者；回傳本次工作的進度紀錄"""
+        today = today or date.today()
+        job_id = f"streak_reminder_{today.isoformat()}"
+        state = self.store.load_checkpoint(job_id) or {"cursor": None, "sent": 0, "requests": 0, "done": False}
+        if state["done"]:
+            logger.info(f"Streak reminders for {today} already sent to {state['sent']} users")
+            return state
+
+        # 逐頁讀取即將中斷的使用者（依 user_id 排序，從上次的進度之後開始）
+        yesterday = (today - timedelta(days=1)).isoformat()
+        users = (user_id for user_id, _ in self.store.at_risk(yesterday, self.min_streak, after=state["cursor"]))
+        if dry_run:
+            return dict(state, pending=sum(1 for _ in users))
+        logger.info(f"Streak reminders for {today}: resuming after {state['cursor']}")
+
+        chunk = []
+        for user_id in users:
+            chunk.append(user_id)
+            if len(chunk) == self.chunk_size:
+                self._send(job_id, chunk, state)
+                chunk = []
+        if chunk:
+            self._send(job_id, chunk, state)
+
+        state["done"] = True
+        self.store.save_checkpoint(job_id, state)
+        logger.info(f"Streak reminders for {today} sent to {state['sent']} users in {state['requests']} requests")
+        return state
+
+    def _send(self, job_id, chunk, state):
+        """送出一批並記錄進度"""
+        self._throttle()
+        # 同一批重送時沿用相同的 retry key，若上次其實已送達，LINE 會回應 409 而不重複發送；
+        # key 由完整收件人清單計算，恢復執行時若分批不同不會誤判為重複而略過使用者
+        recipients = hashlib.sha1(",".join(chunk).encode("utf-8")).hexdigest()
+        retry_key = str(uuid.uuid5(RETRY_KEY_NAMESPACE, f"{job_id}:{recipients}"))
+        try:
+            self.client.multicast(chunk, self.messages, retry_key=retry_key)
+            reminder_requests.inc(outcome="ok")
+        except Exception as e:
+            if getattr(e, "status_code", None) != 409:
+                reminder_requests.inc(outcome="error")
+                logger.error(f"Streak reminder multicast failed after {state['sent']} users: {e}")
+                raise
+            reminder_requests.inc(outcome="duplicate")
+        reminders_sent.inc(len(chunk))
+        state.update(cursor=chunk[-1], sent=state["sent"] + len(chunk), requests=state["requests"] + 1)
+        self.store.save_checkpoint(job_id, state)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send streak reminders through LINE multicast")
+    parser.add_argument("--date", type=date.fromisoformat, default=None, help="run date (default: today)")
+    parser.add_argument("--dry-run", action="store_true", help="only count the users to remind")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    from line_client import LineClient
+    from user_store import create_user_store
+
+    db = None
+    if os.environ.get('USER_STORE', 'firestore') == 'firestore':
+        import json
+        import firebase_admin
+        from firebase_admin import credentials, firestore
+        if not firebase_admin._apps:
+            creds_json = os.environ.get("FIREBASE_CREDENTIALS")
+            if not creds_json:
+                raise ValueError("FIREBASE_CREDENTIALS environment variable not found")
+            firebase_admin.initialize_app(credentials.Certificate(json.loads(creds_json)))
+        db = firestore.client()
+
+    client_options = {}
+    if os.environ.get('LINE_API_ENDPOINT'):
+        client_options['endpoint'] = os.environ['LINE_API_ENDPOINT']
+    client = LineClient(os.environ.get('LINE_CHANNEL_ACCESS_TOKEN', 'YOUR_CHANNEL_ACCESS_TOKEN'), **client_options)
+
+    job = StreakReminderJob(
+        create_user_store(db),
+        client,
+        rate=float(os.environ.get('REMINDER_RATE', 5)),
+        min_streak=int(os.environ.get('REMINDER_MIN_STREAK', 1))
+    )
+    print(job.run(args.date, dry_run=args.dry_run))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+# === reply_templates.py - 預先建立並序列化的固定回覆 ===
+# 選單、音調教學與回音法說明幾乎都是固定內容：啟動時（以及詞彙熱重載時）建立一次 LINE 訊息 JSON，
+# 之後每則訊息只需把個人化欄位（{{word}} 等）代入預先切好的 JSON 字串，不再建立 SDK 物件；
+# 送出時 request_body() 直接把這段 JSON 拼進請求內容，不再解析後重新序列化。
+import json
+import re
+
+PLACEHOLDER = re.compile(r"\{\{(\w+)\}\}")
+
+
+class RawMessage:
+    """已序列化的 LINE 訊息；經 request_body() 送出時直接使用 json，交給 LINE SDK 其他 API 時才解析（as_json_dict()）"""
+
+    __slots__ = ('json', '_payload')
+
+    def __init__(self, json_text, payload=None):
+        self.json = json_text
+        self._payload = payload
+
+    def as_json_dict(self):
+        if self._payload is None:
+            self._payload = json.loads(self.json)
+        return self._payload
+
+    def __repr__(self):
+        return f"RawMessage({self.json[:60]!r})"
+
+
+class Template:
+    """JSON 字串依 {{欄位}} 切成片段；沒有欄位的模板直接共用同一個 RawMessage"""
+
+    __slots__ = ('name', 'parts', 'fields', 'static')
+
+    def __init__(self, name, payload):
+        text = json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+        pieces = PLACEHOLDER.split(text)
+        self.name = name
+        self.parts = pieces[0::2]
+        self.fields = pieces[1::2]
+        self.static = None if self.fields else RawMessage(text, payload)
+
+    def render(self, **values):
+        if self.static is not None:
+            return self.static
+        out = [self.parts[0]]
+        for field, part in zip(self.fields, self.parts[1:]):
+            # 代入值需經 JSON 跳脫，去掉 json.dumps 加上的引號
+            out.append(json.dumps(str(values[field]), ensure_ascii=False)[1:-1])
+            out.append(part)
+        return RawMessage("".join(out))
+
+
+def request_body(messages, **fields):
+    """組出 reply / push 的請求內容（UTF-8 bytes）；RawMessage 直接拼接，SDK 訊息物件才以 json.dumps 序列化"""
+    encoded = ",".join(
+        message.json if isinstance(message, RawMessage)
+        else json.dumps(message.as_json_dict(), ensure_ascii=False, separators=(',', ':'))
+        for message in messages
+    )
+    head = json.dumps(fields, ensure_ascii=False, separators=(',', ':'))
+    return f'{head[:-1]}{"," if fields else ""}"messages":[{encoded}]}}'.encode("utf-8")
+
+
+class TemplateRegistry:
+    def __init__(self):
+        self.templates = {}
+
+    def register(self, name, payload):
+        self.templates[name] = Template(name, payload)
+
+    def render(self, name, **values):
+        return self.templates[name].render(**values)
+
+    def __contains__(self, name):
+        return name in self.templates
+
+
+# === LINE 訊息 JSON ===
+
+def message_action(label, text):
+    return {"type": "message", "label": label, "text": text}
+
+
+def text_message(text, quick_reply=None):
+    payload = {"type": "text", "text": text}
+    if quick_reply:
+        payload["quickReply"] = {
+            "items": [{"type": "action", "action": message_action(label, reply)} for label, reply in quick_reply]
+        }
+    return payload
+
+
+def buttons_message(alt_text, title, text, actions):
+    return {
+        "type": "template",
+        "altText": alt_text,
+        "template": {
+            "type": "buttons",
+            "title": title,
+            "text": text,
+            "actions": [message_action(label, reply) for label, reply in actions],
+        },
+    }
+
+
+def build_reply_templates(vocab):
+    """建立所有固定回覆；音調例句取自詞彙索引，詞彙熱重載時需重建"""
+    registry = TemplateRegistry()
+
+    registry.register("main_menu", text_message(
+        "🇹🇭 Welcome to the Thai Learning System 🇹🇭\nPlease choose your preferred learning mode:",
+        [
+            ('Select Topic', 'Select Topic'),
+            ('Vocabulary', 'Vocabulary'),
+            ('Speaking', 'Pronunciation drill'),
+            ('Tone Learning', 'Tone Learning'),
+            ('MemoryGame', 'Start MemoryGame'),
+            ('Progress', 'LearningProgress'),
+            ('Exam Mode', 'Exam Mode'),
+        ]
+    ))
+    registry.register("category_menu", text_message(
+        "📚Select a topic to learn vocabulary:",
+        [
+            ('Daily', 'Learn:Daily Phrases'),
+            ('🔢Numbers', 'Learn:Numbers'),
+            ('🐾 Animals', 'Learn:Animals'),
+            ('🍜Food', 'Learn:Food'),
+            ('🚗Transport', 'Learn:Transportation'),
+        ]
+    ))
+    registry.register("exam_menu", text_message(
+        "Please choose an exam category:",
+        [
+            ('Daily', 'Start Daily Phrases Exam'),
+            ('Numbers', 'Start Numbers Exam'),
+            ('Animals', 'Start Animals Exam'),
+            ('Food', 'Start Food Exam'),
+            ('Transport', 'Start Transportation Exam'),
+            ('Full Exam', 'Start Full Exam'),
+            ('📊 History', 'Exam History'),
+        ]
+    ))
+
+    registry.register("vocabulary_options", buttons_message(
+        "Vocabulary Practice Options", "Vocabulary Practice", "Please choose your next step:",
+        [("Practice Speaking", "Pronunciation drill"), ("Next Word", "Next Word"), ("Main Menu", "Back to Main Menu")]
+    ))
+
+    registry.register("echo_instructions", text_message(
+        "🧠【Echo Method for Pronunciation】\n\n"
+        "1. Listen: Hear a Thai word.\n"
+        "2. Echo:Pause for 3 seconds and replay the sound and tone in your mind.\n"
+        "3. Mimic:Imitate the sound out loud from your internal echo.\n\n"
+        "📣 Practice Word:{{thai}}\n"
+        "Pronunciation:{{pronunciation}}\n\n"
+        "Please tap the 🎤 microphone icon at the bottom to record your pronunciation."
+    ))
+    registry.register("echo_options", buttons_message(
+        "Pronunciation drill", "Pronunciation drill", "Other Options",
+        [("Play Again", "Play Audio: {{word}}"), ("Main Menu", "Back to Main Menu")]
+    ))
+
+    registry.register("tone_intro", text_message(
+        "There are five tones in Thai. Each tone can change the meaning of a word:\n\n"
+        "1. Mid Tone (no mark)\n"
+        "2. Low Tone (่)\n"
+        "3. Falling Tone (้)\n"
+        "4. High Tone (๊)\n"
+        "5. Rising Tone (๋)"
+    ))
+    examples_text = "Tone Examples：\n\n"
+    for example in vocab.tone_examples:
+        examples_text += f"{example['thai']} - {example['meaning']} - {example['pronunciation']} ({example['tone']}調)\n"
+    registry.register("tone_examples", text_message(examples_text))
+    registry.register("tone_options", buttons_message(
+        "Tone Learning Options", "Tone Learning", "Please choose an action",
+        [("Practice Speaking", "Pronunciation drill"), ("Vocabulary", "Vocabulary"), ("Main Menu", "Back to Main Menu")]
+    ))
+    return registry
@@ -0,0 +1,145 @@
+# === scorer_chain.py - 發音評分後端鏈 ===
+import logging
+import os
+import time
+import wave
+from threading import RLock
+
+from admission import StageBusy
+from backend_router import BackendRouter
+from metrics import histogram
+
+logger = logging.getLogger(__name__)
+
+scorer_latency = histogram(
+    "scorer_backend_latency_seconds",
+    "Latency of each pronunciation scoring backend",
+    label_names=("backend", "outcome"),
+)
+
+
+class ScoringRequest:
+    """單次發音評分請求（使用者音檔 + 參考資料）"""
+
+    def __init__(self, reference_text, audio_file_path=None, gcs_url=None, ref_audio_url=None, pcm=None):
+        self.reference_text = reference_text
+        self.audio_file_path = audio_file_path
+        self.gcs_url = gcs_url
+        self.ref_audio_url = ref_audio_url
+        self._pcm = pcm
+
+    @property
+    def gcs_uri(self):
+        """將公開網址轉換為 gs:// 格式"""
+        if not self.gcs_url:
+            return None
+        if self.gcs_url.startswith('https://storage.googleapis.com/'):
+            return 'gs://' + self.gcs_url.replace('https://storage.googleapis.com/', '')
+        return self.gcs_url
+
+    @property
+    def pcm(self):
+        """16kHz 單聲道 PCM 內容（只讀取一次，供各後端共用）"""
+        if self._pcm is None and self.audio_file_path and os.path.exists(self.audio_file_path):
+            with wave.open(self.audio_file_path, 'rb') as wav_file:
+                self._pcm = wav_file.readframes(wav_file.getnframes())
+        return self._pcm
+
+
+class ScorerChain:
+    """依序嘗試已註冊的評分後端，回傳第一個成功的結果"""
+
+    def __init__(self, router=None):
+        self.backends = []  # [(name, label, fn)]
+        self.router = router or BackendRouter()
+        self.lock = RLock()
+
+    def register(self, name, fn, label=None):
+        """註冊評分後端；fn(request) 回傳結果 dict，失敗時拋出例外或回傳 None"""
+        with self.lock:
+            self.backends = [b for b in self.backends if b[0] != name]
+            self.backends.append((name, label or name, fn))
+        self.router.breaker(name)
+        logger.info(f"Registered scoring backend: {name}")
+
+    def backend_names(self):
+        return [name for name, _, _ in self.backends]
+
+    def score(self, scoring_request):
+        """執行評分鏈；全部失敗時回傳 None（由呼叫端使用模擬分數）"""
+        for step, (name, label, fn) in enumerate(list(self.backends), start=1):
+            # 熔斷中的後端直接略過
+            if not self.router.allow(name):
+                logger.info(f"Step {step}: {label} skipped (circuit open)")
+                continue
+
+            start = time.perf_counter()
+            try:
+                result = fn(scoring_request)
+            except StageBusy as e:
+                self._record_busy(step, name, label, start, e)
+                continue
+            except Exception as e:
+                self._record_error(step, name, label, start, e)
+                continue
+            if self._record_result(step, name, label, start, result):
+                return result
+
+        return None
+
+    async def score_async(self, scoring_request, async_backends, run_sync):
+        """非同步版本（ASGI 模式）：async_backends 中的後端直接 await，其餘以 run_sync(name, fn, request) 交給執行緒池"""
+        for step, (name, label, fn) in enumerate(list(self.backends), start=1):
+            if not self.router.allow(name):
+                logger.info(f"Step {step}: {label} skipped (circuit open)")
+                continue
+
+            start = time.perf_counter()
+            try:
+                if name in async_backends:
+                    result = await async_backends[name](scoring_request)
+                else:
+                    result = await run_sync(name, fn, scoring_request)
+            except StageBusy as e:
+                self._record_busy(step, name, label, start, e)
+                continue
+            except Exception as e:
+                self._record_error(step, name, label, start, e)
+                continue
+            if self._record_result(step, name, label, start, result):
+                return result
+
+        return None
+
+    def _record_busy(self, step, name, label, start, error):
+        # 本地名額不足（StageBusy）不代表後端故障：不計入熔斷統計
+        scorer_latency.observe(time.perf_counter() - start, backend=name, outcome="busy")
+        self.router.cancel(name)
+        logger.warning(f"Step {step}: {label} skipped (local capacity busy): {str(error)}")
+
+    def _record_error(self, step, name, label, start, error):
+        latency = time.perf_counter() - start
+        scorer_latency.observe(latency, backend=name, outcome="error")
+        self.router.record(name, latency, ok=False)
+        logger.warning(f"Step {step}: {label} evaluation failed: {str(error)}")
+
+    def _record_result(self, step, name, label, start, result):
+        """記錄後端結果；回傳是否為可用的評分"""
+        latency = time.perf_counter() - start
+        if not result:
+            # 無法識別內容屬於使用者音頻問題，不計入後端錯誤率
+            scorer_latency.observe(latency, backend=name, outcome="empty")
+            self.router.record(name, latency, ok=True)
+            logger.warning(f"Step {step}: {label} returned no result")
+            return False
+
+        scorer_latency.observe(latency, backend=name, outcome="success")
+        self.router.record(name, latency, ok=True)
+        result.setdefault("backend", name)
+        result.setdefault("method", label)
+        logger.info(f"Step {step}: {label} score {result.get('score')}, Evaluation result: {'Correct' if result.get('is_correct') else 'Incorrect'}")
+        return True
+
+
+# 全局評分鏈實例
+scorer_chain = ScorerChain()
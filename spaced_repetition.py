@@ -0,0 +1,173 @@
+# === spaced_repetition.py - SM-2 間隔重複排程 ===
+# 每個詞彙的複習狀態存放在 UserState.vocab_mastery（隨使用者狀態持久化）；
+# 每位使用者另有一個以到期時間排序的 heap（只存在於記憶體中），
+# 讓「下一個要練習的詞」只需 O(log n) 取得。
+import bisect
+import heapq
+import random
+import threading
+import time
+
+DAY_SECONDS = 86400
+RELEARN_SECONDS = 600  # 答錯的詞 10 分鐘後再次出現
+MIN_EASE = 1.3
+MAX_INTERVAL_DAYS = 365
+
+
+def score_to_quality(score):
+    """將 0-100 的發音分數轉為 SM-2 的 0-5 品質等級"""
+    return max(0, min(5, int(score / 20 + 0.5)))
+
+
+def sm2_update(state, score, now=None):
+    """依本次分數計算新的複習狀態（回傳新字典）"""
+    now = time.time() if now is None else now
+    state = state or {}
+    quality = score_to_quality(score)
+    ease = state.get("ease", 2.5)
+    reps = state.get("reps", 0)
+    interval = state.get("interval", 0)
+
+    if quality < 3:
+        reps, interval = 0, 0
+    else:
+        reps += 1
+        if reps == 1:
+            interval = 1
+        elif reps == 2:
+            interval = 6
+        else:
+            interval = min(MAX_INTERVAL_DAYS, round(interval * ease, 2))
+    ease = max(MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+
+    return {
+        "ease": round(ease, 3),
+        "interval": interval,
+        "reps": reps,
+        "score": score,
+        "last_review": now,
+        "due": now + (interval * DAY_SECONDS if interval else RELEARN_SECONDS),
+    }
+
+
+class ReviewQueue:
+    """單一使用者的複習佇列：整體與各分類各一個 (due, word) heap，過期項目延遲刪除；
+    另記錄已練習詞彙在各詞彙池中的位置（遞增排序），以二分搜尋取得隨機的新詞"""
+
+    def __init__(self, mastery, vocab):
+        self.mastery = mastery  # 與 UserState.vocab_mastery 為同一個字典
+        self.heaps = {}  # None -> 全部詞彙；分類鍵 -> 該分類的詞彙
+        self.seen = {}  # None / 分類鍵 -> 已練習詞彙在該詞彙池中的位置
+        self.lock = threading.Lock()
+        self.rebind(vocab)
+
+    def rebind(self, vocab):
+        """綁定詞彙索引；熱重載後分類與位置可能改變，需重建"""
+        with self.lock:
+            self.vocab = vocab
+            self._rebuild()
+
+    def _keys(self, word):
+        return (None,) + self.vocab.categories_by_word.get(word, ())
+
+    def _position(self, key, word):
+        if key is None:
+            return self.vocab.by_english.get(word)
+        return self.vocab.category_positions[key].get(word)
+
+    def _push(self, word, due):
+        for key in self._keys(word):
+            heapq.heappush(self.heaps.setdefault(key, []), (due, word))
+
+    def _mark_seen(self, word):
+        for key in self._keys(word):
+            position = self._position(key, word)
+            if position is not None:
+                bisect.insort(self.seen.setdefault(key, []), position)
+
+    def _rebuild(self):
+        heaps, seen = {}, {}
+        for word, state in self.mastery.items():
+            for key in self._keys(word):
+                if "due" in state:
+                    heaps.setdefault(key, []).append((state["due"], word))
+                position = self._position(key, word)
+                if position is not None:
+                    seen.setdefault(key, []).append(position)
+        for heap in heaps.values():
+            heapq.heapify(heap)
+        for positions in seen.values():
+            positions.sort()
+        self.heaps, self.seen = heaps, seen
+
+    def record(self, word, score, now=None):
+        """以本次分數更新詞彙的複習狀態"""
+        with self.lock:
+            first_time = word not in self.mastery
+            state = sm2_update(self.mastery.get(word), score, now)
+            self.mastery[word] = state
+            self._push(word, state["due"])
+            if first_time:
+                self._mark_seen(word)
+            self._compact()
+            return state
+
+    def _peek(self, key):
+        heap = self.heaps.get(key)
+        while heap:
+            due, word = heap[0]
+            if self.mastery.get(word, {}).get("due") == due:
+                return due, word
+            heapq.heappop(heap)  # 該詞已重新排程，舊項目作廢
+        return None
+
+    def _compact(self):
+        # 過期項目過多時重建，避免 heap 無限增長
+        size = len(self.heaps.get(None, ()))
+        if size > 2 * len(self.mastery) + 16:
+            self._rebuild()
+
+    def weakest(self):
+        """最早到期的已練習詞彙（短間隔即代表掌握度低）；沒有練習紀錄時回傳 None"""
+        with self.lock:
+            top = self._peek(None)
+            return top[1] if top else None
+
+    def next_word(self, category=None, exclude=None, now=None):
+        """下一個要練習的詞：優先已到期的詞，其次是尚未練習過的新詞，最後是最早到期的詞
+
+        exclude 為目前正在學的詞，避免「下一個」又回到同一個詞。
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            pool = self.vocab.category_words[category] if category else self.vocab.words
+            top = self._peek(category)
+            if top and top[0] <= now and top[1] != exclude:
+                return top[1]
+            new_word = self._unseen(pool, category, exclude)
+        if new_word:
+            return new_word
+        if top and top[1] != exclude:
+            return top[1]
+        return random.choice(pool)
+
+    def _unseen(self, pool, key, exclude):
+        """隨機選一個未練習的詞，O(log n)：第 r 個未練習的位置為 r + i，
+        i 為滿足 seen[i] - i > r 的最小索引（seen[i] - i 即 seen[i] 之前未練習的詞數，隨 i 遞增）"""
+        seen = self.seen.get(key, ())
+        free = len(pool) - len(seen)
+        if free <= 0:
+            return None
+        r = random.randrange(free)
+        for rank in (r, (r + 1) % free):
+            lo, hi = 0, len(seen)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if seen[mid] - mid > rank:
+                    hi = mid
+                else:
+                    lo = mid + 1
+            word = pool[rank + lo]
+            if word != exclude:
+                return word
+        return None
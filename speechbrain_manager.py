@@ -1,6 +1,5 @@
 # === speechbrain_manager.py - 簡化版記憶體管理 ===
 import gc
-import torch
 import threading
 import time
 import os
@@ -8,8 +7,14 @@ import psutil
 import logging
 from threading import RLock
 
+from lazy import lazy_import
+from maintenance import scheduler
+
 logger = logging.getLogger(__name__)
 
+# torch 只在模型已載入後才用到；模型載入時 speechbrain 會先匯入它
+torch = lazy_import("torch")
+
 class SimpleSpeechBrainManager:
     """簡化的 SpeechBrain 記憶體管理"""
     
@@ -20,6 +25,7 @@ class SimpleSpeechBrainManager:
         self.lock = RLock()
         self.memory_threshold = 350  # MB
         self.last_used = None
+        self.pinned = False  # master 預先載入的共用模型：不重載、不清理（重載會變成 worker 私有副本）
         
     def check_memory(self):
         """檢查記憶體使用情況"""
@@ -83,8 +89,27 @@ class SimpleSpeechBrainManager:
             self.model = None
             return False
     
+    def pin(self, quantize=False):
+        """在 gunicorn master 載入模型供各 worker 共用（見 preload.py）；quantize 將 Linear 層轉為 int8"""
+        with self.lock:
+            if not self.init_model():
+                return False
+            self.model.mods.eval()
+            for param in self.model.mods.parameters():
+                param.requires_grad_(False)
+            if quantize:
+                # ECAPA 以 Conv1d 為主，動態量化只涵蓋 Linear 層
+                self.model.mods = torch.quantization.quantize_dynamic(
+                    self.model.mods, {torch.nn.Linear}, dtype=torch.qint8
+                )
+            self.pinned = True
+            logger.info(f"📌 SpeechBrain 模型已預先載入並固定{'（int8 Linear）' if quantize else ''}")
+            return True
+
     def cleanup_model(self):
         """清理模型釋放記憶體"""
+        if self.pinned:
+            return
         if self.model is not None:
             logger.info("🧹 清理 SpeechBrain 模型...")
             
@@ -109,6 +134,9 @@ class SimpleSpeechBrainManager:
     
     def should_cleanup(self):
         """檢查是否需要清理模型"""
+        if self.pinned:
+            return False
+
         # 使用次數限制
         if self.usage_count >= self.max_usage:
             return True
@@ -124,12 +152,30 @@ class SimpleSpeechBrainManager:
             
         return False
     
+    def embed_file(self, audio_path):
+        """音檔的說話者嵌入（與 verify_files 相同：未正規化）"""
+        waveform = self.model.load_audio(audio_path)
+        return self.model.encode_batch(waveform.unsqueeze(0), normalize=False).squeeze().cpu().numpy()
+
     def compute_similarity(self, audio1_path, audio2_path):
         """計算音頻相似度"""
+        return self._compare([audio1_path, audio2_path], lambda: self.model.verify_files(audio1_path, audio2_path)[0])
+
+    def compute_similarity_to(self, audio_path, reference_embedding):
+        """與預先計算的參考音檔嵌入比較（見 preload.py），省去下載與編碼參考音檔"""
+        def verify():
+            waveform = self.model.load_audio(audio_path)
+            embedding = self.model.encode_batch(waveform.unsqueeze(0), normalize=False)
+            reference = torch.tensor(reference_embedding).view(1, 1, -1)
+            return self.model.similarity(embedding, reference)
+
+        return self._compare([audio_path], verify)
+
+    def _compare(self, paths, verify):
         with self.lock:
             try:
                 # 檢查文件是否存在
-                if not (os.path.exists(audio1_path) and os.path.exists(audio2_path)):
+                if not all(os.path.exists(path) for path in paths):
                     logger.warning("⚠️ 音頻文件不存在")
                     return 0.65
                 
@@ -150,7 +196,7 @@ class SimpleSpeechBrainManager:
                 
                 def process():
                     try:
-                        score, _ = self.model.verify_files(audio1_path, audio2_path)
+                        score = verify()
                         result[0] = float(score)
                         logger.info(f"🎯 相似度計算完成: {score:.3f}")
                     except Exception as e:
@@ -204,6 +250,9 @@ def compute_similarity(audio1_path, audio2_path):
     """主要入口函數 - 替換原有的 compute_similarity"""
     return speech_manager.compute_similarity(audio1_path, audio2_path)
 
+def compute_similarity_to(audio_path, reference_embedding):
+    return speech_manager.compute_similarity_to(audio_path, reference_embedding)
+
 def cleanup_speechbrain():
     """手動清理函數"""
     speech_manager.cleanup_model()
@@ -217,23 +266,18 @@ def get_speechbrain_status():
         "max_usage": speech_manager.max_usage,
         "memory_mb": memory_mb,
         "memory_ok": memory_ok,
+        "pinned": speech_manager.pinned,
         "last_used": speech_manager.last_used
     }
 
-# 定期清理線程
+# 定期清理（每個 worker 各自持有模型，由維護排程器每 5 分鐘在各 worker 執行）
 def periodic_cleanup():
-    """定期檢查和清理"""
-    while True:
-        time.sleep(300)  # 每5分鐘檢查一次
-        try:
-            if speech_manager.should_cleanup():
-                logger.info("🧹 定期清理觸發")
-                speech_manager.cleanup_model()
-        except Exception as e:
-            logger.error(f"定期清理錯誤: {e}")
+    """定期檢查和清理（與相似度計算互斥）"""
+    with speech_manager.lock:
+        if speech_manager.should_cleanup():
+            logger.info("🧹 定期清理觸發")
+            speech_manager.cleanup_model()
 
-# 啟動清理線程
-cleanup_thread = threading.Thread(target=periodic_cleanup, daemon=True)
-cleanup_thread.start()
+scheduler.register("speechbrain_cleanup", 300, periodic_cleanup)
 
 logger.info("🚀 SpeechBrain 記憶體管理器已初始化")
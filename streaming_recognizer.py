@@ -0,0 +1,145 @@
+# === streaming_recognizer.py - 邊下載邊識別的串流路徑 ===
+import logging
+import subprocess
+import threading
+
+from metrics import histogram
+
+logger = logging.getLogger(__name__)
+
+# 從收到音頻訊息到取得評分結果的時間，依路徑（streaming / batch）區分
+time_to_feedback = histogram(
+    "time_to_first_feedback_seconds",
+    "Time from receiving a LINE audio message to having a pronunciation result",
+    label_names=("path",),
+)
+
+PCM_CHUNK_BYTES = 3200  # 16kHz * 16bit * 100ms
+
+
+class StreamingRecognizer:
+    """將 LINE 下載中的音頻即時解碼為 PCM，並送入 Google streaming_recognize 或 Azure push stream"""
+
+    def __init__(self, mode="", client_factory=None, language_code="th-TH", chunk_bytes=PCM_CHUNK_BYTES):
+        self.mode = (mode or "").lower()  # "" = 關閉, "google", "azure"
+        self.client_factory = client_factory
+        self.language_code = language_code
+        self.chunk_bytes = chunk_bytes
+
+    @property
+    def enabled(self):
+        return self.mode in ("google", "azure")
+
+    def decode_chunks(self, encoded_chunks, raw_parts, state):
+        """以 ffmpeg 管線解碼，產生 16kHz 單聲道 PCM 區塊；原始內容同步存入 raw_parts"""
+        from pydub import AudioSegment
+
+        process = subprocess.Popen(
+            [AudioSegment.converter, "-loglevel", "error", "-i", "pipe:0",
+             "-f", "s16le", "-ac", "1", "-ar", "16000", "pipe:1"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+        stop = threading.Event()
+        finished = state["finished"]
+
+        def feed():
+            # 持續下載；即使解碼器提前結束也要收完原始內容，以便回退到批次路徑。
+            # 已取得識別結果（finished）時不再需要原始內容，立即停止讀取
+            stdin_open = True
+            try:
+                for chunk in encoded_chunks:
+                    if finished.is_set():
+                        break
+                    raw_parts.append(chunk)
+                    if stop.is_set():
+                        continue
+                    if stdin_open:
+                        try:
+                            process.stdin.write(chunk)
+                            process.stdin.flush()
+                        except (BrokenPipeError, ValueError):
+                            stdin_open = False
+            finally:
+                try:
+                    process.stdin.close()
+                except Exception:
+                    pass
+
+        feeder = threading.Thread(target=feed, daemon=True)
+        state["feeder"] = feeder
+        feeder.start()
+        try:
+            while True:
+                data = process.stdout.read(self.chunk_bytes)
+                if not data:
+                    break
+                yield data
+        finally:
+            stop.set()
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+
+    def recognize_google(self, pcm_chunks):
+        """Google streaming_recognize；收到第一個 final 結果即回傳文字"""
+        from google.cloud import speech
+
+        client = self.client_factory()
+        streaming_config = speech.StreamingRecognitionConfig(
+            config=speech.RecognitionConfig(
+                encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+                sample_rate_hertz=16000,
+                language_code=self.language_code
+            ),
+            single_utterance=True,
+            interim_results=False
+        )
+        requests_iter = (speech.StreamingRecognizeRequest(audio_content=chunk) for chunk in pcm_chunks)
+        responses = client.streaming_recognize(config=streaming_config, requests=requests_iter)
+
+        for response in responses:
+            for result in response.results:
+                if result.is_final and result.alternatives:
+                    transcript = result.alternatives[0].transcript
+                    logger.info(f"Streaming recognized text: {transcript}")
+                    return transcript
+        return None
+
+    def recognize(self, encoded_chunks, reference_text):
+        """執行串流識別。回傳 (backend, payload, raw_audio)：
+        backend 為 "google"（payload 為識別文字）或 "azure"（payload 為評估結果），失敗時 backend 為 None；
+        raw_audio 只在失敗時提供（供批次路徑使用），成功時下載會提前停止，回傳 None"""
+        encoded_chunks = iter(encoded_chunks)
+        raw_parts = []
+        state = {"finished": threading.Event()}
+        backend, payload = None, None
+        pcm_chunks = self.decode_chunks(encoded_chunks, raw_parts, state)
+        try:
+            if self.mode == "azure":
+                from azure_manager import azure_manager
+                result = azure_manager.assess_chunks(pcm_chunks, reference_text)
+                if result.get("success"):
+                    backend, payload = "azure", result
+            else:
+                transcript = self.recognize_google(pcm_chunks)
+                if transcript:
+                    backend, payload = "google", transcript
+        except Exception as e:
+            logger.warning(f"⚠️ Streaming recognition failed: {e}")
+        finally:
+            if backend is not None:
+                # 已有結果：停止下載其餘音訊（此時原始內容不完整，也不會再使用）
+                state["finished"].set()
+            try:
+                pcm_chunks.close()
+            except ValueError:
+                # gRPC 請求執行緒或 Azure 寫入執行緒仍在讀取產生器；ffmpeg 結束後會自行停止
+                pass
+
+        if backend is None:
+            # 回退到批次路徑前先收完下載內容
+            if "feeder" in state:
+                state["feeder"].join()
+            else:
+                raw_parts.extend(encoded_chunks)
+        return backend, payload, None if backend else b''.join(raw_parts)
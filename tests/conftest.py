@@ -0,0 +1,5 @@
+# 測試直接匯入專案根目錄的模組（本專案沒有套件設定）
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,104 @@
+# === 考試結果佇列：滾動統計、失敗重試與佇列上限 ===
+from exam_results import RECENT_LIMIT, ExamResultQueue, InMemoryExamBackend, apply_exam_stats
+
+
+def exam(user_id, n, exam_type="Numbers", score=7, total=10, seconds=(2.0, None)):
+    return {
+        "id": f"{user_id}-{n}",
+        "user_id": user_id,
+        "exam_type": exam_type,
+        "score": score,
+        "total": total,
+        "timestamp": f"2026-01-01 00:00:{n:02d}",
+        "answers": [{"seconds": s} for s in seconds],
+    }
+
+
+class FlakyBackend(InMemoryExamBackend):
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+
+    def commit(self, results):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("unavailable")
+        super().commit(results)
+
+
+def make_queue(backend, **kwargs):
+    # 不讓背景執行緒在測試中途寫入
+    return ExamResultQueue(backend, flush_interval=3600, max_pending=10 ** 6, **kwargs)
+
+
+def test_apply_exam_stats_accumulates_totals():
+    stats = apply_exam_stats(None, [exam("u1", 1, score=6), exam("u1", 2, exam_type="Food", score=9)])
+    stats = apply_exam_stats(stats, [exam("u1", 3, score=10, seconds=(1.0, 3.0))])
+
+    assert stats["exams_taken"] == 3
+    assert (stats["questions_total"], stats["correct_total"]) == (30, 25)
+    assert stats["answers_timed"] == 4
+    assert stats["answer_seconds_sum"] == 8.0
+    assert stats["by_type"]["Numbers"] == {"count": 2, "correct": 16, "questions": 20, "best_ratio": 1.0}
+    assert stats["by_type"]["Food"]["best_ratio"] == 0.9
+    assert [r["score"] for r in stats["recent"]] == [6, 9, 10]
+
+
+def test_apply_exam_stats_does_not_modify_its_input():
+    stats = apply_exam_stats(None, [exam("u1", 1)])
+    before = {"by_type": dict(stats["by_type"]["Numbers"]), "recent": list(stats["recent"])}
+    apply_exam_stats(stats, [exam("u1", 2)])
+    assert stats["by_type"]["Numbers"] == before["by_type"]
+    assert stats["recent"] == before["recent"]
+
+
+def test_recent_history_is_bounded():
+    stats = apply_exam_stats(None, [exam("u1", n % 60) for n in range(RECENT_LIMIT + 5)])
+    assert len(stats["recent"]) == RECENT_LIMIT
+    assert stats["exams_taken"] == RECENT_LIMIT + 5
+
+
+def test_load_stats_includes_queued_results():
+    backend = InMemoryExamBackend()
+    queue = make_queue(backend)
+    queue.enqueue(exam("u1", 1))
+    assert queue.flush() == 1
+    queue.enqueue(exam("u1", 2, score=3))
+    queue.enqueue(exam("u2", 1))
+
+    assert queue.load_stats("u1")["exams_taken"] == 2
+    assert backend.load_stats("u1")["exams_taken"] == 1
+    assert queue.load_stats("u3") is None
+    queue.close()
+
+
+def test_failed_flush_requeues_in_order():
+    backend = FlakyBackend(failures=1)
+    queue = make_queue(backend)
+    queue.enqueue(exam("u1", 1))
+    queue.enqueue(exam("u1", 2))
+    assert queue.flush() == 0
+
+    queue.enqueue(exam("u1", 3))
+    assert [r["id"] for r in queue.pending_for("u1")] == ["u1-1", "u1-2", "u1-3"]
+    assert queue.flush() == 3
+    assert [r["timestamp"][-2:] for r in backend.load_stats("u1")["recent"]] == ["01", "02", "03"]
+    queue.close()
+
+
+def test_queue_drops_oldest_results_beyond_the_limit():
+    backend = FlakyBackend(failures=2)
+    queue = make_queue(backend, max_queued=3)
+    for n in range(5):
+        queue.enqueue(exam("u1", n))
+    assert [r["id"] for r in queue.pending_for("u1")] == ["u1-2", "u1-3", "u1-4"]
+
+    # 重試時放回的結果也受上限限制，較新的結果保留
+    assert queue.flush() == 0
+    queue.enqueue(exam("u1", 5))
+    assert queue.flush() == 0
+    queue.enqueue(exam("u1", 6))
+    assert [r["id"] for r in queue.pending_for("u1")] == ["u1-4", "u1-5", "u1-6"]
+    assert queue.flush() == 3
+    assert backend.load_stats("u1")["exams_taken"] == 3
+    queue.close()
@@ -0,0 +1,262 @@
+# === 學習進度批次寫入：batch 切分、摘要與失敗重試 ===
+import pytest
+
+from progress_summary import RANKED_WORDS, build_summary
+from progress_writer import (
+    FIRESTORE_BATCH_LIMIT, FirestoreProgressBackend, InMemoryProgressBackend, ProgressWriter
+)
+
+
+class RecordingBackend(FirestoreProgressBackend):
+    """只記錄每個 batch 的內容，不連線 Firestore"""
+
+    def __init__(self):
+        self.batches = []
+
+    def _commit_users(self, chunk):
+        self.batches.append([(user_id, [word for word, _ in user_updates]) for user_id, user_updates in chunk])
+
+
+class FailingOnce(InMemoryProgressBackend):
+    def __init__(self):
+        super().__init__()
+        self.fail = True
+
+    def commit(self, updates):
+        if self.fail:
+            self.fail = False
+            raise RuntimeError("precondition failed")
+        super().commit(updates)
+
+
+def updates_for(user_id, count):
+    return [((user_id, f"w{i}"), {"score": i % 100, "last_practice": "2026-01-01", "times": 1})
+            for i in range(count)]
+
+
+def make_writer(backend, **kwargs):
+    # 不讓背景執行緒在測試中途寫入
+    return ProgressWriter(backend, flush_interval=3600, max_pending=10 ** 6, **kwargs)
+
+
+def comparable(summary):
+    return {key: summary[key] for key in ("word_count", "practice_count", "score_sum", "histogram",
+                                          "best_score", "worst_score")}
+
+
+def test_batches_stay_within_the_write_limit():
+    backend = RecordingBackend()
+    backend.commit(updates_for("big", 1200) + updates_for("small", 3))
+
+    for batch in backend.batches:
+        # 每位使用者的詞彙寫入加上一筆摘要更新
+        assert sum(len(words) + 1 for _, words in batch) <= FIRESTORE_BATCH_LIMIT
+        users = [user_id for user_id, _ in batch]
+        assert len(users) == len(set(users))  # 同一份摘要在一個 batch 中只更新一次
+    written = [word for batch in backend.batches for user_id, words in batch if user_id == "big" for word in words]
+    assert sorted(written) == sorted(f"w{i}" for i in range(1200))
+
+
+def test_users_are_not_split_when_they_fit():
+    backend = RecordingBackend()
+    backend.commit(updates_for("a", 300) + updates_for("b", 300))
+
+    assert [[user_id for user_id, _ in batch] for batch in backend.batches] == [["a"], ["b"]]
+
+
+def test_summary_matches_a_rebuilt_summary():
+    backend = InMemoryProgressBackend()
+    writer = make_writer(backend)
+    for round_ in range(3):
+        for i in range(2 * RANKED_WORDS):
+            writer.record("u1", f"w{i}", (i * 37 + round_ * 11) % 101)
+        writer.flush()
+
+    summary = backend.load_summary("u1")
+    rebuilt = build_summary(backend.load("u1"))
+    assert comparable(summary) == comparable(rebuilt)
+    # 排行只是近似（名單外的詞要再練習才會回到排行），但其中的分數必須是目前的分數且依序排列
+    docs = backend.load("u1")
+    for ranked, highest in ((summary["top"], True), (summary["bottom"], False)):
+        assert len(ranked) == RANKED_WORDS
+        assert all(entry["score"] == docs[entry["word"]]["score"] for entry in ranked)
+        assert [entry["score"] for entry in ranked] == sorted((e["score"] for e in ranked), reverse=highest)
+    assert summary["best_word"] == rebuilt["best_word"]
+    assert summary["worst_word"] == rebuilt["worst_word"]
+    writer.close()
+
+
+def test_load_summary_includes_pending_updates():
+    backend = InMemoryProgressBackend()
+    writer = make_writer(backend)
+    writer.record("u1", "hello", 40)
+    writer.flush()
+
+    writer.record("u1", "hello", 90, previous=40)
+    writer.record("u1", "world", 10)
+    summary = writer.load_summary("u1")
+    assert summary["word_count"] == 2
+    assert summary["score_sum"] == 100
+    assert summary["best_word"] == "hello"
+    assert backend.load_summary("u1")["score_sum"] == 40
+    writer.close()
+
+
+def test_failed_flush_is_requeued_and_merged():
+    backend = FailingOnce()
+    writer = make_writer(backend)
+    writer.record("u1", "hello", 50)
+    assert writer.flush() == 0
+    assert writer.pending_for("u1")["hello"]["times"] == 1
+
+    writer.record("u1", "hello", 80)
+    assert writer.flush() == 1
+    doc = backend.load("u1")["hello"]
+    assert (doc["score"], doc["times"]) == (80, 2)
+    summary = backend.load_summary("u1")
+    assert (summary["word_count"], summary["practice_count"], summary["score_sum"]) == (1, 2, 80)
+    writer.close()
+
+
+def test_on_flush_reports_written_users():
+    flushed = []
+    writer = make_writer(InMemoryProgressBackend(), on_flush=flushed.append)
+    writer.record("u1", "a", 10)
+    writer.record("u2", "b", 20)
+    writer.flush()
+    assert flushed == [{"u1", "u2"}]
+    writer.close()
+
+
+class FakeSnapshot:
+    def __init__(self, ref, data, update_time):
+        self.reference = ref
+        self.id = ref.path.rsplit("/", 1)[-1]
+        self.exists = data is not None
+        self.update_time = update_time
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+
+class FakeRef:
+    def __init__(self, db, path):
+        self.db = db
+        self.path = path
+
+    def collection(self, name):
+        return FakeRef(self.db, f"{self.path}/{name}")
+
+    def document(self, name):
+        return FakeRef(self.db, f"{self.path}/{name}")
+
+    def get(self):
+        data, update_time = self.db.docs.get(self.path, (None, None))
+        return FakeSnapshot(self, data, update_time)
+
+    def stream(self):
+        prefix = self.path + "/"
+        for path in sorted(self.db.docs):
+            if path.startswith(prefix) and "/" not in path[len(prefix):]:
+                yield FakeRef(self.db, path).get()
+
+
+class FakeBatch:
+    def __init__(self, db):
+        self.db = db
+        self.writes = []
+
+    def set(self, ref, data, merge=False):
+        self.writes.append(("set", ref, data, None))
+
+    def update(self, ref, data, option=None):
+        self.writes.append(("update", ref, data, option))
+
+    def create(self, ref, data):
+        self.writes.append(("create", ref, data, None))
+
+    def commit(self):
+        self.db.apply(self.writes)
+
+
+class FakeDb:
+    """Firestore 的最小替身：batch 全部成功或全部失敗，支援 update_time 前置條件與 Increment"""
+
+    def __init__(self):
+        self.docs = {}  # path -> (data, update_time)
+        self.clock = 0
+        self.batch_sizes = []
+
+    def collection(self, name):
+        return FakeRef(self, name)
+
+    def get_all(self, refs):
+        return [ref.get() for ref in refs]
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def write_option(self, last_update_time):
+        return last_update_time
+
+    def apply(self, writes):
+        from google.cloud import firestore
+
+        assert len(writes) <= FIRESTORE_BATCH_LIMIT
+        for kind, ref, _, option in writes:
+            data, update_time = self.docs.get(ref.path, (None, None))
+            if kind == "create" and data is not None:
+                raise RuntimeError(f"already exists: {ref.path}")
+            if kind == "update" and (data is None or update_time != option):
+                raise RuntimeError(f"precondition failed: {ref.path}")
+        self.clock += 1
+        self.batch_sizes.append(len(writes))
+        for kind, ref, data, _ in writes:
+            current = dict(self.docs.get(ref.path, (None, None))[0] or {}) if kind != "create" else {}
+            for key, value in data.items():
+                if value is firestore.DELETE_FIELD:
+                    current.pop(key, None)
+                elif isinstance(value, firestore.Increment):
+                    current[key] = current.get(key, 0) + value.value
+                else:
+                    current[key] = value
+            self.docs[ref.path] = (current, self.clock)
+
+    def touch(self, path):
+        # 模擬其他 worker 同時寫入摘要
+        self.clock += 1
+        self.docs[path] = (self.docs[path][0], self.clock)
+
+
+def test_firestore_summary_precondition_and_large_users():
+    pytest.importorskip("google.cloud.firestore")
+    db = FakeDb()
+    backend = FirestoreProgressBackend(db)
+    writer = make_writer(backend)
+
+    for i in range(FIRESTORE_BATCH_LIMIT + 100):
+        writer.record("u1", f"w{i}", i % 101)
+    assert writer.flush() == FIRESTORE_BATCH_LIMIT + 100
+    assert max(db.batch_sizes) <= FIRESTORE_BATCH_LIMIT
+
+    # 摘要在讀取後被其他 worker 更新：前置條件失敗，整批放回佇列，下次重新讀取後寫入
+    summary_path = "users/u1/summary/progress"
+    original_get_all = db.get_all
+
+    def racing_get_all(refs):
+        snapshots = original_get_all(refs)
+        db.get_all = original_get_all
+        db.touch(summary_path)
+        return snapshots
+
+    db.get_all = racing_get_all
+    writer.record("u1", "w0", 99, previous=0)
+    assert writer.flush() == 0
+    assert writer.flush() == 1
+
+    progress = {snap.id: snap.to_dict() for snap in FakeRef(db, "users/u1/progress").stream()}
+    summary = db.docs[summary_path][0]
+    assert comparable(summary) == comparable(build_summary(progress))
+    assert progress["w0"] == {"score": 99, "last_practice": progress["w0"]["last_practice"], "times": 2}
+    writer.close()
@@ -0,0 +1,109 @@
+# === 連續學習提醒：分批 multicast、進度紀錄與中斷後恢復 ===
+from datetime import date
+
+import pytest
+
+from reminders import StreakReminderJob
+from user_store import SQLiteUserStore
+
+TODAY = date(2026, 3, 2)
+YESTERDAY = "2026-03-01"
+
+
+class ApiError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"LINE API error {status_code}")
+        self.status_code = status_code
+
+
+class FakeLineClient:
+    """模擬 LINE multicast：以 retry key 去除重複請求；可指定第幾次呼叫失敗（未送達）或回應遺失（已送達）"""
+
+    def __init__(self, fail_on=(), lose_response_on=()):
+        self.fail_on = set(fail_on)
+        self.lose_response_on = set(lose_response_on)
+        self.calls = 0
+        self.accepted = {}  # retry key -> 收件人
+        self.delivered = []
+
+    def multicast(self, to, messages, retry_key=None):
+        self.calls += 1
+        if self.calls in self.fail_on:
+            raise ApiError(500)
+        if retry_key in self.accepted:
+            raise ApiError(409)
+        self.accepted[retry_key] = list(to)
+        self.delivered.extend(to)
+        if self.calls in self.lose_response_on:
+            raise TimeoutError("response lost")
+
+
+@pytest.fixture
+def store():
+    store = SQLiteUserStore(":memory:")
+    store.save({f"u{i:03d}": {"last_active": YESTERDAY, "streak": 1 + i % 4} for i in range(23)})
+    store.save({
+        "inactive": {"last_active": "2026-02-20", "streak": 9},
+        "today": {"last_active": TODAY.isoformat(), "streak": 9},
+    })
+    return store
+
+
+def eligible(min_streak=1):
+    return {f"u{i:03d}" for i in range(23) if 1 + i % 4 >= min_streak}
+
+
+def job(store, client, chunk_size=5, **kwargs):
+    return StreakReminderJob(store, client, chunk_size=chunk_size, rate=0, **kwargs)
+
+
+def test_reminds_every_at_risk_user_once(store):
+    client = FakeLineClient()
+    state = job(store, client, min_streak=2).run(today=TODAY)
+
+    assert sorted(client.delivered) == sorted(eligible(min_streak=2))
+    assert all(len(to) <= 5 for to in client.accepted.values())
+    assert state == {"cursor": max(eligible(2)), "sent": len(eligible(2)), "requests": 4, "done": True}
+
+    # 當天已完成：不再送出
+    assert job(store, client, min_streak=2).run(today=TODAY)["done"]
+    assert client.calls == 4
+
+
+def test_dry_run_counts_without_sending(store):
+    client = FakeLineClient()
+    assert job(store, client).run(today=TODAY, dry_run=True)["pending"] == 23
+    assert client.calls == 0
+
+
+def test_resume_after_a_failed_request(store):
+    client = FakeLineClient(fail_on={3})
+    with pytest.raises(ApiError):
+        job(store, client).run(today=TODAY)
+    checkpoint = store.load_checkpoint(f"streak_reminder_{TODAY.isoformat()}")
+    assert (checkpoint["sent"], checkpoint["done"]) == (10, False)
+
+    state = job(store, client).run(today=TODAY)
+    assert sorted(client.delivered) == sorted(eligible())
+    assert (state["sent"], state["done"]) == (23, True)
+
+
+def test_lost_response_is_not_delivered_twice(store):
+    # 第二批已送達但回應遺失：恢復時同一批使用同一個 retry key，LINE 回應 409
+    client = FakeLineClient(lose_response_on={2})
+    with pytest.raises(TimeoutError):
+        job(store, client).run(today=TODAY)
+
+    state = job(store, client).run(today=TODAY)
+    assert sorted(client.delivered) == sorted(eligible())
+    assert state["sent"] == 23
+
+
+def test_resume_with_different_batches_reaches_everyone(store):
+    # 回應遺失後以不同的批次大小恢復：新批次與已送達的批次開頭相同但收件人不同，不可被當成重複而略過
+    client = FakeLineClient(lose_response_on={2})
+    with pytest.raises(TimeoutError):
+        job(store, client, chunk_size=3).run(today=TODAY)
+
+    job(store, client, chunk_size=7).run(today=TODAY)
+    assert set(client.delivered) == eligible()
@@ -0,0 +1,103 @@
+# === 複習佇列：隨機新詞的二分搜尋與詞彙熱重載 ===
+import random
+
+from spaced_repetition import DAY_SECONDS, ReviewQueue
+from vocabulary import VocabularyIndex
+
+
+def make_vocab(words, categories):
+    """words: 英文詞彙清單；categories: {分類鍵: [英文詞彙, ...]}"""
+    return VocabularyIndex.from_thai_data({
+        "basic_words": {word: {"thai": f"th-{word}", "pronunciation": word} for word in words},
+        "categories": {key: {"name": key.title(), "words": members} for key, members in categories.items()},
+    })
+
+
+def practiced(words, now=0):
+    # 已練習且尚未到期的複習狀態
+    return {word: {"due": now + DAY_SECONDS, "score": 80} for word in words}
+
+
+def draw_all(queue, key, exclude=None, draws=2000):
+    pool = queue.vocab.category_words[key] if key else queue.vocab.words
+    return {queue._unseen(pool, key, exclude) for _ in range(draws)}
+
+
+def test_unseen_returns_every_unpracticed_word_and_nothing_else():
+    random.seed(7)
+    words = [f"w{i}" for i in range(40)]
+    mastery = practiced(random.sample(words, 25))
+    queue = ReviewQueue(mastery, make_vocab(words, {}))
+
+    assert draw_all(queue, None) == set(words) - set(mastery)
+
+
+def test_unseen_within_a_category():
+    random.seed(3)
+    words = [f"w{i}" for i in range(30)]
+    odd = words[1::2]
+    queue = ReviewQueue(practiced(["w1", "w3", "w4", "w29"]), make_vocab(words, {"odd": odd}))
+
+    assert draw_all(queue, "odd") == set(odd) - {"w1", "w3", "w29"}
+
+
+def test_unseen_respects_exclude_and_exhaustion():
+    words = ["a", "b", "c"]
+    queue = ReviewQueue(practiced(["a"]), make_vocab(words, {}))
+    assert draw_all(queue, None, exclude="b") == {"c"}
+
+    queue.record("c", 90, now=0)
+    assert draw_all(queue, None, exclude="b") == {None}
+    queue.record("b", 90, now=0)
+    assert queue._unseen(queue.vocab.words, None, None) is None
+
+
+def test_record_marks_new_words_as_seen():
+    random.seed(1)
+    words = [f"w{i}" for i in range(20)]
+    queue = ReviewQueue({}, make_vocab(words, {"all": words}))
+    for word in words[:15]:
+        queue.record(word, 80, now=0)
+
+    assert queue.seen[None] == list(range(15))
+    assert draw_all(queue, None) == set(words[15:])
+    assert draw_all(queue, "all") == set(words[15:])
+
+
+def test_next_word_prefers_due_words_then_new_words():
+    words = ["a", "b", "c", "d"]
+    mastery = practiced(["a", "b"])
+    mastery["b"]["due"] = 10
+    queue = ReviewQueue(mastery, make_vocab(words, {}))
+
+    assert queue.next_word(now=100) == "b"
+    assert queue.next_word(now=100, exclude="b") in {"c", "d"}
+    assert queue.next_word(now=0) in {"c", "d"}
+
+
+def test_rebind_recomputes_positions_after_reload():
+    random.seed(5)
+    old_words = [f"w{i}" for i in range(10)]
+    mastery = practiced(["w0", "w1", "w2"])
+    queue = ReviewQueue(mastery, make_vocab(old_words, {"first": old_words[:5]}))
+    assert draw_all(queue, "first") == {"w3", "w4"}
+
+    # 熱重載：詞彙順序改變、加入新詞，分類成員也不同
+    new_words = ["n0"] + list(reversed(old_words)) + ["n1"]
+    queue.rebind(make_vocab(new_words, {"first": ["n0", "w2", "w5", "w0"], "second": ["w1", "n1"]}))
+
+    assert draw_all(queue, None) == set(new_words) - set(mastery)
+    assert draw_all(queue, "first") == {"n0", "w5"}
+    assert draw_all(queue, "second") == {"n1"}
+    assert queue.next_word(category="second", now=0) == "n1"
+
+
+def test_rebind_keeps_heaps_for_words_still_in_the_vocabulary():
+    words = ["a", "b", "c"]
+    mastery = practiced(["a", "b"])
+    mastery["a"]["due"] = 5
+    queue = ReviewQueue(mastery, make_vocab(words, {"cat": ["a", "c"]}))
+
+    queue.rebind(make_vocab(words, {"cat": ["b", "c"]}))
+    assert queue.weakest() == "a"
+    assert queue.next_word(category="cat", now=DAY_SECONDS + 1) == "b"
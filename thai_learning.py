@@ -3,24 +3,47 @@ import os
 import uuid
 import random
 import json
-import firebase_admin
-from firebase_admin import credentials, firestore
 from datetime import datetime, timedelta
 import io
-import numpy as np
-from pydub import AudioSegment
 import requests
 import logging
+import threading
+import time
+import atexit
+import functools
+from collections import OrderedDict
+from contextlib import contextmanager
 from dotenv import load_dotenv
 import random
 from difflib import SequenceMatcher
 from linebot.models import TextSendMessage, ImageSendMessage, QuickReply, QuickReplyButton, MessageAction
 # 導入優化的記憶體管理 (添加到其他 import 之後)
-from speechbrain_manager import compute_similarity, cleanup_speechbrain, get_speechbrain_status
-
-
-from flask import Flask, request, abort
-from linebot import LineBotApi, WebhookHandler
+from speechbrain_manager import compute_similarity, compute_similarity_to, cleanup_speechbrain, get_speechbrain_status
+from azure_manager import azure_manager, score_azure, to_chain_result
+from scorer_chain import scorer_chain, ScoringRequest
+from streaming_recognizer import StreamingRecognizer, time_to_feedback
+from admission import admission
+from metrics import timed, counter, gauge, render_prometheus
+from progress_writer import create_progress_writer, FirestoreProgressBackend
+from progress_summary import build_summary, apply_summary_updates
+from progress_cache import ProgressCache, firestore_summary_listener, register_cache_metrics
+from exam_results import create_exam_result_queue, FirestoreExamBackend
+from user_store import create_user_store, field_digests, serialize_fields, user_store_writes
+from records import UserState, ExamSession, Card, BoardState
+from spaced_repetition import ReviewQueue
+from vocab_pack import VocabularyStore
+from exam_builder import ExamBuilder
+from memory_board import render_board
+from reply_templates import build_reply_templates
+from line_client import LineClient, register_quota_metrics
+from deferred_reply import ReplyScheduler
+from lazy import Lazy, lazy_import, warm_up, init_status
+from maintenance import scheduler, TempFileIndex
+from preload import shared, is_preloaded, reference_embedding, memory_report, register_memory_metrics
+
+
+from flask import Flask, Response, request, abort, jsonify
+from linebot import WebhookHandler
 from linebot.exceptions import InvalidSignatureError
 from linebot.models import (
     MessageEvent, TextMessage, AudioMessage, ImageMessage,
@@ -28,9 +51,6 @@ from linebot.models import (
     TemplateSendMessage, ButtonsTemplate, MessageAction,
     URIAction, QuickReply, QuickReplyButton
 )
-import azure.cognitiveservices.speech as speechsdk
-from google.cloud import storage
-from google.cloud import speech
 import difflib
 import tempfile
 
@@ -102,6 +122,12 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 重量級 SDK 在第一次使用時才匯入（見 lazy.py）
+speechsdk = lazy_import("azure.cognitiveservices.speech")
+storage = lazy_import("google.cloud.storage")
+speech = lazy_import("google.cloud.speech")
+pydub = lazy_import("pydub")
+
 # 加載環境變數
 load_dotenv()  # 載入 .env 文件中的環境變數 (本地開發用)
 
@@ -113,7 +139,21 @@ processed_events =  {}
 LINE_CHANNEL_ACCESS_TOKEN = os.environ.get('LINE_CHANNEL_ACCESS_TOKEN', 'YOUR_CHANNEL_ACCESS_TOKEN')
 LINE_CHANNEL_SECRET = os.environ.get('LINE_CHANNEL_SECRET', 'YOUR_CHANNEL_SECRET')
 
-line_bot_api = LineBotApi(LINE_CHANNEL_ACCESS_TOKEN)
+# 連線池、429 / 5xx 自動重試、推播合併與額度統計
+# LINE_API_ENDPOINT / LINE_API_DATA_ENDPOINT 可改指向測試用的假 LINE 伺服器（見 benchmarks/bench_asgi.py）
+LINE_API_ENDPOINT = os.environ.get('LINE_API_ENDPOINT', 'https://api.line.me')
+LINE_API_DATA_ENDPOINT = os.environ.get('LINE_API_DATA_ENDPOINT', 'https://api-data.line.me')
+line_bot_api = LineClient(
+    LINE_CHANNEL_ACCESS_TOKEN,
+    quota_refresh=float(os.environ.get('LINE_QUOTA_REFRESH', 300)),
+    endpoint=LINE_API_ENDPOINT,
+    data_endpoint=LINE_API_DATA_ENDPOINT
+)
+register_quota_metrics(line_bot_api)
+# 評分期間保留回覆權杖的延遲預算（秒）；回覆權杖約一分鐘後失效
+reply_scheduler = ReplyScheduler(line_bot_api, budget=float(os.environ.get('REPLY_BUDGET_SECONDS', 8)))
+EXAM_INTERIM_MESSAGE = TextSendMessage(text="✅ Audio received. Evaluating...")
+EXAM_TEXT_ANSWER_MESSAGE = TextSendMessage(text="✍️ This question needs a text answer. Please type your answer.")
 handler = WebhookHandler(LINE_CHANNEL_SECRET)
 
 # Azure Speech Services設定
@@ -170,7 +210,8 @@ def upload_file_to_gcs(file_content, destination_blob_name, content_type=None):
     """Upload file to Google Cloud Storage and return public URL"""
     try:
         # 初始化 GCS 客戶端
-        storage_client = init_gcs_client()
+        with timed("gcs_client_init"):
+            storage_client = gcs_client.load()
         if not storage_client:
             logger.error("Unable to initialize GCS client")
             return None
@@ -186,15 +227,17 @@ def upload_file_to_gcs(file_content, destination_blob_name, content_type=None):
             blob.content_type = content_type
             
         # 上傳檔案
-        if hasattr(file_content, 'read'):
-            # 如果是檔案物件
-            blob.upload_from_file(file_content, rewind=True)
-        else:
-            # 如果是二進制數據
-            blob.upload_from_string(file_content)
+        with timed("gcs_upload"):
+            if hasattr(file_content, 'read'):
+                # 如果是檔案物件
+                blob.upload_from_file(file_content, rewind=True)
+            else:
+                # 如果是二進制數據
+                blob.upload_from_string(file_content)
             
         # 設置為公開可讀取
-        blob.make_public()
+        with timed("gcs_make_public"):
+            blob.make_public()
         
         # 返回公開 URL
         logger.info(f"Successfully uploaded file to {destination_blob_name}, URL: {blob.public_url}")
@@ -204,20 +247,47 @@ def upload_file_to_gcs(file_content, destination_blob_name, content_type=None):
         logger.error(f"Error uploading file to GCS: {str(e)}")
         return None
 
+# GCS 用戶端只建立一次（失敗時下次上傳再試）
+gcs_client = Lazy("gcs", init_gcs_client)
+
 # 測試 Azure 語音服務連接
 def test_azure_connection():
     """Test Azure Speech Services connection"""
     try:
-        speech_config = speechsdk.SpeechConfig(subscription=speech_key, region=speech_region)
+        config = azure_manager.get_speech_config()
         logger.info("Azure Speech Services connection test successful")
+        return config
     except Exception as e:
         logger.error(f"Azure Speech Services connection test failed: {str(e)}")
 
-# 在模組層級調用這個函數
-test_azure_connection()
+# 不在匯入時執行，改由暖機執行緒（或第一次評分）建立 SpeechConfig
+azure_speech = Lazy("azure_speech", test_azure_connection)
 
 # === LINE Bot Webhook 處理 ===
+def is_duplicate_event(data):
+    """以 webhookEventId 判斷重複送達的事件（LINE 重送時 ID 不變），並記錄新事件"""
+    if 'events' not in data or len(data['events']) == 0:
+        return False
+    event_id = data['events'][0].get('webhookEventId', '')
+    if event_id and event_id in processed_events:
+        logger.warning(f"Received duplicate event ID: {event_id}，ignoring")
+        return True
+
+    # 記錄已處理的事件
+    if event_id:
+        processed_events[event_id] = datetime.now()
+
+    # 清理舊事件記錄，避免佔用過多記憶體
+    if len(processed_events) > 1000:
+        now = datetime.now()
+        old_keys = [k for k, v in processed_events.items()
+                   if (now - v).total_seconds() > 3600]
+        for k in old_keys:
+            processed_events.pop(k, None)
+    return False
+
 @app.route("/callback", methods=['POST'])
+@timed("callback")
 def callback():
     try:
         # 增加更詳細的錯誤處理
@@ -228,24 +298,8 @@ def callback():
         logger.info(f"Callback content: {body}")
         
         # 檢查是否為重複事件
-        data = json.loads(body)
-        if 'events' in data and len(data['events']) > 0:
-            event_id = data['events'][0].get('webhookEventId', '')
-            if event_id and event_id in processed_events:
-                logger.warning(f"Received duplicate event ID: {event_id}，ignoring")
-                return 'OK'
-                
-            # 記錄已處理的事件
-            if event_id:
-                processed_events[event_id] = datetime.now()
-                
-            # 清理舊事件記錄，避免佔用過多記憶體
-            if len(processed_events) > 1000:
-                now = datetime.now()
-                old_keys = [k for k, v in processed_events.items() 
-                           if (now - v).total_seconds() > 3600]
-                for k in old_keys:
-                    processed_events.pop(k, None)
+        if is_duplicate_event(json.loads(body)):
+            return 'OK'
         
         handler.handle(body, signature)
     except InvalidSignatureError as e:
@@ -260,29 +314,187 @@ def callback():
 
 # === 用戶數據管理 ===
 class UserData:
-    def __init__(self):
-        self.users = {}
+    """活躍使用者的記憶體快取（LRU），背後由持久化儲存支撐
+
+    第一次存取時才從 store 載入；背景執行緒定期比對欄位雜湊，只寫回有變更的欄位。
+    處理中的請求以 checkout() 釘住使用者，逐出時略過，避免請求仍在修改的物件被逐出後變更遺失。
+    """
+
+    def __init__(self, store=None, max_resident=5000, flush_interval=5.0):
+        self.store = store
+        self.max_resident = max_resident
+        self.flush_interval = flush_interval
+        self.users = OrderedDict()
+        self.digests = {}  # user_id -> 上次載入 / 寫入時各欄位的雜湊
+        self.checked_out = {}  # user_id -> 處理中的請求數（不逐出）
+        self.touched = set()  # 上次寫入後被存取過的使用者
+        self.pending = {}  # 已逐出或寫入失敗、尚待寫入的變更 {user_id: {field: value}}
+        self.lock = threading.RLock()
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.closed = False
         # 添加臨時用戶數據存儲
-        self.users['temp'] = {'game_state': {}}
+        self.users['temp'] = UserState()
+        if store is not None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
         logger.info("Initialized user data manager")
-        # 在實際應用中，應該使用資料庫存儲這些數據
-        
-    def get_user_data(self, user_id):
-        """獲取用戶數據，如果不存在則初始化"""
-        if user_id not in self.users:
-            logger.info(f"Creating data for new user: {user_id}")
-            self.users[user_id] = {
-                'score': 0,
-                'current_activity': None,
-                'current_vocab': None,
-                'current_category': None,
-                'game_state': {},
-                'vocab_mastery': {},
-                'learning_progress': {},
-                'last_active': self.current_date(),
-                'streak': 0
+
+    def new_user_data(self):
+        return UserState(last_active=self.current_date())
+
+    def get_user_data(self, user_id, loaded=None):
+        """獲取用戶數據；不在記憶體中時從 store 載入，不存在則初始化。
+        loaded 為呼叫端已載入的 (stored, load_failed)（ASGI 模式以非同步用戶端預先載入）"""
+        with self.lock:
+            data = self.users.get(user_id)
+            if data is not None:
+                self._touch(user_id)
+                return data
+
+        stored, load_failed = loaded if loaded is not None else self._load(user_id)
+
+        with self.lock:
+            data = self.users.get(user_id)
+            if data is None:  # 其他執行緒可能已先載入
+                data = self.new_user_data()
+                if stored:
+                    data.apply(stored)
+                else:
+                    logger.info(f"Creating data for new user: {user_id}")
+                self.users[user_id] = data
+                # 新使用者沒有雜湊，下次寫入時會寫入所有欄位；載入失敗時不寫回預設值以免覆蓋既有資料
+                self.digests[user_id] = field_digests(serialize_fields(data)) if stored or load_failed else {}
+                self._evict()
+            self._touch(user_id)
+            return data
+
+    @contextmanager
+    def checkout(self, user_id):
+        """處理請求期間釘住使用者資料（可巢狀）；區塊內不會被 LRU 逐出"""
+        with self.lock:
+            self.checked_out[user_id] = self.checked_out.get(user_id, 0) + 1
+        try:
+            yield self.get_user_data(user_id)
+        finally:
+            with self.lock:
+                self.checked_out[user_id] -= 1
+                if not self.checked_out[user_id]:
+                    del self.checked_out[user_id]
+                self._evict()
+
+    def _touch(self, user_id):
+        self.users.move_to_end(user_id)
+        if user_id != 'temp':
+            self.touched.add(user_id)
+
+    def _load(self, user_id):
+        if self.store is None:
+            return None, False
+        try:
+            stored = self.store.load(user_id)
+        except Exception as e:
+            logger.error(f"Failed to load user data for {user_id}: {e}")
+            return None, True
+        return self.merge_pending(user_id, stored), False
+
+    def merge_pending(self, user_id, stored):
+        """套用尚未寫入 store 的變更（使用者被逐出後又回來時）"""
+        with self.lock:
+            pending = self.pending.get(user_id)
+            if pending:
+                stored = dict(stored or {}, **pending)
+        return stored
+
+    def is_resident(self, user_id):
+        with self.lock:
+            return user_id in self.users
+
+    def _changed_fields(self, user_id, data):
+        """與欄位雜湊比對，回傳有變更的欄位（值為序列化後的副本）並更新雜湊"""
+        current = serialize_fields(data)
+        digests = field_digests(current)
+        old = self.digests.get(user_id, {})
+        changed = {field: json.loads(value) for field, value in current.items() if old.get(field) != digests[field]}
+        self.digests[user_id] = digests
+        return changed
+
+    def _queue_changes(self, user_id, changed):
+        if changed:
+            self.pending.setdefault(user_id, {}).update(changed)
+
+    def _evict(self):
+        while len(self.users) > self.max_resident:
+            # 由最久未使用者開始，略過 temp 與處理中的使用者；全部都在處理中時暫時超出上限
+            user_id = next((u for u in self.users if u != 'temp' and u not in self.checked_out), None)
+            if user_id is None:
+                return
+            data = self.users.pop(user_id)
+            # 逐出前保留尚未寫入的變更
+            if self.store is not None:
+                self._queue_changes(user_id, self._changed_fields(user_id, data))
+            self.digests.pop(user_id, None)
+            self.touched.discard(user_id)
+
+    def flush(self):
+        """寫回所有變更的欄位；失敗時保留變更等待下次重試"""
+        if self.store is None:
+            return 0
+        with self.flush_lock:
+            with self.lock:
+                for user_id in list(self.touched):
+                    data = self.users.get(user_id)
+                    if data is None:
+                        continue
+                    try:
+                        self._queue_changes(user_id, self._changed_fields(user_id, data))
+                    except RuntimeError:
+                        # 處理中的請求正在修改資料，下次再比對
+                        continue
+                    self.touched.discard(user_id)
+                changes, self.pending = self.pending, {}
+
+            if not changes:
+                return 0
+            field_count = sum(len(fields) for fields in changes.values())
+            try:
+                with timed("user_store_flush"):
+                    self.store.save(changes)
+            except Exception as e:
+                logger.error(f"❌ User data flush failed, re-queueing {len(changes)} users: {e}")
+                user_store_writes.inc(field_count, outcome="error")
+                with self.lock:
+                    for user_id, fields in changes.items():
+                        self.pending[user_id] = dict(fields, **self.pending.get(user_id, {}))
+                return 0
+
+            user_store_writes.inc(field_count, outcome="ok")
+            return field_count
+
+    def _run(self):
+        while not self.closed:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"User data flush loop error: {e}")
+
+    def close(self):
+        """停止背景執行緒並寫回剩餘變更（程式結束時呼叫）"""
+        self.closed = True
+        self.wakeup.set()
+        self.flush()
+
+    def status(self):
+        with self.lock:
+            return {
+                "resident": len(self.users),
+                "max_resident": self.max_resident,
+                "dirty": len(self.touched),
+                "checked_out": len(self.checked_out),
+                "pending": len(self.pending),
             }
-        return self.users[user_id]
     
     def current_date(self):
         """Get current date for tracking learning progress"""
@@ -291,244 +503,40 @@ class UserData:
     def update_streak(self, user_id):
         """Update user's consecutive learning days"""
         user_data = self.get_user_data(user_id)
-        last_active = datetime.strptime(user_data['last_active'], "%Y-%m-%d")
+        last_active = datetime.strptime(user_data.last_active, "%Y-%m-%d")
         today = datetime.now()
         
         if (today - last_active).days == 1:  # 連續下一天學習
-            user_data['streak'] += 1
-            logger.info(f"User {user_id}  learning streak increased to  {user_data['streak']} days")
+            user_data.streak += 1
+            logger.info(f"User {user_id}  learning streak increased to  {user_data.streak} days")
         elif (today - last_active).days > 1:  # 中斷了連續學習
-            user_data['streak'] = 1
+            user_data.streak = 1
             logger.info(f"User {user_id} learning streak interrupted, reset to 1 day")
         # 如果是同一天，streak保持不變
         
-        user_data['last_active'] = self.current_date()
-
-user_data_manager = UserData()
+        user_data.last_active = self.current_date()
 
 # === 泰語學習資料 ===
-thai_data = {
-    'categories': {
-        'daily_phrases': {
-            'name': 'Daily Phrases',
-            'words': ['Hello', 'Thank You', 'Goodbye', 'Sorry', 'Good Morning',
-                'Good Night', "You're Welcome", 'How to Get There', 'How Much?', 'Tasty']
-        },
-        'numbers': {
-            'name': 'Numbers',
-            'words': ['One', 'Two', 'Three', 'Four', 'Five', 'Six', 'Seven', 'Eight', 'Nine', 'Ten']
-        },
-        'animals': {
-            'name': 'Animals',
-            'words': ['Cat', 'Dog', 'Bird', 'Fish', 'Elephant', 'Tiger', 'Monkey', 'Chicken', 'Pig', 'Cow']
-        },
-        'food': {
-            'name': 'Food',
-            'words': [ 'Rice', 'Noodles', 'Beer', 'Bread', 'Chicken Wings', 'Mango Sticky Rice',
-                'Fried Rice', 'Papaya Salad', 'Tom Yum Soup', 'Pad Thai']
-        },
-        'transportation': {
-            'name': 'Transportation',
-            'words': [ 'Car', 'Bus', 'Taxi', 'Motorbike', 'Train', 'Airplane',
-                'Boat', 'Bicycle', 'Tuk Tuk', 'Truck']
-        }
-    },
-    'basic_words': {
-        # 日常用語
-        'Hello': {'thai': 'สวัสดี', 'pronunciation': 'sa-wat-dee', 'tone': 'mid-falling-mid',
-               'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E6%97%A5%E5%B8%B8%E7%94%A8%E8%AA%9E/%E4%BD%A0%E5%A5%BD.mp3',
-               'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E6%97%A5%E5%B8%B8%E7%94%A8%E8%AA%9E/Hello.jpg'},
-        'Thank You': {'thai': 'ขอบคุณ', 'pronunciation': 'khop-khun', 'tone': 'low-mid',
-               'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E6%97%A5%E5%B8%B8%E7%94%A8%E8%AA%9E/%E8%AC%9D%E8%AC%9D.mp3',
-               'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E6%97%A5%E5%B8%B8%E7%94%A8%E8%AA%9E/thank.jpg'},
-        'Goodbye': {'thai': 'ลาก่อน', 'pronunciation': 'la-kon', 'tone': 'mid-mid',
-               'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E6%97%A5%E5%B8%B8%E7%94%A8%E8%AA%9E/%E5%86%8D%E8%A6%8B.mp3',
-               'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E6%97%A5%E5%B8%B8%E7%94%A8%E8%AA%9E/bye.jpg'},
-        'Sorry': {'thai': 'ขอโทษ', 'pronunciation': 'kho-thot', 'tone': 'low-low',
-                'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E6%97%A5%E5%B8%B8%E7%94%A8%E8%AA%9E/%E5%B0%8D%E4%B8%8D%E8%B5%B7.mp3',
-                'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E6%97%A5%E5%B8%B8%E7%94%A8%E8%AA%9E/sorry.jpg'},
-        'Good Morning': {'thai': 'อรุณสวัสดิ์', 'pronunciation': 'a-run-sa-wat', 'tone': 'mid-mid-falling-mid',
-              'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E6%97%A5%E5%B8%B8%E7%94%A8%E8%AA%9E/%E6%97%A9%E5%AE%89.mp3',
-              'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E6%97%A5%E5%B8%B8%E7%94%A8%E8%AA%9E/morning.jpg'},
-        'Good Night': {'thai': 'ราตรีสวัสดิ์', 'pronunciation': 'ra-tree-sa-wat', 'tone': 'mid-mid-falling-mid',
-              'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E6%97%A5%E5%B8%B8%E7%94%A8%E8%AA%9E/%E6%99%9A%E5%AE%89.mp3',
-              'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E6%97%A5%E5%B8%B8%E7%94%A8%E8%AA%9E/night.jpg'},
-        "You're Welcome": {'thai': 'ไม่เป็นไร', 'pronunciation': 'mai-pen-rai', 'tone': 'mid-mid-mid',
-                'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E6%97%A5%E5%B8%B8%E7%94%A8%E8%AA%9E/%E4%B8%8D%E5%AE%A2%E6%B0%A3.mp3',
-                'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E6%97%A5%E5%B8%B8%E7%94%A8%E8%AA%9E/welcome.jpg'},
-        'How to Get There': {'thai': 'ไปทางไหน', 'pronunciation': 'pai-tang-nai', 'tone': 'mid-mid-mid',
-                'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E6%97%A5%E5%B8%B8%E7%94%A8%E8%AA%9E/%E6%80%8E%E9%BA%BC%E8%B5%B0.mp3',
-                'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E6%97%A5%E5%B8%B8%E7%94%A8%E8%AA%9E/how%20can%20i%20go%20to.jpg'},
-        'How Much?': {'thai': 'เท่าไหร่', 'pronunciation': 'tao-rai', 'tone': 'mid-mid',
-               'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E6%97%A5%E5%B8%B8%E7%94%A8%E8%AA%9E/%E5%A4%9A%E5%B0%91%E9%8C%A2.mp3',
-               'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E6%97%A5%E5%B8%B8%E7%94%A8%E8%AA%9E/askprice.jpg'},
-        'Tasty': {'thai': 'อร่อย', 'pronunciation': 'a-roi', 'tone': 'mid-mid',
-               'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E6%97%A5%E5%B8%B8%E7%94%A8%E8%AA%9E/%E5%A5%BD%E5%90%83.mp3',
-               'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E6%97%A5%E5%B8%B8%E7%94%A8%E8%AA%9E/yummy.jpg'},
-        
-        # 數字
-        'One': {'thai': 'หนึ่ง', 'pronunciation': 'neung', 'tone': 'mid',
-             'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E6%95%B8%E5%AD%97/1.mp3',
-             'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E5%9C%96%E7%89%87%E6%95%B8%E5%AD%97/1.png'},
-        'Two': {'thai': 'สอง', 'pronunciation': 'song', 'tone': 'mid',
-             'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E6%95%B8%E5%AD%97/2.mp3',
-             'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E5%9C%96%E7%89%87%E6%95%B8%E5%AD%97/2.jpg'},
-        'Three': {'thai': 'สาม', 'pronunciation': 'sam', 'tone': 'mid',
-             'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E6%95%B8%E5%AD%97/3.mp3',
-             'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E5%9C%96%E7%89%87%E6%95%B8%E5%AD%97/3.jpg'},
-        'Four': {'thai': 'สี่', 'pronunciation': 'see', 'tone': 'mid',
-             'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E6%95%B8%E5%AD%97/4.mp3',
-             'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E5%9C%96%E7%89%87%E6%95%B8%E5%AD%97/4.jpg'},
-        'Five': {'thai': 'ห้า', 'pronunciation': 'ha', 'tone': 'falling',
-             'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E6%95%B8%E5%AD%97/5.mp3',
-             'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E5%9C%96%E7%89%87%E6%95%B8%E5%AD%97/5.jpg'},
-        'Six': {'thai': 'หก', 'pronunciation': 'hok', 'tone': 'low',
-             'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E6%95%B8%E5%AD%97/6.mp3',
-             'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E5%9C%96%E7%89%87%E6%95%B8%E5%AD%97/6.jpg'},
-        'Seven': {'thai': 'เจ็ด', 'pronunciation': 'jet', 'tone': 'falling',
-             'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E6%95%B8%E5%AD%97/7.mp3',
-             'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E5%9C%96%E7%89%87%E6%95%B8%E5%AD%97/7.jpg'},
-        'Eight': {'thai': 'แปด', 'pronunciation': 'paet', 'tone': 'falling',
-             'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E6%95%B8%E5%AD%97/8.mp3',
-             'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E5%9C%96%E7%89%87%E6%95%B8%E5%AD%97/8.jpg'},
-        'Nine': {'thai': 'เก้า', 'pronunciation': 'kao', 'tone': 'falling',
-             'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E6%95%B8%E5%AD%97/9.mp3',
-             'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E5%9C%96%E7%89%87%E6%95%B8%E5%AD%97/9.jpg'},
-        'Ten': {'thai': 'สิบ', 'pronunciation': 'sip', 'tone': 'low',
-             'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E6%95%B8%E5%AD%97/10.mp3',
-             'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E5%9C%96%E7%89%87%E6%95%B8%E5%AD%97/10.jpg'},
-        
-        # 動物
-        'Cat': {'thai': 'แมว', 'pronunciation': 'maew', 'tone': 'mid',
-             'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E5%8B%95%E7%89%A9/%E8%B2%93.mp3',
-             'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E5%9C%96%E7%89%87%E5%8B%95%E7%89%A9/%E8%B2%93.jpg'},
-        'Dog': {'thai': 'หมา', 'pronunciation': 'ma', 'tone': 'mid',
-             'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E5%8B%95%E7%89%A9/%E7%8B%97.mp3',
-             'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E5%9C%96%E7%89%87%E5%8B%95%E7%89%A9/%E7%8B%97.jpg'},
-        'Bird': {'thai': 'นก', 'pronunciation': 'nok', 'tone': 'low',
-             'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E5%8B%95%E7%89%A9/%E9%B3%A5.mp3',
-             'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E5%9C%96%E7%89%87%E5%8B%95%E7%89%A9/%E9%B3%A5.jpg'},
-        'Fish': {'thai': 'ปลา', 'pronunciation': 'pla', 'tone': 'mid',
-             'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E5%8B%95%E7%89%A9/%E9%AD%9A.mp3',
-             'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E5%9C%96%E7%89%87%E5%8B%95%E7%89%A9/%E9%AD%9A.jpg'},
-        'Elephant': {'thai': 'ช้าง', 'pronunciation': 'chang', 'tone': 'high',
-              'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E5%8B%95%E7%89%A9/%E5%A4%A7%E8%B1%A1.mp3',
-              'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E5%9C%96%E7%89%87%E5%8B%95%E7%89%A9/%E5%A4%A7%E8%B1%A1.jpg'},
-        'Tiger': {'thai': 'เสือ', 'pronunciation': 'suea', 'tone': 'low',
-              'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E5%8B%95%E7%89%A9/%E8%80%81%E8%99%8E.mp3',
-              'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E5%9C%96%E7%89%87%E5%8B%95%E7%89%A9/%E8%80%81%E8%99%8E.jpg'},
-        'Monkey': {'thai': 'ลิง', 'pronunciation': 'ling', 'tone': 'mid',
-              'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E5%8B%95%E7%89%A9/%E7%8C%B4%E5%AD%90.mp3',
-              'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E5%9C%96%E7%89%87%E5%8B%95%E7%89%A9/%E7%8C%B4.jpg'},
-        'Chicken': {'thai': 'ไก่', 'pronunciation': 'kai', 'tone': 'low',
-             'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E5%8B%95%E7%89%A9/%E9%9B%9E.mp3',
-             'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E5%9C%96%E7%89%87%E5%8B%95%E7%89%A9/%E9%9B%9E.jpg'},
-        'Pig': {'thai': 'หมู', 'pronunciation': 'moo', 'tone': 'mid',
-             'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E5%8B%95%E7%89%A9/%E8%B1%AC.mp3',
-             'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E5%9C%96%E7%89%87%E5%8B%95%E7%89%A9/%E8%B1%AC.jpg'},
-        'Cow': {'thai': 'วัว', 'pronunciation': 'wua', 'tone': 'mid',
-             'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E5%8B%95%E7%89%A9/%E7%89%9B.mp3',
-             'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E5%9C%96%E7%89%87%E5%8B%95%E7%89%A9/%E7%89%9B.jpg'},
-        
-        # 食物
-        'Rice': {'thai': 'ข้าว', 'pronunciation': 'khao', 'tone': 'falling',
-              'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E9%A3%9F%E7%89%A9/%E7%B1%B3%E9%A3%AF.mp3',
-              'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E5%9C%96%E7%89%87%E9%A3%9F%E7%89%A9/rice.jpg'},
-        'Noodles': {'thai': 'ก๋วยเตี๋ยว', 'pronunciation': 'guay-tiew', 'tone': 'falling-falling-low',
-             'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E9%A3%9F%E7%89%A9/%E7%B2%BF%E6%A2%9D.mp3',
-             'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E5%9C%96%E7%89%87%E9%A3%9F%E7%89%A9/%E7%B2%BF%E6%A2%9D.jpg'},
-        'Beer': {'thai': 'เบียร์', 'pronunciation': 'bia', 'tone': 'mid',
-              'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E9%A3%9F%E7%89%A9/%E5%95%A4%E9%85%92.mp3',
-              'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E5%9C%96%E7%89%87%E9%A3%9F%E7%89%A9/beer.jpg'},
-        'Bread': {'thai': 'ขนมปัง', 'pronunciation': 'kha-nom-pang', 'tone': 'mid-mid-mid',
-              'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E9%A3%9F%E7%89%A9/%E9%BA%B5%E5%8C%85.mp3',
-              'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E5%9C%96%E7%89%87%E9%A3%9F%E7%89%A9/bread.jpg'},
-        'Chicken Wings': {'thai': 'ปีกไก่', 'pronunciation': 'peek-kai', 'tone': 'falling-low',
-              'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E9%A3%9F%E7%89%A9/%E9%9B%9E%E7%BF%85.mp3',
-              'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E5%9C%96%E7%89%87%E9%A3%9F%E7%89%A9/chicken%20wing.jpg'},
-        'Mango Sticky Rice': {'thai': 'ข้าวเหนียวมะม่วง', 'pronunciation': 'khao-niew-ma-muang', 'tone': 'falling-falling-mid-mid',
-                 'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E9%A3%9F%E7%89%A9/%E8%8A%92%E6%9E%9C%E7%B3%AF%E7%B1%B3%E9%A3%AF.mp3',
-                 'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E5%9C%96%E7%89%87%E9%A3%9F%E7%89%A9/mango%20sticky%20rice.jpg'},
-        'Fried Rice': {'thai': 'ข้าวผัด', 'pronunciation': 'khao-pad', 'tone': 'falling-low',
-              'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E9%A3%9F%E7%89%A9/%E7%82%92%E9%A3%AF.mp3',
-              'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E5%9C%96%E7%89%87%E9%A3%9F%E7%89%A9/fried%20rice.jpg'},
-        'Papaya Salad': {'thai': 'ส้มตำ', 'pronunciation': 'som-tam', 'tone': 'falling-mid',
-                  'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E9%A3%9F%E7%89%A9/%E9%9D%92%E6%9C%A8%E7%93%9C%E6%B2%99%E6%8B%89.mp3',
-                  'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E5%9C%96%E7%89%87%E9%A3%9F%E7%89%A9/papaya-salad.jpg'},
-        'Tom Yum Soup': {'thai': 'ต้มยำกุ้ง', 'pronunciation': 'tom-yum-kung', 'tone': 'high-mid-mid',
-                 'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E9%A3%9F%E7%89%A9/%E5%86%AC%E8%94%AD%E5%8A%9F%E6%B9%AF.mp3',
-                 'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E5%9C%96%E7%89%87%E9%A3%9F%E7%89%A9/tom%20yam%20kung.jpg'},
-        'Pad Thai': {'thai': 'ผัดไทย', 'pronunciation': 'pad-thai', 'tone': 'low-mid',
-                  'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E9%A3%9F%E7%89%A9/%E6%B3%B0%E5%BC%8F%E7%82%92%E6%B2%B3%E7%B2%89.mp3',
-                  'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E5%9C%96%E7%89%87%E9%A3%9F%E7%89%A9/pad%20tai.jpg'},
-        
-        # 交通工具
-        'Car': {'thai': 'รถยนต์', 'pronunciation': 'rot-yon', 'tone': 'high-mid',
-              'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E4%BA%A4%E9%80%9A%E5%B7%A5%E5%85%B7/%E8%BB%8A%E5%AD%90.mp3',
-              'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E5%9C%96%E7%89%87%E9%81%8B%E8%BC%B8%E5%B7%A5%E5%85%B7/%E6%B1%BD%E8%BB%8A.jpg'},
-        'Bus': {'thai': 'รถเมล์', 'pronunciation': 'rot-mae', 'tone': 'high-mid',
-              'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E4%BA%A4%E9%80%9A%E5%B7%A5%E5%85%B7/%E5%85%AC%E8%BB%8A.mp3',
-              'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E5%9C%96%E7%89%87%E9%81%8B%E8%BC%B8%E5%B7%A5%E5%85%B7/%E5%85%AC%E8%BB%8A.jpg'},
-        'Taxi': {'thai': 'แท็กซี่', 'pronunciation': 'taxi', 'tone': 'mid-mid',
-               'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E4%BA%A4%E9%80%9A%E5%B7%A5%E5%85%B7/%E8%A8%88%E7%A8%8B%E8%BB%8A.mp3',
-               'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E5%9C%96%E7%89%87%E9%81%8B%E8%BC%B8%E5%B7%A5%E5%85%B7/%E8%A8%88%E7%A8%8B%E8%BB%8A.jpg'},
-        'Motorbike': {'thai': 'มอเตอร์ไซค์', 'pronunciation': 'motor-sai', 'tone': 'mid-mid-mid',
-               'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E4%BA%A4%E9%80%9A%E5%B7%A5%E5%85%B7/%E6%91%A9%E6%89%98%E8%BB%8A.mp3',
-               'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E5%9C%96%E7%89%87%E9%81%8B%E8%BC%B8%E5%B7%A5%E5%85%B7/%E6%91%A9%E6%89%98%E8%BB%8A.jpg'},
-        'Train': {'thai': 'รถไฟ', 'pronunciation': 'rot-fai', 'tone': 'high-mid',
-              'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E4%BA%A4%E9%80%9A%E5%B7%A5%E5%85%B7/%E7%81%AB%E8%BB%8A.mp3',
-              'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E5%9C%96%E7%89%87%E9%81%8B%E8%BC%B8%E5%B7%A5%E5%85%B7/%E7%81%AB%E8%BB%8A.jpg'},
-        'Airplane': {'thai': 'เครื่องบิน', 'pronunciation': 'krueang-bin', 'tone': 'falling-mid',
-              'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E4%BA%A4%E9%80%9A%E5%B7%A5%E5%85%B7/%E9%A3%9B%E6%A9%9F.mp3',
-              'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E5%9C%96%E7%89%87%E9%81%8B%E8%BC%B8%E5%B7%A5%E5%85%B7/%E9%A3%9B%E6%A9%9F.jpg'},
-        'Boat': {'thai': 'เรือ', 'pronunciation': 'ruea', 'tone': 'mid',
-             'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E4%BA%A4%E9%80%9A%E5%B7%A5%E5%85%B7/%E8%88%B9.mp3',
-             'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E5%9C%96%E7%89%87%E9%81%8B%E8%BC%B8%E5%B7%A5%E5%85%B7/%E8%88%B9.jpg'},
-        'Bicycle': {'thai': 'จักรยาน', 'pronunciation': 'jak-ka-yan', 'tone': 'low-low-mid',
-               'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E4%BA%A4%E9%80%9A%E5%B7%A5%E5%85%B7/%E8%85%B3%E8%B8%8F%E8%BB%8A.mp3',
-               'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E5%9C%96%E7%89%87%E9%81%8B%E8%BC%B8%E5%B7%A5%E5%85%B7/%E8%85%B3%E8%B8%8F%E8%BB%8A.jpg'},
-        'Tuk Tuk': {'thai': 'ตุ๊กตุ๊ก', 'pronunciation': 'tuk-tuk', 'tone': 'high-high',
-               'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E4%BA%A4%E9%80%9A%E5%B7%A5%E5%85%B7/%E5%98%9F%E5%98%9F%E8%BB%8A.mp3',
-               'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E5%9C%96%E7%89%87%E9%81%8B%E8%BC%B8%E5%B7%A5%E5%85%B7/%E5%98%9F%E5%98%9F%E8%BB%8A.jpg'},
-        'Truck': {'thai': 'รถบรรทุก', 'pronunciation': 'rot-ban-tuk', 'tone': 'high-mid-low',
-              'audio_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E9%9F%B3%E6%AA%94/%E4%BA%A4%E9%80%9A%E5%B7%A5%E5%85%B7/%E8%B2%A8%E8%BB%8A.mp3',
-              'image_url': 'https://storage.googleapis.com/thai_chatbot/%E6%B3%B0%E6%96%87%E6%95%99%E5%AD%B8%E5%9C%96%E5%BA%AB/%E5%9C%96%E7%89%87%E9%81%8B%E8%BC%B8%E5%B7%A5%E5%85%B7/%E8%B2%A8%E8%BB%8A.jpg'}
-    },
-    'tone_guide': {
-        'mid': 'Mid Tone – A stable, even tone',
-        'low': 'Low Tone – Pronounced with a lower pitch',
-        'falling': 'Falling Tone – Starts high and drops',
-        'high': 'High Tone – Pronounced with a higher pitch',
-        'rising': 'Rising Tone – Starts low and rises'
-    },
-    'tone_examples': [
-        {'thai': 'คา', 'meaning': 'stick', 'tone': 'mid', 'pronunciation': 'ka (stable tone)'},
-        {'thai': 'ค่า', 'meaning': 'Value', 'tone': 'low', 'pronunciation': 'kà (low tone)'},
-        {'thai': 'ค้า', 'meaning': 'Trade', 'tone': 'falling', 'pronunciation': 'kâ (falling tone)'},
-        {'thai': 'ค๊า', 'meaning': '(Polite particle)', 'tone': 'high', 'pronunciation': 'ká (high tone)'},
-        {'thai': 'ค๋า', 'meaning': '(No specific meaning)', 'tone': 'rising', 'pronunciation': 'kǎ (rising tone)'}
-    ],
-    'daily_lessons': [
-        {
-            'day': 1, 
-            'theme': '基本問候',
-            'words': ['你好', '謝謝', '再見'],
-            'dialogue': None
-        },
-        {
-            'day': 2, 
-            'theme': '基本禮貌用語',
-            'words': ['對不起', '謝謝', '不客氣'],
-            'dialogue': None
-        },
-        {
-            'day': 3, 
-            'theme': '購物短語',
-            'words': ['多少錢', '好吃', '謝謝'],
-            'dialogue': None
-        }
-    ]
-}
+# 詞彙內容位於 vocab/pack.json（或編譯後的 vocab/pack.bin），檔案更新時自動重新載入
+def swap_vocabulary(index):
+    """熱重載後切換全域詞彙索引與出題器；進行中的遊戲仍引用原本的索引"""
+    global vocab_index, exam_builder, reply_templates
+    builder, templates = ExamBuilder(index), build_reply_templates(index)
+    vocab_index, exam_builder, reply_templates = index, builder, templates
+
+vocab_store = VocabularyStore(
+    reload_interval=float(os.environ.get('VOCAB_RELOAD_INTERVAL', 60)),
+    on_reload=swap_vocabulary,
+    preloaded=shared("vocabulary")
+)
+# 詞彙索引：整數 ID、分類 ID 陣列與英文 / 泰文查詢表
+vocab_index = vocab_store.index
+# 考試出題器：各分類預先計算的干擾選項池（與 master 預先載入的索引相同時共用）
+exam_builder = shared("exam_builder")
+if exam_builder is None or exam_builder.vocab is not vocab_index:
+    exam_builder = ExamBuilder(vocab_index)
+# 預先序列化的選單與教學訊息
+reply_templates = build_reply_templates(vocab_index)
 
 logger.info("已載入泰語學習資料")
 # === 第三部分：音頻處理和語音評估功能 ===
@@ -545,37 +553,51 @@ def get_audio_content(message_id):
 
 
 
-def process_audio_content_with_gcs(audio_content, user_id):
-    """處理音頻內容並上傳到 GCS"""
-    try:
-        # 創建臨時目錄
-        temp_dir = os.environ.get('TEMP', '/tmp')
-        audio_dir = os.path.join(temp_dir, 'temp_audio')
-        os.makedirs(audio_dir, exist_ok=True)
-        
-        # 生成唯一的文件名
-        audio_id = f"{user_id}_{uuid.uuid4()}"
-        temp_m4a = os.path.join(audio_dir, f'temp_{audio_id}.m4a')
-        temp_wav = os.path.join(audio_dir, f'temp_{audio_id}.wav')
-        
-        logger.info(f"Saving original audio to {temp_m4a}")
-        # 保存原始音頻
-        with open(temp_m4a, 'wb') as f:
-            f.write(audio_content)
-        
-        logger.info("Converting audio format using pydub")
-        # 使用 pydub 轉換格式
-        audio = AudioSegment.from_file(temp_m4a)
+# 暫存音檔目錄；建立的檔案記錄在索引中，由維護排程器在一小時後刪除（正常流程會先刪除）
+temp_audio = TempFileIndex(os.path.join(os.environ.get('TEMP', '/tmp'), 'temp_audio'), max_age=3600)
+
+def decode_audio_content(audio_content, user_id):
+    """將 LINE 音頻（m4a）轉為 16kHz 單聲道 WAV 暫存檔；回傳 (audio_id, WAV 路徑)，失敗時路徑為 None"""
+    # 生成唯一的文件名
+    audio_id = f"{user_id}_{uuid.uuid4()}"
+    temp_m4a = os.path.join(temp_audio.directory, f'temp_{audio_id}.m4a')
+    temp_wav = os.path.join(temp_audio.directory, f'temp_{audio_id}.wav')
+    temp_audio.track(temp_m4a, temp_wav)
+    
+    logger.info(f"Saving original audio to {temp_m4a}")
+    # 保存原始音頻
+    with open(temp_m4a, 'wb') as f:
+        f.write(audio_content)
+    
+    logger.info("Converting audio format using pydub")
+    # 使用 pydub 轉換格式
+    with admission.stage("decode"), timed("audio_decode"):
+        audio = pydub.AudioSegment.from_file(temp_m4a)
         audio = audio.set_frame_rate(16000).set_channels(1)
         audio.export(temp_wav, format='wav')
+    
+    # 清除臨時文件（不要清除 temp_wav，因為後續需要使用）
+    try:
+        os.remove(temp_m4a)
+        logger.info(f"Temporary file removed {temp_m4a}")
+    except Exception as e:
+        logger.warning(f"Failed to remove temporary file: {str(e)}")
+    
+    # 確認 WAV 檔案已成功創建
+    if not os.path.exists(temp_wav):
+        logger.error(f"WAV file creation failed: {temp_wav}")
+        return audio_id, None
         
-        # 確認 WAV 檔案已成功創建
-        if not os.path.exists(temp_wav):
-            logger.error(f"WAV file creation failed: {temp_wav}")
+    logger.info(f"Audio conversion successful, WAV file path: {temp_wav}")
+    return audio_id, temp_wav
+
+def process_audio_content_with_gcs(audio_content, user_id):
+    """處理音頻內容並上傳到 GCS"""
+    try:
+        audio_id, temp_wav = decode_audio_content(audio_content, user_id)
+        if not temp_wav:
             return None, None
             
-        logger.info(f"Audio conversion successful, WAV file path: {temp_wav}")
-            
         # 上傳到 GCS
         gcs_path = f"user_audio/{audio_id}.wav"
         
@@ -583,14 +605,6 @@ def process_audio_content_with_gcs(audio_content, user_id):
         with open(temp_wav, 'rb') as wav_file:
             public_url = upload_file_to_gcs(wav_file, gcs_path, "audio/wav")
         
-        # 清除臨時文件（不要清除 temp_wav，因為後續需要使用）
-        try:
-            os.remove(temp_m4a)
-            logger.info(f"Temporary file removed {temp_m4a}")
-        except Exception as e:
-            logger.warning(f"Failed to remove temporary file: {str(e)}")
-            pass
-        
         # 如果 GCS 上傳失敗，返回本地路徑仍舊有效
         return public_url, temp_wav
     except Exception as e:
@@ -598,8 +612,8 @@ def process_audio_content_with_gcs(audio_content, user_id):
         return None, None
     
     
-def evaluate_pronunciation(audio_file_path, reference_text, language=""):  # 改為空字符串
-    """使用Azure Speech Services進行發音評估"""
+def evaluate_pronunciation(audio_file_path, reference_text, language=None):
+    """使用Azure Speech Services進行發音評估（共用設定，PCM 由記憶體送入）"""
     try:
         logger.info(f"Starting pronunciation evaluation, reference text: {reference_text}, audio file: {audio_file_path}")
         
@@ -620,137 +634,24 @@ def evaluate_pronunciation(audio_file_path, reference_text, language=""):  # 改
                 "success": False,
                 "error": "Audio file is empty"
             }
-            
-        # 設定語音配置
-        speech_config = speechsdk.SpeechConfig(subscription=speech_key, region=speech_region)
-        speech_config.speech_recognition_language = language
-        
-        logger.info("Speech Config set up")
-        
-        # 設定發音評估配置
-        pronunciation_config = speechsdk.PronunciationAssessmentConfig(
-            reference_text=reference_text,
-            grading_system=speechsdk.PronunciationAssessmentGradingSystem.HundredMark,
-            granularity=speechsdk.PronunciationAssessmentGranularity.FullText,
-            enable_miscue=True
-        )
-        
-        logger.info("Pronunciation assessment config set up")
-        
-        # 設定音訊輸入 - 使用絕對路徑
-        abs_path = os.path.abspath(audio_file_path)
-        logger.info(f"Audio file absolute path: {abs_path}")
-        audio_config = speechsdk.audio.AudioConfig(filename=abs_path)
-        
-        logger.info("Audio input config set up")
-        
-        # 創建語音識別器
-        speech_recognizer = speechsdk.SpeechRecognizer(
-            speech_config=speech_config, 
-            audio_config=audio_config
-        )
-        
-        logger.info("Speech recognizer created")
-        
-        # 設置錯誤回調以獲取更詳細的錯誤信息
-        done = False
-        error_details = ""
-        
-        def recognized_cb(evt):
-            logger.info(f"RECOGNIZED: {evt}")
-        
-        def canceled_cb(evt):
-            nonlocal done, error_details
-            logger.info(f"CANCELED: {evt}")
-            if evt.reason == speechsdk.CancellationReason.Error:
-                logger.error(f"Error code: {evt.error_code}")
-                logger.error(f"Error details: {evt.error_details}")
-                error_details = f"Error code: {evt.error_code}, Error details: {evt.error_details}"
-            done = True
-        
-        # 添加回調
-        speech_recognizer.recognized.connect(recognized_cb)
-        speech_recognizer.canceled.connect(canceled_cb)
-        
-        # 應用發音評估配置
-        pronunciation_assessment = pronunciation_config.apply_to(speech_recognizer)
-        
-        # 開始識別
-        logger.info("Starting speech recognition...")
-        result = speech_recognizer.recognize_once_async().get()
-        
-        if error_details:
-            logger.error(f"Error details: {error_details}")
-        
-        # 處理結果
-        if result.reason == speechsdk.ResultReason.RecognizedSpeech:
-            pronunciation_result = speechsdk.PronunciationAssessmentResult(result)
-            
-            # 獲取評估結果
-            accuracy_score = pronunciation_result.accuracy_score
-            pronunciation_score = pronunciation_result.pronunciation_score
-            completeness_score = pronunciation_result.completeness_score
-            fluency_score = pronunciation_result.fluency_score
-            
-            # 計算總分
-            overall_score = int((accuracy_score + pronunciation_score + completeness_score + fluency_score) / 4)
-            
-            logger.info(f"Pronunciation evaluation completed. Score: {overall_score}, Recognized text: {result.text}")
-            return {
-                "success": True,
-                "recognized_text": result.text,
-                "reference_text": reference_text,
-                "overall_score": overall_score,
-                "accuracy_score": accuracy_score,
-                "pronunciation_score": pronunciation_score,
-                "completeness_score": completeness_score,
-                "fluency_score": fluency_score
-            }
-        else:
-            # 更安全的錯誤處理方式
-            try:
-                detail_info = ""
-                if result.reason == speechsdk.ResultReason.Canceled:
-                    cancellation = result.cancellation_details
-                    cancellation_reason = f"{cancellation.reason}"
-                    if cancellation.reason == speechsdk.CancellationReason.Error:
-                        # 安全地訪問屬性
-                        if hasattr(cancellation, 'error_code'):
-                            detail_info += f"Error code: {cancellation.error_code}"
-                        if hasattr(cancellation, 'error_details'):
-                            detail_info += f", Error details: {cancellation.error_details}"
-                        logger.error(detail_info)
-                    else:
-                        detail_info = f"Cancellation reason: {cancellation_reason}"
-                
-                logger.warning(f"Speech recognition failed. Reason: {result.reason}, Details: {detail_info or 'No additional information'}")
-                
-                # 鑑於 Azure 似乎不支援泰語的發音評估，使用模擬評估
-                logger.info("Switching to simulated assessment mode")
-                return simulate_pronunciation_assessment(audio_file_path, reference_text)
-            
-            except Exception as e:
-                logger.error(f"An exception occurred during error handling: {str(e)}", exc_info=True)
-                # 出現例外時依然使用模擬評估
-                logger.info("Switched to simulated assessment mode due to error handling exception")
-                return simulate_pronunciation_assessment(audio_file_path, reference_text)
+
+        if language and language != azure_manager.language:
+            logger.warning(f"Requested language {language} differs from configured {azure_manager.language}, using configured language")
+
+        pcm = ScoringRequest(reference_text, audio_file_path=audio_file_path).pcm
+        result = azure_manager.assess(pcm, reference_text)
+        if result.get("success"):
+            return result
+
+        # 鑑於 Azure 似乎不支援泰語的發音評估，使用模擬評估
+        logger.info("Switching to simulated assessment mode")
+        return simulate_pronunciation_assessment(audio_file_path, reference_text)
     
     except Exception as e:
         logger.error(f"An error occurred during pronunciation evaluation: {str(e)}", exc_info=True)
         # 發生錯誤時也使用模擬評估
         logger.info("Switched to simulated assessment mode due to evaluation error")
         return simulate_pronunciation_assessment(audio_file_path, reference_text)
-       
-    finally:
-        # 保留臨時檔案以便調試
-        # 在問題排除後，可以重新啟用此代碼以清理臨時檔案
-        # try:
-        #     if os.path.exists(audio_file_path):
-        #         os.remove(audio_file_path)
-        #         logger.info(f"已清除臨時檔案 {audio_file_path}")
-        # except Exception as e:
-        #     logger.warning(f"清除臨時檔案失敗: {str(e)}")
-        pass
 """👉 你不能讓機器人掛掉，也不能什麼都不回應。"""
 def simulate_pronunciation_assessment(audio_file_path, reference_text):
     """Simulated pronunciation scoring as fallback when real evaluation fails"""
@@ -798,9 +699,8 @@ def simulate_pronunciation_assessment(audio_file_path, reference_text):
 import json
 import os
 import tempfile
-from google.cloud import speech
 
-def init_google_speech_client() -> speech.SpeechClient:
+def init_google_speech_client() -> "speech.SpeechClient":
     """初始化 Google Speech 客戶端"""
     creds_json = os.environ.get('GCS_CREDENTIALS')
     if creds_json:
@@ -810,11 +710,14 @@ def init_google_speech_client() -> speech.SpeechClient:
             os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = tmp.name
     return speech.SpeechClient()
 
+# SpeechClient 可安全地跨執行緒共用，只建立一次
+google_speech_client = Lazy("google_speech", init_google_speech_client)
+
 
 def speech_to_text_google(audio_file_path):
     """將音頻文件轉換為文字使用 Google Speech-to-Text"""
     try:
-        client = init_google_speech_client()
+        client = google_speech_client.load()
         
         # 檢查檔案是否存在
         if not os.path.exists(audio_file_path):
@@ -852,7 +755,7 @@ def evaluate_pronunciation_google(public_url, reference_text):
         gcs_path = public_url.replace("https://storage.googleapis.com/", "gs://")
         logger.info(f"🎯 Google STT using audio file：{gcs_path}")
 
-        client = init_google_speech_client()
+        client = google_speech_client.load()
 
         audio = speech.RecognitionAudio(uri=gcs_path)
         config = speech.RecognitionConfig(
@@ -892,7 +795,7 @@ def evaluate_pronunciation_google(public_url, reference_text):
     
 def transcribe_audio_google(gcs_url):
     """呼叫 Google Speech-to-Text API 轉文字"""
-    client = init_google_speech_client()
+    client = google_speech_client.load()
     
     # 確保 URL 格式正確
     if gcs_url.startswith('https://storage.googleapis.com/'):
@@ -914,79 +817,209 @@ def transcribe_audio_google(gcs_url):
 
     return response.results[0].alternatives[0].transcript
 
-# === 考試模組 ===
+# === 評分鏈後端 ===
+def score_google_stt(scoring_request):
+    """評分鏈後端：Google Speech-to-Text 識別後比對文字相似度"""
+    gcs_uri = scoring_request.gcs_uri
+    if not gcs_uri:
+        logger.warning("Unable to retrieve GCS URL")
+        return None
 
-def generate_exam(thai_data, category=None):
-    """生成考試題目，確保單次考試不重複出題"""
-    all_words = thai_data['basic_words']
-    
-    # 篩選分類
-    if category:
-        category_words = thai_data["categories"][category]["words"]
-        word_items = {k: v for k, v in all_words.items() if k in category_words}
-    else:
-        word_items = all_words
+    client = google_speech_client.load()
+    audio = speech.RecognitionAudio(uri=gcs_uri)
+    config = speech.RecognitionConfig(
+        encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+        sample_rate_hertz=16000,
+        language_code="th-TH"
+    )
+    with admission.stage("stt"), timed("google_stt"):
+        response = client.recognize(config=config, audio=audio)
 
-    # 確保有足夠的詞彙，並隨機選擇10個不重複的詞彙
-    available_words = list(word_items.items())
-    
-    if len(available_words) < 10:
-        # 如果詞彙不足10個，就用全部可用的
-        selected_items = available_words
-    else:
-        # 隨機選擇10個不重複的詞彙
-        selected_items = random.sample(available_words, 10)
+    if not response.results:
+        logger.warning("Unable to recognize speech content")
+        return None
 
-    # 生成題目
-    questions = []
-    used_words = set()  # 追蹤已使用的詞彙
-    
-    for i, (key, item) in enumerate(selected_items):
-        # 跳過已使用的詞彙（雙重保險）
-        if key in used_words:
-            continue
-        used_words.add(key)
-        
-        if i < 2:  # 前兩題是發音題
-            questions.append({
-                "type": "pronounce",
-                "word": key,
-                "image_url": item.get("image_url"),
-                "thai": item["thai"],
-            })
-        else:  # 其餘是選擇題
-            # 為選擇題生成不重複的選項
-            remaining_words = [
-                (k, v) for k, v in word_items.items() 
-                if k not in used_words  # 確保選項不重複主題
-            ]
-            
-            if len(remaining_words) >= 2:
-                # 隨機選擇2個錯誤選項
-                wrong_choices = random.sample(remaining_words, 2)
+    recognized_text = response.results[0].alternatives[0].transcript
+    logger.info(f"Recognized text: {recognized_text}")
+    return text_similarity_result(recognized_text, scoring_request.reference_text)
+
+def text_similarity_result(recognized_text, reference_text):
+    """依識別文字與參考文本的相似度計算分數"""
+    similarity = SequenceMatcher(None, recognized_text.strip(), reference_text.strip()).ratio()
+    return {
+        "score": min(int(similarity * 225), 100),  # 放大分數，最高100分
+        "is_correct": similarity >= 0.3,
+        "similarity": similarity,
+        "recognized_text": recognized_text,
+    }
+
+def score_speechbrain(scoring_request):
+    """評分鏈後端：下載參考音頻後以 SpeechBrain 比較相似度"""
+    import signal
+
+    audio_file_path = scoring_request.audio_file_path
+    if not scoring_request.ref_audio_url:
+        raise ValueError("Unable to find reference audio URL")
+
+    # 設置15秒超時（signal 只能在主執行緒使用）
+    use_alarm = threading.current_thread() is threading.main_thread()
+    if use_alarm:
+        def timeout_handler(signum, frame):
+            raise TimeoutError("SpeechBrain processing timeout")
+        signal.signal(signal.SIGALRM, timeout_handler)
+        signal.alarm(15)
+
+    try:
+        # 有預先計算的參考嵌入時不需下載參考音頻
+        ref_embedding = reference_embedding(scoring_request.ref_audio_url)
+        if ref_embedding is not None:
+            with admission.stage("embedding"), timed("speechbrain"):
+                similarity_score = compute_similarity_to(audio_file_path, ref_embedding)
+        else:
+            # 下載參考音頻到臨時檔案
+            ref_audio_path = os.path.join(os.path.dirname(audio_file_path), f"ref_{os.path.basename(audio_file_path)}")
+            with timed("reference_download"):
+                response = requests.get(scoring_request.ref_audio_url)
+            if response.status_code != 200:
+                raise ValueError(f"Unable to download reference audio, status code: {response.status_code}")
+            with open(ref_audio_path, 'wb') as f:
+                f.write(response.content)
+            logger.info(f"Reference audio downloaded: {ref_audio_path}")
+
+            try:
+                if os.path.getsize(ref_audio_path) == 0:
+                    raise ValueError("Reference audio file is empty")
+                with admission.stage("embedding"), timed("speechbrain"):
+                    similarity_score = compute_similarity(audio_file_path, ref_audio_path)
+            finally:
+                # 清理參考音頻臨時檔案
+                try:
+                    os.remove(ref_audio_path)
+                    logger.info(f"Temporary reference audio file removed: {ref_audio_path}")
+                except:
+                    pass
+    finally:
+        if use_alarm:
+            signal.alarm(0)
+
+    return {
+        "score": int(similarity_score * 100),
+        "is_correct": similarity_score >= 0.5,
+        "similarity": similarity_score,
+    }
+
+scorer_chain.register("google_stt", score_google_stt, label="Google STT")
+if azure_manager.is_configured():
+    scorer_chain.register("azure", score_azure, label="Azure")
+scorer_chain.register("speechbrain", score_speechbrain, label="SpeechBrain")
+
+# 評分後端熔斷狀態
+@app.route("/status/backends", methods=['GET'])
+def backend_status():
+    return jsonify({
+        "order": scorer_chain.backend_names(),
+        "breakers": scorer_chain.router.status(),
+        "admission": admission.status(),
+        "speechbrain": get_speechbrain_status(),
+        "init": init_status(),
+        "maintenance": scheduler.status()
+    })
+
+# 本 worker 的記憶體：unique（USS）為獨佔部分，shared 為與 master / 其他 worker 共用的頁面
+@app.route("/status/memory", methods=['GET'])
+def memory_status():
+    return jsonify({
+        "pid": os.getpid(),
+        "preloaded": is_preloaded(),
+        "memory_bytes": memory_report()
+    })
+
+# === Prometheus 指標 ===
+pronunciation_results = counter(
+    "pronunciation_results_total",
+    "Pronunciation messages by scoring backend and outcome",
+    label_names=("backend", "outcome"),
+)
+gauge(
+    "scorer_circuit_open",
+    "1 when the scoring backend circuit breaker is not closed",
+    label_names=("backend",),
+    callback=lambda: {(name, ): int(s["state"] != "closed") for name, s in scorer_chain.router.status().items()}
+)
+gauge(
+    "admission_events",
+    "Admission controller counters (admitted, queued, shed, in-flight)",
+    label_names=("event",),
+    callback=lambda: {(name, ): value for name, value in admission.status().items()}
+)
+
+register_memory_metrics()
+
+@app.route("/metrics", methods=['GET'])
+def metrics_endpoint():
+    return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+# 串流識別（STREAMING_RECOGNITION=google 或 azure 時啟用）
+streaming_recognizer = StreamingRecognizer(
+    mode=os.environ.get('STREAMING_RECOGNITION', ''),
+    client_factory=google_speech_client.load
+)
+
+def score_user_audio(message_id, user_id, reference_text, ref_audio_url=None):
+    """取得使用者音頻並評分。回傳 (result, audio_ok)：
+    audio_ok 為 False 表示音頻無法處理；result 為 None 表示所有後端都失敗"""
+    started = time.perf_counter()
+    audio_content = None
+
+    # ==== 串流路徑：邊下載邊識別，語句結束即取得結果 ====
+    if streaming_recognizer.enabled:
+        try:
+            message_content = line_bot_api.get_message_content(message_id)
+            with admission.stage("stt"), timed("streaming_recognition"):
+                backend, payload, audio_content = streaming_recognizer.recognize(message_content.iter_content(), reference_text)
+            if backend == "google":
+                result = text_similarity_result(payload, reference_text)
+                result.update(backend="google_stt_streaming", method="Google STT")
+            elif backend == "azure":
+                result = to_chain_result(payload)
+                result.update(backend="azure_streaming", method="Azure")
             else:
-                # 如果不夠，就用剩餘的全部
-                wrong_choices = remaining_words
-            
-            # 組合所有選項（正確答案 + 錯誤選項）
-            all_choices = [(key, item)] + wrong_choices
-            
-            # 隨機排列選項
-            random.shuffle(all_choices)
-            
-            questions.append({
-                "type": "audio_choice",
-                "audio_url": item.get("audio_url"),
-                "choices": [
-                    {"word": w[0], "image_url": w[1].get("image_url")}
-                    for w in all_choices
-                ],
-                "answer": key
-            })
+                result = None
+            if result:
+                time_to_feedback.observe(time.perf_counter() - started, path="streaming")
+                pronunciation_results.inc(backend=result["backend"], outcome="correct" if result["is_correct"] else "incorrect")
+                return result, True
+            logger.warning("Streaming recognition returned no result, falling back to batch path")
+        except Exception as e:
+            logger.warning(f"Streaming path failed, falling back to batch path: {str(e)}")
 
-    return questions
+    # ==== 批次路徑：下載、轉檔、上傳 GCS 後執行評分鏈 ====
+    audio_content, gcs_url, audio_file_path = get_audio_content_with_gcs(message_id, user_id, audio_content)
+    if not audio_file_path or not os.path.exists(audio_file_path):
+        pronunciation_results.inc(backend="none", outcome="audio_error")
+        return None, False
 
+    try:
+        result = scorer_chain.score(ScoringRequest(
+            reference_text,
+            audio_file_path=audio_file_path,
+            gcs_url=gcs_url,
+            ref_audio_url=ref_audio_url
+        ))
+    finally:
+        # 清理臨時音頻檔案
+        if os.path.exists(audio_file_path):
+            os.remove(audio_file_path)
+            logger.info(f"✅ Temporary audio file removed: {audio_file_path}")
+
+    time_to_feedback.observe(time.perf_counter() - started, path="batch")
+    if result:
+        pronunciation_results.inc(backend=result["backend"], outcome="correct" if result["is_correct"] else "incorrect")
+    else:
+        pronunciation_results.inc(backend="simulated", outcome="all_backends_failed")
+    return result, True
 
+# === 考試模組 ===
 
 def score_pronunciation(user_text, correct_text):
     ratio = SequenceMatcher(None, user_text.strip(), correct_text.strip()).ratio()
@@ -995,50 +1028,116 @@ def score_pronunciation(user_text, correct_text):
 def score_image_choice(user_choice, correct_answer):
     return user_choice == correct_answer
 
-# 初始化 Firebase（只跑一次）
-if not firebase_admin._apps:
-    creds_json = os.environ.get("FIREBASE_CREDENTIALS")
-    if not creds_json:
-        raise ValueError("❌  FIREBASE_CREDENTIALS environment variable not found")
+# 初始化 Firebase（只跑一次）；SDK 匯入與用戶端建立延到第一次存取 db 時
+if not os.environ.get("FIREBASE_CREDENTIALS"):
+    raise ValueError("❌  FIREBASE_CREDENTIALS environment variable not found")
 
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".json") as tmp:
-        tmp.write(creds_json.encode("utf-8"))
-        tmp.flush()
-        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = tmp.name
-        cred = credentials.Certificate(tmp.name)
-        firebase_admin.initialize_app(cred)
+def init_firestore():
+    import firebase_admin
+    from firebase_admin import credentials, firestore
 
-db = firestore.client()
+    if not firebase_admin._apps:
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".json") as tmp:
+            tmp.write(os.environ["FIREBASE_CREDENTIALS"].encode("utf-8"))
+            tmp.flush()
+            os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = tmp.name
+            cred = credentials.Certificate(tmp.name)
+            firebase_admin.initialize_app(cred)
+    return firestore.client()
+
+db = Lazy("firestore", init_firestore)
+
+# 學習進度以 write-behind 方式批次寫入（times 使用原子 Increment）
+progress_writer = create_progress_writer(
+    FirestoreProgressBackend(db),
+    flush_interval=float(os.environ.get('PROGRESS_FLUSH_INTERVAL', 2.0)),
+    max_pending=int(os.environ.get('PROGRESS_FLUSH_SIZE', 50)),
+    # 快取中的摘要以呼叫端所知的上一次分數更新，寫入後改讀以 progress 文件為準的摘要
+    on_flush=lambda user_ids: [progress_cache.discard("summary", user_id) for user_id in user_ids]
+)
+
+# 進度讀取快取（PROGRESS_CACHE_LISTENERS=1 時以快照監聽保持跨 worker 一致）
+progress_cache = ProgressCache(
+    max_entries=int(os.environ.get('PROGRESS_CACHE_SIZE', 2000)),
+    listener_factory=firestore_summary_listener(db) if os.environ.get('PROGRESS_CACHE_LISTENERS') == '1' else None
+)
+register_cache_metrics(progress_cache)
+
+# 使用者狀態：記憶體中只保留活躍使用者，其餘存放於 Firestore（USER_STORE=sqlite 時使用本地 SQLite）
+user_data_manager = UserData(
+    store=create_user_store(db),
+    max_resident=int(os.environ.get('USER_DATA_RESIDENT', 5000)),
+    flush_interval=float(os.environ.get('USER_DATA_FLUSH_INTERVAL', 5.0))
+)
+atexit.register(user_data_manager.close)
+gauge(
+    "user_data_resident",
+    "Users held in memory by the user data manager",
+    callback=lambda: user_data_manager.status()["resident"]
+)
 
+def checks_out_user(handler_fn):
+    """事件處理期間釘住該使用者的資料，處理中的物件不會被逐出（修改才會寫回）"""
+    @functools.wraps(handler_fn)
+    def wrapper(event, *args, **kwargs):
+        with user_data_manager.checkout(event.source.user_id):
+            return handler_fn(event, *args, **kwargs)
+    return wrapper
+
+@timed("firestore_save_progress")
 def save_progress(user_id, word, score):
-    ref = db.collection("users").document(user_id).collection("progress").document(word)
-    doc = ref.get()
-    times = 1
-    if doc.exists:
-        old = doc.to_dict()
-        times = old.get("times", 0) + 1
-    ref.set({
-        "score": score,
-        "last_practice": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "times": times
-    })
+    user_data = user_data_manager.get_user_data(user_id)
+    # 上一次的分數（摘要不保存逐詞分數）；複習狀態中沒有紀錄的舊詞彙以 None 處理，寫入時再以 progress 文件校正
+    previous = user_data.vocab_mastery.get(word, {}).get("score")
+    progress_writer.record(user_id, word, score, previous)
+    review_queue(user_data).record(word, score)
+
+    # 同步更新快取
+    def update_progress(progress):
+        entry = progress.setdefault(word, {"times": 0})
+        entry["score"] = score
+        entry["last_practice"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        entry["times"] = entry.get("times", 0) + 1
+        return progress
+
+    progress_cache.update("progress", user_id, update_progress)
+    progress_cache.update("summary", user_id, lambda summary: apply_summary_updates(
+        summary, [(word, {"score": score, "times": 1, "previous": previous})]
+    ))
 
 def load_progress(user_id):
+    return progress_cache.get("progress", user_id, lambda: load_progress_from_firestore(user_id))
+
+def load_progress_summary(user_id):
+    """讀取進度摘要；尚未建立摘要時回傳 None"""
+    return progress_cache.get("summary", user_id, lambda: progress_writer.load_summary(user_id))
+
+@timed("firestore_load_progress")
+def load_progress_from_firestore(user_id):
     ref = db.collection("users").document(user_id).collection("progress")
     docs = ref.stream()
     progress = {}
     for doc in docs:
         progress[doc.id] = doc.to_dict()
+
+    # 合併尚未寫入 Firestore 的更新
+    for word, update in progress_writer.pending_for(user_id).items():
+        merged = progress.setdefault(word, {"times": 0})
+        merged["score"] = update["score"]
+        merged["last_practice"] = update["last_practice"]
+        merged["times"] = merged.get("times", 0) + update["times"]
     return progress
 
-def get_audio_content_with_gcs(message_id, user_id):
-    """從LINE取得音訊內容並存儲到 GCS"""
+def get_audio_content_with_gcs(message_id, user_id, audio_content=None):
+    """從LINE取得音訊內容並存儲到 GCS（已下載的內容可直接傳入）"""
     logger.info(f"Getting audio content, message ID: {message_id}")
     try:
-        message_content = line_bot_api.get_message_content(message_id)
-        audio_content = b''
-        for chunk in message_content.iter_content():
-            audio_content += chunk
+        if not audio_content:
+            with timed("line_download"):
+                message_content = line_bot_api.get_message_content(message_id)
+                audio_content = b''
+                for chunk in message_content.iter_content():
+                    audio_content += chunk
         
         logger.info(f"成功獲取音訊內容，大小: {len(audio_content)} 字節")
         
@@ -1178,8 +1277,46 @@ def handle_follow(event):
     line_bot_api.reply_message(event.reply_token, TextSendMessage(text=welcome_text))
 
 @handler.add(MessageEvent, message=AudioMessage)
+@timed("audio_message")
 def handle_audio_message(event):
-    """處理音頻消息，用於發音評估或考試模式"""
+    """處理音頻消息；超過處理上限時立即回覆忙碌訊息"""
+    if not admission.try_admit():
+        logger.warning(f"Audio message from user {event.source.user_id} shed by admission control")
+        line_bot_api.reply_message(
+            event.reply_token,
+            TextSendMessage(text="⏳ Many learners are practicing right now. Please try again in a moment.")
+        )
+        return
+    try:
+        # 評分回饋、考試結果與下一題連續推播給同一使用者，合併成一次推播請求
+        with line_bot_api.coalescing():
+            process_audio_message(event)
+    finally:
+        admission.release()
+
+def audio_reference(user_id):
+    """音頻訊息要比對的 (參考文本, 參考音頻網址)；考試中的非發音題或尚未選擇詞彙時回傳 None"""
+    session = exam_sessions.get(user_id)
+    if session is not None:
+        question = session.questions[session.current]
+        if question["type"] != "pronounce":
+            return None
+        word_id = vocab_index.find_thai(question['thai'])
+        return question['thai'], vocab_index.audio_url[word_id] if word_id is not None else None
+    word_id = vocab_index.id_of(user_data_manager.get_user_data(user_id).current_vocab)
+    if word_id is None:
+        return None
+    return vocab_index.thai[word_id], vocab_index.audio_url[word_id]
+
+def scored_audio(scored, message_id, user_id, reference_text, ref_audio_url):
+    """使用預先評分的結果 (參考文本, result, audio_ok)（ASGI 模式）；參考文本已改變時重新評分"""
+    if scored is not None and scored[0] == reference_text:
+        return scored[1], scored[2]
+    return score_user_audio(message_id, user_id, reference_text, ref_audio_url)
+
+@checks_out_user
+def process_audio_message(event, scored=None):
+    """處理音頻消息，用於發音評估或考試模式；scored 為 ASGI 模式已完成的評分（見 asgi.py）"""
     user_id = event.source.user_id
     user_data = user_data_manager.get_user_data(user_id)
 
@@ -1188,221 +1325,98 @@ def handle_audio_message(event):
     # 考試模式處理
     if user_id in exam_sessions:
         logger.info(f"User {user_id} is in exam mode. Processing voice question.")
-        # 先回覆「評分中」提示
-        try:
-            line_bot_api.reply_message(
-                event.reply_token,
-                TextSendMessage(text="✅ Audio received. Evaluating...")
-            )
-        except Exception as e:
-            logger.warning(f"⚠️ Failed to reply with evaluation message: {str(e)}")
-            
-        session = exam_sessions[user_id]
-        current_q = session["questions"][session["current"]]
-        total = len(session["questions"])
-
-        if current_q["type"] == "pronounce":
-            audio_content, gcs_url, audio_file_path = get_audio_content_with_gcs(event.message.id, user_id)
-
-            if not audio_file_path or not os.path.exists(audio_file_path):
-                # 如果找不到音檔，提供跳過選項
-                line_bot_api.push_message(
-                    user_id, 
-                    [
-                        TextSendMessage(text="❌ Audio file not found. Please try again."),
-                        TextSendMessage(
-                            text="Or tap 'Skip this question' to continue with the next one.", 
-                            quick_reply=QuickReply(items=[
-                                QuickReplyButton(action=MessageAction(label="Skip this question", text="Skip"))
-                            ])
-                        )
-                    ]
-                )
-                return
-
-            # 三階段評分邏輯
-            is_correct = False
-            method = "Simulated Evaluation"
-            feedback_text = ""
-            score = 70  # 預設分數
+        # 保留回覆權杖：評分在預算內完成就直接回覆結果，逾時才先回覆「評分中」提示、結果改用推播
+        with reply_scheduler.hold(event.reply_token, user_id, EXAM_INTERIM_MESSAGE) as reply:
+            session = exam_sessions[user_id]
+            current_q = session.questions[session.current]
+            total = len(session.questions)
+
+            if current_q["type"] == "pronounce":
+                # 取得參考音頻網址
+                _, ref_audio_url = audio_reference(user_id)
+
+                # 評分鏈（Google STT → Azure → SpeechBrain），全部失敗時使用模擬分數
+                logger.info(f"Scoring pronunciation. Reference text: {current_q['thai']}")
+                result, audio_ok = scored_audio(scored, event.message.id, user_id, current_q['thai'], ref_audio_url)
+
+                if not audio_ok:
+                    # 如果找不到音檔，提供跳過選項
+                    reply.send(
+                        [
+                            TextSendMessage(text="❌ Audio file not found. Please try again."),
+                            TextSendMessage(
+                                text="Or tap 'Skip this question' to continue with the next one.", 
+                                quick_reply=QuickReply(items=[
+                                    QuickReplyButton(action=MessageAction(label="Skip this question", text="Skip"))
+                                ])
+                            )
+                        ]
+                    )
+                    return
 
-            try:
-                # ==== Step 1: Google Speech-to-Text ====
-                if gcs_url:
-                    try:
-                        logger.info(f"Step 1: Using Google STT to evaluate pronunciation. Reference text: {current_q['thai']}")
-                        
-                        # 修正 GCS URL 格式問題
-                        if gcs_url.startswith('https://storage.googleapis.com/'):
-                            gcs_uri = 'gs://' + gcs_url.replace('https://storage.googleapis.com/', '')
-                        else:
-                            gcs_uri = gcs_url
-                            
-                        # 使用修正後的 URI 進行識別
-                        client = init_google_speech_client()
-                        audio = speech.RecognitionAudio(uri=gcs_uri)
-                        config = speech.RecognitionConfig(
-                            encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-                            sample_rate_hertz=16000,
-                            language_code="th-TH"
-                        )
-                        response = client.recognize(config=config, audio=audio)
-
-                        if response.results:
-                            recognized_text = response.results[0].alternatives[0].transcript
-                            logger.info(f"Recognized text: {recognized_text}")
-                            
-                            # 計算相似度
-                            similarity = SequenceMatcher(None, recognized_text.strip(), current_q['thai'].strip()).ratio()
-                            enhanced_score = min(int(similarity * 225), 100) 
-                            is_correct = similarity >= 0.3
-                            method = "Google STT"
-                            if similarity >= 0.6:
-                                feedback_text = f"✅ Professional-level pronunciation! Score: {enhanced_score}/100, Similarity: {similarity:.2f}"
-                            elif similarity >= 0.4:
-                                feedback_text = f"✅ Intermediate-level pronunciation! Score: {enhanced_score}/100, Similarity: {similarity:.2f}"
-                            else:
-                                feedback_text = f"✅ Basic-level pronunciation! Score: {enhanced_score}/100, Similarity: {similarity:.2f}"
-                            score = enhanced_score
-                            logger.info(f"Similarity: {similarity}, Evaluation result: {'Correct' if is_correct else 'Incorrect'}")    
-                
-                        else:
-                            raise ValueError("Unable to recognize speech content")
-                    except Exception as e:
-                        logger.warning(f"Step 1: Google STT evaluation failed: {str(e)}")
-                        raise
+                if result:
+                    score = result["score"]
+                    is_correct = result["is_correct"]
+                    method = result["method"]
                 else:
-                    raise ValueError("Unable to retrieve GCS URL")
-                    
-            except Exception as e1:
-                logger.warning(f"Step 1 failed. Trying Step 2: {str(e1)}")
-                
-                # ==== Step 2: SpeechBrain 相似度比較 ====
-                try:
-                    # 設置較短的超時時間
-                    import signal
-                    
-                    def timeout_handler(signum, frame):
-                        raise TimeoutError("SpeechBrain processing timeout")
-                    
-                    # 設置15秒超時
-                    signal.signal(signal.SIGALRM, timeout_handler)
-                    signal.alarm(15)
-                    
-                    # 獲取參考音頻路徑
-                    ref_word = current_q['word'] if 'word' in current_q else current_q['thai']
-                    # 檢查是否有預設的參考音頻檔案
-                    ref_audio_path = None
-                    for word, data in thai_data['basic_words'].items():
-                        if data['thai'] == current_q['thai']:
-                            ref_audio_url = data.get('audio_url')
-                            if ref_audio_url:
-                                # 下載參考音頻到臨時檔案
-                                ref_audio_path = os.path.join(os.path.dirname(audio_file_path), f"ref_{os.path.basename(audio_file_path)}")
-                                response = requests.get(ref_audio_url)
-                                if response.status_code == 200:
-                                    with open(ref_audio_path, 'wb') as f:
-                                        f.write(response.content)
-                                    logger.info(f"Reference audio downloaded: {ref_audio_path}")
-                                    break
-                    
-                    if ref_audio_path and os.path.exists(ref_audio_path):
-                        # 確認檔案大小
-                        if os.path.getsize(ref_audio_path) > 0:
-                            logger.info(f"Step 2: Using SpeechBrain to compare audio similarity")
-                            similarity_score = compute_similarity(audio_file_path, ref_audio_path)
-                            
-                            # 取消超時
-                            signal.alarm(0)
-                            
-                            is_correct = similarity_score >= 0.5
-                            method = "SpeechBrain"
-                            feedback_text = f"✅ Pronunciation similarity score: {similarity_score:.2f}, {'Passed' if is_correct else 'Needs improvement'}!"
-                            score = int(similarity_score * 100)
-                            logger.info(f"Audio similarity: {similarity_score}, Evaluation result: {'Correct' if is_correct else 'Incorrect'}")
-                        else:
-                            raise ValueError("參考音頻檔案為空")
-                        
-                        # 清理參考音頻臨時檔案
-                        try:
-                            os.remove(ref_audio_path)
-                            logger.info(f"Temporary reference audio file removed: {ref_audio_path}")
-                        except:
-                            pass
-                    else:
-                        raise ValueError("Reference audio file not found")
-                        
-                except Exception as e2:
-                    # 取消超時（如果有設置）
-                    try:
-                        signal.alarm(0)
-                    except:
-                        pass
-                        
-                    logger.warning(f"Step 2 failed. Proceeding to final Step 3: {str(e2)}")
-                    
-                    # ==== Step 3: 模擬分數 (Fallback) ====
-                    logger.info(f"Step 3: Using simulated scoring")
+                    # ==== 模擬分數 (Fallback) ====
+                    logger.info(f"All scoring backends failed. Using simulated scoring")
                     simulated_score = random.randint(50, 78)
                     is_correct = simulated_score >= 70
                     method = "AI Evaluation"
-                    feedback_text = f"✅ Pronunciation Score: {simulated_score}/100\nFeedback: Pronunciation {'is clear, keep it up!' if simulated_score >= 80 else 'is good, but there’s room for improvement.'}"
                     score = simulated_score
                     logger.info(f"Simulated score: {simulated_score}, Evaluation result: {'Correct' if is_correct else 'Incorrect'}")
 
-            finally:
-                # 清理臨時音頻檔案
-                if os.path.exists(audio_file_path):
-                    os.remove(audio_file_path)
-                    logger.info(f"✅ Temporary audio file removed: {audio_file_path}")
+                # 根據評估結果更新考試成績
+                record_exam_answer(session, "correct" if is_correct else "incorrect", score=score)
+                if is_correct:
+                    session.correct += 1
 
-            # 根據評估結果更新考試成績
-            if is_correct:
-                session["correct"] += 1
-
-            # 發送評分反饋
-            feedback = TextSendMessage(
-                text=f"📝 Pronunciation Score: {score}/100\n📘 This is an AI evaluation. Keep practicing and your pronunciation will continue to improve!"
-            )
-            line_bot_api.push_message(user_id, feedback)
+                # 發送評分反饋
+                feedback = TextSendMessage(
+                    text=f"📝 Pronunciation Score: {score}/100\n📘 This is an AI evaluation. Keep practicing and your pronunciation will continue to improve!"
+                )
+                reply.send(feedback)
             
-            # 更新題目計數
-            session["current"] += 1
+                # 更新題目計數
+                session.current += 1
             
-            # 檢查是否考試結束
-            if session["current"] >= len(session["questions"]):
-                final_score = session["correct"]
-                total = len(session["questions"])
+                # 檢查是否考試結束
+                if session.current >= len(session.questions):
+                    final_score = session.correct
+                    total = len(session.questions)
+                    save_exam_result(user_id, session)
                 
-                # 清理考試狀態
-                del exam_sessions[user_id]
+                    # 清理考試狀態
+                    del exam_sessions[user_id]
                 
-                # 發送考試結果
-                summary = TextSendMessage(text=f"🏁 Exam finished! You got {final_score}/{total} correct.")
-                line_bot_api.push_message(user_id, summary)
-            else:
-                # 短暫延遲後發送下一題
-                logger.info(f"User {user_id} completed question {session['current']}/{len(session['questions'])}, Score: {session['correct']}")
-                logger.info(f"Attempting to send the next question. Current exam status: {exam_sessions.get(user_id, 'Deleted')}")
+                    # 發送考試結果
+                    summary = TextSendMessage(text=f"🏁 Exam finished! You got {final_score}/{total} correct.")
+                    reply.send(summary)
+                else:
+                    # 短暫延遲後發送下一題
+                    logger.info(f"User {user_id} completed question {session.current}/{len(session.questions)}, Score: {session.correct}")
+                    logger.info(f"Attempting to send the next question. Current exam status: {exam_sessions.get(user_id, 'Deleted')}")
                 
-                # 獲取並發送下一題
-                next_q = send_exam_question(user_id)
-                logger.info(f"Type of next question generated: {type(next_q)}")
-                try:
-                        if isinstance(next_q, list):
-                            line_bot_api.push_message(user_id, next_q)
-                        else:
-                            line_bot_api.push_message(user_id, [next_q])
-                        logger.info(f"Successfully sent the next question to user {user_id}")
-                except Exception as e:
-                    logger.error(f"Failed to send the next question: {str(e)}")
+                    # 獲取並發送下一題
+                    next_q = send_exam_question(user_id)
+                    logger.info(f"Type of next question generated: {type(next_q)}")
+                    try:
+                        reply.send(next_q)
+                        logger.info(f"Queued the next question for user {user_id}")
+                    except Exception as e:
+                        logger.error(f"Failed to send the next question: {str(e)}")
+            else:
+                # 非發音題收到音頻：提示改用文字作答
+                reply.send(EXAM_TEXT_ANSWER_MESSAGE)
         return
     
     # 一般發音練習模式 (非考試模式)
     try:
         # 獲取當前正在學習的詞彙
-        current_vocab = user_data.get('current_vocab')
-        if not current_vocab or current_vocab not in thai_data['basic_words']:
+        current_vocab = user_data.current_vocab
+        word_id = vocab_index.id_of(current_vocab)
+        if word_id is None:
             line_bot_api.reply_message(
                 event.reply_token,
                 TextSendMessage(text="Please select a word to study before practicing pronunciation.")
@@ -1410,141 +1424,43 @@ def handle_audio_message(event):
             return
 
         # 取得參考發音文本和詞彙數據
-        word_data = thai_data['basic_words'][current_vocab]
-        reference_text = word_data['thai']
+        reference_text = vocab_index.thai[word_id]
         
-        # 處理用戶音頻
-        audio_content, gcs_url, audio_file_path = get_audio_content_with_gcs(event.message.id, user_id)
+        # 評分鏈（Google STT → Azure → SpeechBrain），全部失敗時使用模擬分數
+        result, audio_ok = scored_audio(scored, event.message.id, user_id, reference_text, vocab_index.audio_url[word_id])
         
-        if not audio_file_path or not os.path.exists(audio_file_path):
+        if not audio_ok:
             line_bot_api.reply_message(
                 event.reply_token,
                 TextSendMessage(text="❌ Unable to process your audio. Please try again.")
             )
             return
             
-        # 三階段評分邏輯實施
-        is_correct = False
-        method = "Simulated Evaluation"
         feedback_text = ""
-        score = 70
-        
-        try:
-            # ==== Step 1: Google Speech-to-Text ====
-            if gcs_url:
-                logger.info(f"Step 1: 使用Google STT評估發音，參考文本: {reference_text}")
-                
-                # 修正 GCS URL 格式問題
-                if gcs_url.startswith('https://storage.googleapis.com/'):
-                    gcs_uri = 'gs://' + gcs_url.replace('https://storage.googleapis.com/', '')
-                else:
-                    gcs_uri = gcs_url
-                    
-                # 使用修正後的 URI 進行識別
-                client = init_google_speech_client()
-                audio = speech.RecognitionAudio(uri=gcs_uri)
-                config = speech.RecognitionConfig(
-                    encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-                    sample_rate_hertz=16000,
-                    language_code="th-TH"
-                )
-                response = client.recognize(config=config, audio=audio)
-                
-                if response.results:
-                    recognized_text = response.results[0].alternatives[0].transcript
-                    logger.info(f"識別文字: {recognized_text}")
-                    
-                    similarity = SequenceMatcher(None, recognized_text.strip(), reference_text.strip()).ratio()
-                    enhanced_score = min(int(similarity * 225), 100)  # 放大分數，最高100分
-                    is_correct = similarity >= 0.3
-                    method = "Google STT"
-                    if similarity >= 0.6:
-                        feedback_text = f"✅ Professional-level pronunciation! Score: {enhanced_score}/100\nYour pronunciation was recognized as \"{recognized_text}\"\nSimilarity to the target: {similarity:.2f}"
-                    elif similarity >= 0.4:
-                         feedback_text = f"✅ Intermediate-level pronunciation! Score: {enhanced_score}/100\nYour pronunciation was recognized as \"{recognized_text}\"\nSimilarity to the target: {similarity:.2f}"
-                    else:
-                         feedback_text = f"✅ Basic-level pronunciation! Score: {enhanced_score}/100\nYour pronunciation was recognized as \"{recognized_text}\"\nSimilarity to the target: {similarity:.2f}"
-                    score = enhanced_score
-                    logger.info(f"Similarity: {similarity}, Evaluation result: {'Correct' if is_correct else 'Incorrect'}")
-                else:
-                    raise ValueError("Unable to recognize speech content")
-                    
-        except Exception as e1:
-            logger.warning(f"Step 1 failed. Trying Step 2: {str(e1)}")
-            
-            # ==== Step 2: SpeechBrain 相似度比較 ====
-            try:
-                # 設置較短的超時時間
-                import signal
-                
-                def timeout_handler(signum, frame):
-                    raise TimeoutError("SpeechBrain處理超時")
-                
-                # 設置15秒超時
-                signal.signal(signal.SIGALRM, timeout_handler)
-                signal.alarm(15)
-                
-                # 獲取參考音頻路徑
-                ref_audio_url = word_data.get('audio_url')
-                if ref_audio_url:
-                    # 下載參考音頻到臨時檔案
-                    ref_audio_path = os.path.join(os.path.dirname(audio_file_path), f"ref_{os.path.basename(audio_file_path)}")
-                    response = requests.get(ref_audio_url)
-                    if response.status_code == 200:
-                        with open(ref_audio_path, 'wb') as f:
-                            f.write(response.content)
-                        logger.info(f"已下載參考音頻: {ref_audio_path}")
-                        
-                        # 確認檔案大小
-                        if os.path.getsize(ref_audio_path) > 0:
-                            logger.info(f"Step 2: 使用SpeechBrain比較音頻相似度")
-                            similarity_score = compute_similarity(audio_file_path, ref_audio_path)
-                            
-                            # 取消超時
-                            signal.alarm(0)
-                            
-                            score = int(similarity_score * 100)
-                            is_correct = similarity_score >= 0.5
-                            method = "SpeechBrain"
-                            feedback_text = f"✅ Pronunciation Score：{score}/100\nPronunciation similarity{similarity_score:.2f}，{'Very close to standard pronunciation' if is_correct else 'Needs more practice'}！"
-                            logger.info(f"Audio similarity: {similarity_score},  Evaluation result: {'Correct' if is_correct else 'Incorrect'}")
-                        else:
-                            raise ValueError("Reference audio file is empty")
-                        
-                        # 清理參考音頻臨時檔案
-                        try:
-                            os.remove(ref_audio_path)
-                            logger.info(f"Reference audio temporary file removed: {ref_audio_path}")
-                        except:
-                            pass
-                    else:
-                        raise ValueError(f"Unable to download reference audio, status code: {response.status_code}")
+        if result:
+            score = result["score"]
+            is_correct = result["is_correct"]
+            method = result["method"]
+            if result.get("recognized_text") is not None:
+                similarity = result["similarity"]
+                if similarity >= 0.6:
+                    level = "Professional-level"
+                elif similarity >= 0.4:
+                    level = "Intermediate-level"
                 else:
-                    raise ValueError("Unable to find reference audio URL")
-                    
-            except Exception as e2:
-                # 取消超時（如果有設置）
-                try:
-                    signal.alarm(0)
-                except:
-                    pass
-                    
-                logger.warning(f"Step 2 failed, proceeding to final Step 3: {str(e2)}")
-                
-                # ==== Step 3: 模擬分數 (Fallback) ====
-                logger.info(f"Step 3: Using simulated scoring")
-                simulated_score = random.randint(40, 80)
-                score = simulated_score
-                is_correct = simulated_score >= 60
-                method = "AI  Evaluation"
-                feedback_text = f"✅ Pronunciation Score：{simulated_score}/100\nFeedback: Pronunciation{('is clear, keep it up' if simulated_score >= 80 else 'is good, with room for improvement')}！"
-                logger.info(f"Simulated score: {simulated_score}, Evaluation result: {'Correct' if is_correct else 'Incorrect'}")
-        
-        finally:
-            # 清理臨時音頻檔案
-            if audio_file_path and os.path.exists(audio_file_path):
-                os.remove(audio_file_path)
-                logger.info(f"Temporary audio file removed: {audio_file_path}")
+                    level = "Basic-level"
+                feedback_text = f"✅ {level} pronunciation! Score: {score}/100\nYour pronunciation was recognized as \"{result['recognized_text']}\"\nSimilarity to the target: {similarity:.2f}"
+            else:
+                feedback_text = f"✅ Pronunciation Score：{score}/100\nPronunciation similarity{result['similarity']:.2f}，{'Very close to standard pronunciation' if is_correct else 'Needs more practice'}！"
+        else:
+            # ==== 模擬分數 (Fallback) ====
+            logger.info(f"All scoring backends failed. Using simulated scoring")
+            simulated_score = random.randint(40, 80)
+            score = simulated_score
+            is_correct = simulated_score >= 60
+            method = "AI  Evaluation"
+            feedback_text = f"✅ Pronunciation Score：{simulated_score}/100\nFeedback: Pronunciation{('is clear, keep it up' if simulated_score >= 80 else 'is good, with room for improvement')}！"
+            logger.info(f"Simulated score: {simulated_score}, Evaluation result: {'Correct' if is_correct else 'Incorrect'}")
         
         # 儲存評估結果到 Firebase
         save_progress(user_id, current_vocab, score)
@@ -1595,6 +1511,8 @@ def handle_audio_message(event):
         )
 
 @handler.add(MessageEvent, message=TextMessage)
+@timed("text_message")
+@checks_out_user
 def handle_text_message(event):
     """處理文字訊息 - 修正版"""
     user_id = event.source.user_id
@@ -1645,8 +1563,7 @@ def handle_text_message(event):
     
     # 記憶遊戲中的音頻播放
     if (text.startswith("Play Audio:") and 
-        'game_state' in user_data and 
-        'memory_game' in user_data['game_state']):
+        'memory_game' in user_data.game_state):
         game_response = handle_memory_game(user_id, text)
         line_bot_api.reply_message(event.reply_token, game_response)
         return
@@ -1659,14 +1576,14 @@ def handle_text_message(event):
         word = text.split(":", 1)[1].strip() if ":" in text else ""
         logger.info(f"User requested to play audio: {word}")
         
-        if word in thai_data['basic_words']:
-            word_data = thai_data['basic_words'][word]
-            if 'audio_url' in word_data and word_data['audio_url']:
+        word_id = vocab_index.id_of(word)
+        if word_id is not None:
+            if vocab_index.audio_url[word_id]:
                 try:
                     line_bot_api.reply_message(
                         event.reply_token,
                         AudioSendMessage(
-                            original_content_url=word_data['audio_url'],
+                            original_content_url=vocab_index.audio_url[word_id],
                             duration=3000
                         )
                     )
@@ -1688,25 +1605,17 @@ def handle_text_message(event):
     # === 5. 主選單與導航 ===
     if text == "Start Learning" or text == "Back to Main Menu":
         exam_sessions.pop(user_id, None)
-        if 'game_state' in user_data:  # 加這兩行
-            user_data['game_state'].clear()
+        user_data.game_state.clear()
         line_bot_api.reply_message(event.reply_token, show_main_menu())
         return
     
     # === 6. 主題選擇處理 ===
     if text.startswith("Learn:"):
         category = text[6:]  # 去掉 "Learn:" 前綴
-        category_map = {
-            "Daily Phrases": "daily_phrases",
-            "Numbers": "numbers", 
-            "Animals": "animals",
-            "Food": "food",
-            "Transportation": "transportation"
-        }
+        eng_category = vocab_index.category_key(category)
         
-        if category in category_map:
-            eng_category = category_map[category]
-            user_data['current_category'] = eng_category
+        if eng_category:
+            user_data.current_category = eng_category
             messages = start_image_learning(user_id, eng_category)
             line_bot_api.reply_message(event.reply_token, messages)
         else:
@@ -1716,33 +1625,17 @@ def handle_text_message(event):
             )
         return
     # === 6.5. 直接主題選擇處理 ===
-    topic_categories = ["Daily Phrases", "Numbers", "Animals", "Food", "Transportation"]
-    if text in topic_categories:
+    if text in vocab_index.category_by_name:
         logger.info(f"直接主題選擇: {text}")
         
-        category_map = {
-            "Daily Phrases": "daily_phrases",
-            "Numbers": "numbers",
-            "Animals": "animals",
-            "Food": "food", 
-            "Transportation": "transportation"
-        }
+        eng_category = vocab_index.category_by_name[text]
+        user_data.current_category = eng_category
         
-        if text in category_map:
-            eng_category = category_map[text]
-            user_data['current_category'] = eng_category
-            
-            # 清除記憶遊戲狀態
-            if 'game_state' in user_data:
-                user_data['game_state'].pop('memory_game', None)
-            
-            messages = start_image_learning(user_id, eng_category)
-            line_bot_api.reply_message(event.reply_token, messages)
-        else:
-            line_bot_api.reply_message(
-                event.reply_token,
-                TextSendMessage(text="Sorry, topic not recognized. Please choose again.")
-            )
+        # 清除記憶遊戲狀態
+        user_data.game_state.pop('memory_game', None)
+        
+        messages = start_image_learning(user_id, eng_category)
+        line_bot_api.reply_message(event.reply_token, messages)
         return
     # === 7. 學習模式選擇 ===
     if text == "Select Topic":
@@ -1761,11 +1654,7 @@ def handle_text_message(event):
         line_bot_api.reply_message(event.reply_token, messages)
         return
     elif text == "Next Word":
-        if user_data.get('current_category'):
-            category = user_data['current_category']
-            user_data['current_vocab'] = random.choice(thai_data['categories'][category]['words'])
-        else:
-            user_data['current_vocab'] = None
+        user_data.current_vocab = next_practice_word(user_data, user_data.current_category)
         
         messages = start_image_learning(user_id)
         line_bot_api.reply_message(event.reply_token, messages)
@@ -1775,24 +1664,22 @@ def handle_text_message(event):
         line_bot_api.reply_message(event.reply_token, progress_message)
         return
     elif text == "Practice Weak Words":
-        if not user_data.get('vocab_mastery') or len(user_data['vocab_mastery']) == 0:
+        # 最早到期的詞即為掌握度最低的詞
+        weakest_word = review_queue(user_data).weakest()
+        if not weakest_word:
             line_bot_api.reply_message(
                 event.reply_token,
                 TextSendMessage(text="No learning history yet. Start with vocabulary practice!")
             )
             return
         
-        # 找出分數最低的詞彙
-        worst_word = min(user_data['vocab_mastery'].items(), 
-                      key=lambda x: sum(x[1]['scores'])/len(x[1]['scores']) if x[1]['scores'] else 100)
-        
-        user_data['current_vocab'] = worst_word[0]
+        user_data.current_vocab = weakest_word
         messages = start_echo_practice(user_id)
         line_bot_api.reply_message(event.reply_token, messages)
         return  
     elif text == "Learning Calendar":
-        streak = user_data.get('streak', 0)
-        last_active = user_data.get('last_active', 'Not started yet')
+        streak = user_data.streak
+        last_active = user_data.last_active
         
         calendar_message = (f"📅 Your Learning Record:\n\n"
                           f"🔥 Consecutive Days: {streak} days\n"
@@ -1802,20 +1689,10 @@ def handle_text_message(event):
         line_bot_api.reply_message(event.reply_token, TextSendMessage(text=calendar_message))
         return
     elif text == "Exam Mode":
-        quick_reply = QuickReply(
-            items=[
-                QuickReplyButton(action=MessageAction(label='Daily', text='Start Daily Phrases Exam')),
-                QuickReplyButton(action=MessageAction(label='Numbers', text='Start Numbers Exam')),
-                QuickReplyButton(action=MessageAction(label='Animals', text='Start Animals Exam')),
-                QuickReplyButton(action=MessageAction(label='Food', text='Start Food Exam')),
-                QuickReplyButton(action=MessageAction(label='Transport', text='Start Transportation Exam')),
-                QuickReplyButton(action=MessageAction(label='Full Exam', text='Start Full Exam'))
-            ]
-        )
-        line_bot_api.reply_message(
-            event.reply_token,
-            TextSendMessage(text="Please choose an exam category:", quick_reply=quick_reply)
-        )
+        line_bot_api.reply_message(event.reply_token, reply_templates.render("exam_menu"))
+        return
+    elif text == "Exam History":
+        line_bot_api.reply_message(event.reply_token, show_exam_history(user_id))
         return
     else:
         # 預設回應
@@ -1856,29 +1733,29 @@ def handle_exam_message(event):
     # 啟動考試
     if message_text in exam_mappings:
         exam_info = exam_mappings[message_text]
-        exam_sessions[user_id] = {
-            "questions": generate_exam(thai_data, exam_info["category"]),
-            "current": 0,
-            "correct": 0,
-            "exam_type": exam_info["name"]
-        }
+        exam_sessions[user_id] = ExamSession(
+            exam_builder.build(exam_info["category"]),
+            exam_type=exam_info["name"],
+            started_at=time.time()
+        )
         return send_exam_question(user_id)
         
     # 處理「跳過」指令
     if (message_text == "Skip" or message_text == "Skip") and user_id in exam_sessions:
         session = exam_sessions[user_id]
         logger.info(f"User {user_id} chose to skip current question")
+        record_exam_answer(session, "skipped")
         
         # 直接跳到下一題
-        session["current"] += 1
+        session.current += 1
         
         # 檢查是否已完成所有題目
-        if session["current"] >= len(session["questions"]):
-            total = len(session["questions"])
-            score = session["correct"]
+        if session.current >= len(session.questions):
+            total = len(session.questions)
+            score = session.correct
             
             # 儲存考試結果到 Firebase
-            save_exam_result(user_id, score, total, exam_type="Full Exam")
+            save_exam_result(user_id, session)
             
             del exam_sessions[user_id]
             return TextSendMessage(text=f" Exam completed!\nYou answered {score}/{total} questions correctly.")
@@ -1889,7 +1766,7 @@ def handle_exam_message(event):
 # 正在考試狀態中（處理作答）
     if user_id in exam_sessions:
         session = exam_sessions[user_id]
-        question = session["questions"][session["current"]]
+        question = session.questions[session.current]
         
         # 判斷答題類型 - 移到 if 內部
         if question["type"] == "audio_choice":
@@ -1900,8 +1777,9 @@ def handle_exam_message(event):
             is_correct = score_image_choice(user_answer, correct_answer)
             
             # 準備反饋訊息
+            record_exam_answer(session, "correct" if is_correct else "incorrect")
             if is_correct:
-                session["correct"] += 1
+                session.correct += 1
                 feedback = f"✅ Correct! \"{user_answer}\" is the right answer."
             else:
                 feedback = f"❌ Incorrect. The correct answer is \"{correct_answer}\"."
@@ -1911,13 +1789,13 @@ def handle_exam_message(event):
             feedback_message = None
 
         # 換下一題 - 也要在 if 內部
-        session["current"] += 1
-        if session["current"] >= len(session["questions"]):
-            total = len(session["questions"])
-            score = session["correct"]
+        session.current += 1
+        if session.current >= len(session.questions):
+            total = len(session.questions)
+            score = session.correct
 
             # 儲存考試結果到 Firebase
-            save_exam_result(user_id, score, total, exam_type="Full Exam")
+            save_exam_result(user_id, session)
 
             del exam_sessions[user_id]
             
@@ -1956,19 +1834,20 @@ def send_exam_question(user_id):
         session = exam_sessions[user_id]
         
         # 檢查session是否包含必要的信息
-        if "questions" not in session or "current" not in session:
+        if not session.questions:
             logger.error(f"Incomplete exam state: {session}")
             return TextSendMessage(text="Incomplete exam status. Please restart the exam.")
         
         # 檢查索引是否有效
-        if session["current"] >= len(session["questions"]):
-            logger.error(f"Question index out of range: {session['current']}/{len(session['questions'])}")
+        if session.current >= len(session.questions):
+            logger.error(f"Question index out of range: {session.current}/{len(session.questions)}")
             return TextSendMessage(text="You have completed all the questions. The exam is now finished.")
         
         # 從這裡開始是原有代碼
-        question = session["questions"][session["current"]]
-        q_num = session["current"] + 1
-        total = len(session["questions"])
+        question = session.questions[session.current]
+        q_num = session.current + 1
+        session.question_started = time.time()
+        total = len(session.questions)
 
         # 添加「跳過」按鈕
         skip_button = QuickReplyButton(action=MessageAction(label="Skip this question", text="Skip"))
@@ -2018,15 +1897,50 @@ def send_exam_question(user_id):
         logger.error(f"Error occurred while generating exam question: {str(e)}")
         return TextSendMessage(text="An error occurred while generating the question. Please restart the exam.")
 #=== 考試結果儲存 ===    
-def save_exam_result(user_id, score, total, exam_type="Full Exam"):
-    ref = db.collection("users").document(user_id).collection("exams").document()
-    ref.set({
-        "exam_type": exam_type,
+# 考試結果先放入佇列，由背景執行緒批次寫入 exams 子集合並更新 summary/exams 統計
+exam_result_queue = create_exam_result_queue(
+    FirestoreExamBackend(db),
+    flush_interval=float(os.environ.get('EXAM_FLUSH_INTERVAL', 5.0)),
+    max_pending=int(os.environ.get('EXAM_FLUSH_SIZE', 100)),
+    max_queued=int(os.environ.get('EXAM_QUEUE_LIMIT', 10000))
+)
+
+
+def record_exam_answer(session, outcome, score=None):
+    """記錄目前題目的作答結果（correct / incorrect / skipped）與作答耗時"""
+    question = session.questions[session.current]
+    started = session.question_started
+    session.answers.append({
+        "index": session.current,
+        "type": question["type"],
+        "word": question.get("word") or question.get("answer"),
+        "outcome": outcome,
         "score": score,
-        "total": total,
+        "seconds": round(time.time() - started, 2) if started else None
+    })
+
+
+def save_exam_result(user_id, session):
+    started = session.started_at
+    exam_result_queue.enqueue({
+        "id": uuid.uuid4().hex,
+        "user_id": user_id,
+        "exam_type": session.exam_type,
+        "score": session.correct,
+        "total": len(session.questions),
+        "answers": session.answers,
+        "duration_seconds": round(time.time() - started, 2) if started else None,
         "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     })
-    logger.info(f"✅ User {user_id} exam result saved:{score}/{total}")
+    logger.info(f"✅ User {user_id} exam result queued:{session.correct}/{len(session.questions)}")
+
+
+EXAM_HISTORY_ROWS = 10  # 考試歷史圖表顯示最近幾次考試
+
+
+def load_exam_stats(user_id):
+    """讀取使用者的考試統計（含最近考試紀錄，供歷史圖表使用）"""
+    return exam_result_queue.load_stats(user_id)
      
         # === 第四部分：學習功能模塊 ===
 
@@ -2034,80 +1948,62 @@ def save_exam_result(user_id, score, total, exam_type="Full Exam"):
 def show_category_menu():
     """顯示主題選單"""
     logger.info("Displaying topic menu")
-    
-    quick_reply = QuickReply(
-        items=[
-            QuickReplyButton(action=MessageAction(label='Daily', text='Learn:Daily Phrases')),
-            QuickReplyButton(action=MessageAction(label='🔢Numbers', text='Learn:Numbers')),
-            QuickReplyButton(action=MessageAction(label='🐾 Animals', text='Learn:Animals')),
-            QuickReplyButton(action=MessageAction(label='🍜Food', text='Learn:Food')),
-            QuickReplyButton(action=MessageAction(label='🚗Transport', text='Learn:Transportation'))
-        ]
-    )
-    
-    return TextSendMessage(
-        text="📚Select a topic to learn vocabulary:",
-        quick_reply=quick_reply
-    )
+    return reply_templates.render("category_menu")
+
+def review_queue(user_data):
+    """使用者的複習佇列（第一次使用時由 vocab_mastery 建立；詞彙熱重載後重新綁定目前的索引）"""
+    if user_data.review is None:
+        user_data.review = ReviewQueue(user_data.vocab_mastery, vocab_index)
+    elif user_data.review.vocab is not vocab_index:
+        user_data.review.rebind(vocab_index)
+    return user_data.review
+
+def next_practice_word(user_data, category=None):
+    """依間隔重複排程選出下一個要練習的詞：已到期的詞 > 新詞 > 最早到期的詞"""
+    return review_queue(user_data).next_word(category, exclude=user_data.current_vocab)
 
 def start_image_learning(user_id, category=None):
     """啟動圖像詞彙學習模式"""
     logger.info(f"Starting image vocabulary learning mode, User ID: {user_id}")
     user_data = user_data_manager.get_user_data(user_id)
-    user_data['current_activity'] = 'image_learning'
+    user_data.current_activity = 'image_learning'
     
-    # 如果指定了主題，設置當前主題
+    # 如果指定了主題，設置當前主題並由複習排程選詞
     if category:
-        user_data['current_category'] = category
-        word_key = random.choice(thai_data['categories'][category]['words'])
-    # 隨機選擇詞彙，或從之前的主題中選擇
-    elif user_data.get('current_vocab'):
-        word_key = user_data['current_vocab']
+        user_data.current_category = category
+        word_key = next_practice_word(user_data, category)
+    elif user_data.current_vocab:
+        word_key = user_data.current_vocab
     else:
-        # 如果有當前主題，從該主題中選詞
-        if user_data.get('current_category'):
-            category = user_data['current_category']
-            word_key = random.choice(thai_data['categories'][category]['words'])
-        else:
-            # 否則隨機選擇一個詞
-            word_key = random.choice(list(thai_data['basic_words'].keys()))
+        # 從當前主題（或全部詞彙）中選出下一個要練習的詞
+        word_key = next_practice_word(user_data, user_data.current_category)
     
-    user_data['current_vocab'] = word_key
-    word_data = thai_data['basic_words'][word_key]
-    logger.info(f"Selected vocabulary: {word_key}, Thai: {word_data['thai']}")
+    user_data.current_vocab = word_key
+    word_id = vocab_index.id_of(word_key)
+    logger.info(f"Selected vocabulary: {word_key}, Thai: {vocab_index.thai[word_id]}")
     
     # 建立訊息列表
     message_list = []
     
     # 添加圖片
-    if 'image_url' in word_data and word_data['image_url']:
+    image_url = vocab_index.image_url[word_id]
+    if image_url:
         message_list.append(
             ImageSendMessage(
-                original_content_url=word_data['image_url'],
-                preview_image_url=word_data['image_url']
+                original_content_url=image_url,
+                preview_image_url=image_url
             )
         )
     
     # 添加詞彙訊息
     message_list.append(
         TextSendMessage(
-            text=f"Thai: {word_data['thai']}\nEnglish: {word_key}\nPronunciation: {word_data['pronunciation']}\nTone: {word_data['tone']}"
+            text=f"Thai: {vocab_index.thai[word_id]}\nEnglish: {word_key}\nPronunciation: {vocab_index.pronunciation[word_id]}\nTone: {vocab_index.tone[word_id]}"
         )
     )
     
     # 添加選項按鈕
-    buttons_template = ButtonsTemplate(
-        title="Vocabulary Practice",
-        text="Please choose your next step:",
-        actions=[
-            MessageAction(label="Practice Speaking", text="Pronunciation drill"),
-            MessageAction(label="Next Word", text="Next Word"),
-            MessageAction(label="Main Menu", text="Back to Main Menu")
-        ]
-    )
-    message_list.append(
-        TemplateSendMessage(alt_text="Vocabulary Practice Options", template=buttons_template)
-    )
+    message_list.append(reply_templates.render("vocabulary_options"))
     
     return message_list
 
@@ -2115,71 +2011,47 @@ def start_echo_practice(user_id):
     """啟動回音法發音練習"""
     logger.info(f"Starting echo method pronunciation practice, User ID: {user_id}")
     user_data = user_data_manager.get_user_data(user_id)
-    user_data['current_activity'] = 'echo_practice'
+    user_data.current_activity = 'echo_practice'
 
-    # 獲取當前詞彙，若無則隨機選擇
-    if not user_data.get('current_vocab'):
-        # 如果有當前主題，從該主題中選詞
-        if user_data.get('current_category'):
-            category = user_data['current_category']
-            word_key = random.choice(thai_data['categories'][category]['words'])
-        else:
-            # 否則隨機選擇一個詞
-            word_key = random.choice(list(thai_data['basic_words'].keys()))
-        user_data['current_vocab'] = word_key
+    # 獲取當前詞彙，若無則由複習排程選詞
+    if not user_data.current_vocab:
+        user_data.current_vocab = next_practice_word(user_data, user_data.current_category)
     
-    word_key = user_data['current_vocab']
-    word_data = thai_data['basic_words'][word_key]
-    logger.info(f"Pronunciation practice vocabulary: {word_key}, Thai: {word_data['thai']}")
+    word_key = user_data.current_vocab
+    word_id = vocab_index.id_of(word_key)
+    logger.info(f"Pronunciation practice vocabulary: {word_key}, Thai: {vocab_index.thai[word_id]}")
     
     # 建立訊息列表
     message_list = []
     
     # 添加音訊提示
-    if 'audio_url' in word_data and word_data['audio_url']:
+    if vocab_index.audio_url[word_id]:
         message_list.append(
             AudioSendMessage(
-                original_content_url=word_data['audio_url'],
+                original_content_url=vocab_index.audio_url[word_id],
                 duration=3000  # 假設音訊長度為3秒
             )
         )
     
     # 添加回音法三步驟與詞彙發音提示
-    message_list.append(
-        TextSendMessage(
-            text="🧠【Echo Method for Pronunciation】\n\n"
-                 "1. Listen: Hear a Thai word.\n" 
-                 "2. Echo:Pause for 3 seconds and replay the sound and tone in your mind.\n"
-                 "3. Mimic:Imitate the sound out loud from your internal echo.\n\n"
-                 f"📣 Practice Word:{word_data['thai']}\n"
-                 f"Pronunciation:{word_data['pronunciation']}\n\n"
-                 "Please tap the 🎤 microphone icon at the bottom to record your pronunciation."
-    )
-)
+    message_list.append(reply_templates.render(
+        "echo_instructions",
+        thai=vocab_index.thai[word_id],
+        pronunciation=vocab_index.pronunciation[word_id]
+    ))
    
     # 添加音調指導
     tone_info = ""
-    for part in word_data['tone'].split('-'):
-        if part in thai_data['tone_guide']:
-            tone_info += thai_data['tone_guide'][part] + "\n"
+    for part in vocab_index.tone[word_id].split('-'):
+        if part in vocab_index.tone_guide:
+            tone_info += vocab_index.tone_guide[part] + "\n"
     
     message_list.append(
         TextSendMessage(text=f"Tone Guide：\n{tone_info}")
     )
     
     # 添加選項按鈕（移除錄音按鈕，因為會使用LINE聊天界面的麥克風按鈕）
-    buttons_template = ButtonsTemplate(
-        title="Pronunciation drill",
-        text="Other Options",
-        actions=[
-            MessageAction(label="Play Again", text=f"Play Audio: {word_key}"),
-            MessageAction(label="Main Menu", text="Back to Main Menu")
-        ]
-    )
-    message_list.append(
-
-        TemplateSendMessage(alt_text="Pronunciation drill", template=buttons_template)
-    )
+    message_list.append(reply_templates.render("echo_options", word=word_key))
     
     return message_list
 
@@ -2187,73 +2059,46 @@ def start_tone_learning(user_id):
     """啟動音調學習模式"""
     logger.info(f"Starting tone learning mode, User ID: {user_id}")
     user_data = user_data_manager.get_user_data(user_id)
-    user_data['current_activity'] = 'tone_learning'
-    
-    # 建立訊息列表
-    message_list = []
-    
-    # 泰語音調介紹
-    message_list.append(
-        TextSendMessage(
-            text="There are five tones in Thai. Each tone can change the meaning of a word:\n\n"
-         "1. Mid Tone (no mark)\n"
-         "2. Low Tone (่)\n"
-         "3. Falling Tone (้)\n"
-         "4. High Tone (๊)\n"
-         "5. Rising Tone (๋)"
-        )
-    )
-    
-    # 提供音調例子
-    examples_text = "Tone Examples：\n\n"
-    for example in thai_data['tone_examples']:
-        examples_text += f"{example['thai']} - {example['meaning']} - {example['pronunciation']} ({example['tone']}調)\n"
-    
-    message_list.append(TextSendMessage(text=examples_text))
-    
-    # 添加選項按鈕
-    buttons_template = ButtonsTemplate(
-        title="Tone Learning",
-        text="Please choose an action",
-        actions=[
-            MessageAction(label="Practice Speaking", text="Pronunciation drill"),
-            MessageAction(label="Vocabulary", text="Vocabulary"),
-            MessageAction(label="Main Menu", text="Back to Main Menu")
-        ]
-    )
-    message_list.append(
-        TemplateSendMessage(alt_text="Tone Learning Options", template=buttons_template)
-    )
+    user_data.current_activity = 'tone_learning'
     
-    return message_list
+    # 音調介紹、音調例子與選項按鈕皆為固定內容
+    return [
+        reply_templates.render("tone_intro"),
+        reply_templates.render("tone_examples"),
+        reply_templates.render("tone_options")
+    ]
 
 def show_learning_progress(user_id):
     """從 Firebase 顯示用戶學習進度"""
     logger.info(f"📊 Displaying learning progress, User ID: {user_id}")
 
-    # 從 Firestore 讀取進度
-    progress = load_progress(user_id)
+    # 讀取摘要文件（單一文件）；尚未建立摘要的使用者才掃描整個進度集合
+    summary = load_progress_summary(user_id)
+    if summary is None:
+        progress = load_progress(user_id)
+        summary = build_summary(progress) if progress else None
 
-    if not progress:
+    if not summary or not summary["word_count"]:
         return TextSendMessage(text="You haven't started learning yet. Please choose 'Vocabulary' or 'Pronunciation drill' to begin your Thai learning journey!")
 
-    total_words = len(progress)
-    total_practices = sum(data.get("times", 1) for data in progress.values())
-    avg_score = sum(data.get("score", 0) for data in progress.values()) / total_words if total_words > 0 else 0
+    total_words = summary["word_count"]
+    total_practices = summary["practice_count"]
+    avg_score = summary["score_sum"] / total_words
 
     # 最佳與最弱詞彙
-    best_word = max(progress.items(), key=lambda x: x[1].get("score", 0))
-    worst_word = min(progress.items(), key=lambda x: x[1].get("score", 100))
+    best_word = summary["best_word"]
+    worst_word = summary["worst_word"]
 
     # 生成報告
     progress_report = f"📘 LearningProgress Report\n\n"
     progress_report += f"🟦 Vocabulary Learned: {total_words} words\n"
     progress_report += f"🔁 Total Practice Attempts: {total_practices} times\n"
     progress_report += f"📈 Average Pronunciation Score: {avg_score:.1f}/100\n\n"
-    best_thai = thai_data['basic_words'].get(best_word[0], {}).get('thai', best_word[0])
-    worst_thai = thai_data['basic_words'].get(worst_word[0], {}).get('thai', worst_word[0])
-    progress_report += f"🏆 Best Word: {best_word[0]} ({best_thai})\n"
-    progress_report += f"🧩 Word to Improve: {worst_word[0]} ({worst_thai})"
+    best_id, worst_id = vocab_index.id_of(best_word), vocab_index.id_of(worst_word)
+    best_thai = vocab_index.thai[best_id] if best_id is not None else best_word
+    worst_thai = vocab_index.thai[worst_id] if worst_id is not None else worst_word
+    progress_report += f"🏆 Best Word: {best_word} ({best_thai})\n"
+    progress_report += f"🧩 Word to Improve: {worst_word} ({worst_thai})"
 
 
     return TextSendMessage(text=progress_report)
@@ -2274,27 +2119,37 @@ def show_learning_progress(user_id):
         TemplateSendMessage(alt_text="LearningProgress Options", template=buttons_template)
     ]
 
+def show_exam_history(user_id):
+    """考試歷史：只讀取滾動統計文件（含尚未寫入的結果），不掃描 exams 子集合"""
+    logger.info(f"📝 Displaying exam history, User ID: {user_id}")
+    stats = load_exam_stats(user_id)
+    if not stats or not stats["exams_taken"]:
+        return TextSendMessage(text="You haven't taken any exams yet. Choose 'Exam Mode' to take your first exam!")
+
+    accuracy = stats["correct_total"] / stats["questions_total"] * 100 if stats["questions_total"] else 0
+    history_report = "📝 Exam History\n\n"
+    history_report += f"🧾 Exams Taken: {stats['exams_taken']}\n"
+    history_report += f"🎯 Overall Accuracy: {accuracy:.0f}%\n"
+    if stats["answers_timed"]:
+        history_report += f"⏱️ Average Answer Time: {stats['answer_seconds_sum'] / stats['answers_timed']:.1f}s\n"
+
+    history_report += "\n🏅 Best Scores:\n"
+    for exam_type, entry in sorted(stats["by_type"].items()):
+        history_report += f"• {exam_type}: {entry['best_ratio'] * 100:.0f}% ({entry['count']} taken)\n"
+
+    # 最近考試的正確率長條圖
+    history_report += "\n📈 Recent Exams:\n"
+    for exam in stats["recent"][-EXAM_HISTORY_ROWS:]:
+        filled = round(exam["score"] / exam["total"] * 10) if exam["total"] else 0
+        history_report += f"{exam['timestamp'][5:10]} {'▇' * filled}{'▁' * (10 - filled)} {exam['score']}/{exam['total']}\n"
+
+    return TextSendMessage(text=history_report.rstrip())
+
 def show_main_menu():
     """顯示主選單"""
     logger.info("Displaying main menu")
-    
     # 使用 QuickReply 代替 ButtonsTemplate，因為 QuickReply 可以支援更多按鈕
-    quick_reply = QuickReply(
-        items=[
-            QuickReplyButton(action=MessageAction(label='Select Topic', text='Select Topic')),
-            QuickReplyButton(action=MessageAction(label='Vocabulary', text='Vocabulary')),
-            QuickReplyButton(action=MessageAction(label='Speaking', text='Pronunciation drill')),
-            QuickReplyButton(action=MessageAction(label='Tone Learning', text='Tone Learning')),
-            QuickReplyButton(action=MessageAction(label='MemoryGame', text='Start MemoryGame')),
-            QuickReplyButton(action=MessageAction(label='Progress', text='LearningProgress')),
-             QuickReplyButton(action=MessageAction(label='Exam Mode', text='Exam Mode'))
-        ]
-    )
-    
-    return TextSendMessage(
-        text="🇹🇭 Welcome to the Thai Learning System 🇹🇭\nPlease choose your preferred learning mode:",
-        quick_reply=quick_reply
-    )
+    return reply_templates.render("main_menu")
 # === 第五部分：記憶翻牌遊戲和訊息處理 ===
 from linebot.models import (
     FlexSendMessage, BubbleContainer, BoxComponent, TextComponent, ButtonComponent,
@@ -2302,73 +2157,64 @@ from linebot.models import (
 )
 
 # === 記憶翻牌遊戲類 ===
+NORMAL_MODE_PAIRS = 5
+HARD_MODE_PAIRS = 16  # 困難模式：8×4 卡片，混合所有主題
+ALL_TOPICS = "all"
+
 class MemoryGame:
-    def __init__(self, category=None):
+    def __init__(self, category=None, pairs=NORMAL_MODE_PAIRS):
         """初始化記憶翻牌遊戲"""
-        self.cards = []
-        self.flipped_cards = []
-        self.matched_pairs = []
+        self.cards = ()
+        self.positions = {}  # 卡片編號 -> 在 cards 中的位置
+        self.flipped_cards = []  # 目前翻開、尚未配對的卡片（最多兩張）
+        self.flipped_mask = 0  # 以卡片編號為位元的遮罩
+        self.matched_mask = 0
+        self.matched_count = 0
         self.attempts = 0
         self.start_time = None
         self.end_time = None
         self.category = category
+        self.pairs = pairs
         self.time_limit = 90  # 設定時間限制為90秒（1分30秒）
         self.pending_reset = False  # 用於配對失敗時，暫時保持卡片翻開
         
-    def initialize_game(self, category=None):
-        """根據類別初始化遊戲卡片"""
+    def initialize_game(self, category=None, pairs=None):
+        """根據類別初始化遊戲卡片；category 為 ALL_TOPICS 時從全部詞彙選詞"""
         if category:
             self.category = category
+        if pairs:
+            self.pairs = pairs
         
         # 如果沒有指定類別，隨機選擇一個
         if not self.category:
-            self.category = random.choice(list(thai_data['categories'].keys()))
-        
-        # 從類別中選擇 5 個詞彙
-        category_words = thai_data['categories'][self.category]['words']
-        
-        
+            self.category = random.choice(list(vocab_index.category_ids))
         
-        selected_words = random.sample(category_words, min(5, len(category_words)))
+        # 從類別中選擇詞彙（一般模式 5 個，困難模式 16 個）
+        if self.category == ALL_TOPICS:
+            word_ids = vocab_index.ids()
+        else:
+            word_ids = vocab_index.category_ids[self.category]
+        selected_ids = random.sample(word_ids, min(self.pairs, len(word_ids)))
+        self.time_limit = 180 if self.pairs > NORMAL_MODE_PAIRS else 90
         
-        # 初始化卡片清單
-        self.cards = []
+        # 為每個詞彙創建一對卡片（圖片卡和音頻卡），卡片只保存詞彙表索引
+        cards = []
         card_id = 1
+        for word_id in selected_ids:
+            cards.append(Card(card_id, 'image', word_id, card_id + 1, vocab_index))
+            cards.append(Card(card_id + 1, 'audio', word_id, card_id, vocab_index))
+            card_id += 2
         
-        # 為每個詞彙創建一對卡片（圖片卡和音頻卡）
-        for word in selected_words:
-            word_data = thai_data['basic_words'][word]
-            
-            # 添加圖片卡
-            self.cards.append({
-                'id': card_id,
-                'type': 'image',
-                'content': word_data['image_url'],
-                'match_id': card_id + 1,
-                'word': word,
-                'meaning': word,
-                'thai': word_data['thai']
-            })
-            card_id += 1
-            
-            # 添加音頻卡
-            self.cards.append({
-                'id': card_id,
-                'type': 'audio',
-                'content': word_data['audio_url'],
-                'match_id': card_id - 1,
-                'word': word,
-                'meaning': word,
-                'thai': word_data['thai']
-            })
-            card_id += 1
-        
-        # 洗牌
-        random.shuffle(self.cards)
+        # 洗牌；卡片在一局中不再改變，以 tuple 保存讓狀態快照可直接共用
+        random.shuffle(cards)
+        self.cards = tuple(cards)
+        self.positions = {card.id: i for i, card in enumerate(self.cards)}
         
         # 重置遊戲狀態
         self.flipped_cards = []
-        self.matched_pairs = []
+        self.flipped_mask = 0
+        self.matched_mask = 0
+        self.matched_count = 0
         self.attempts = 0
         self.start_time = datetime.now()
         self.end_time = None
@@ -2383,35 +2229,37 @@ class MemoryGame:
         if self.pending_reset:
             logger.info("Resetting previously unmatched cards")
             self.flipped_cards = []
+            self.flipped_mask = 0
             self.pending_reset = False
         
         # 尋找卡片
-        card = next((c for c in self.cards if c['id'] == card_id), None)
-        if not card:
+        position = self.positions.get(card_id)
+        if position is None:
             logger.warning(f"Card not found ID: {card_id}")
             return None, "Card does not exist", False, None
+        card = self.cards[position]
+        bit = 1 << card_id
         
         # 檢查卡片是否已經配對
-        if card_id in [c['id'] for pair in self.matched_pairs for c in pair]:
+        if self.matched_mask & bit:
             logger.warning(f"Card{card_id} is already matched")
             return self.get_game_state(), "Card is already matched", False, None
         
         # 檢查卡片是否已經翻轉
-        if card_id in [c['id'] for c in self.flipped_cards]:
+        if self.flipped_mask & bit:
             logger.warning(f"Card {card_id}is already flipped")
             return self.get_game_state(), "Card is already flipped", False, None
         
         # 添加到翻轉卡片列表
         self.flipped_cards.append(card)
+        self.flipped_mask |= bit
         
         # 檢查是否需要播放音頻
         should_play_audio = False
         audio_url = None
-        if card['type'] == 'audio':
+        if card.kind == 'audio':
             should_play_audio = True
-            word = card['word']
-            if word in thai_data['basic_words'] and 'audio_url' in thai_data['basic_words'][word]:
-                audio_url = thai_data['basic_words'][word]['audio_url']
+            audio_url = card.content
         
         # 如果翻轉了兩張卡片，檢查是否匹配
         result = "Continue game"
@@ -2420,22 +2268,24 @@ class MemoryGame:
             card1, card2 = self.flipped_cards
             
             # 檢查是否配對
-            if card1['match_id'] == card2['id'] and card2['match_id'] == card1['id']:
+            if card1.match_id == card2.id and card2.match_id == card1.id:
                 # 配對成功
-                self.matched_pairs.append(self.flipped_cards.copy())
-                result = f"Match successful！{card1['word']} - {card1['thai']}"
-                logger.info(f"Cards matched successfully: {card1['id']} and {card2['id']}")
+                self.matched_mask |= self.flipped_mask
+                self.matched_count += 1
+                result = f"Match successful！{card1.word} - {card1.thai}"
+                logger.info(f"Cards matched successfully: {card1.id} and {card2.id}")
                 # 配對成功才清空翻轉卡片列表
                 self.flipped_cards = []
+                self.flipped_mask = 0
             else:
                 # 配對失敗 - 設置標記而不是立即清空翻轉卡片列表
                 result = "Match failed, please try again"
-                logger.info(f"Cards match failed: {card1['id']} and {card2['id']}")
+                logger.info(f"Cards match failed: {card1.id} and {card2.id}")
                 self.pending_reset = True
                 # 不要在這裡清空 self.flipped_cards，這樣卡片會保持翻開狀態
         
         # 檢查遊戲是否結束
-        if len(self.matched_pairs) * 2 == len(self.cards):
+        if self.matched_count * 2 == len(self.cards):
             self.end_time = datetime.now()
             result = self.get_end_result()
             logger.info("Memory card game finished")
@@ -2451,32 +2301,31 @@ class MemoryGame:
         return self.get_game_state(), result, should_play_audio, audio_url
     
     def get_game_state(self):
-        """獲取當前遊戲狀態"""
+        """獲取當前遊戲狀態（唯讀快照，不複製卡片）"""
         elapsed_time = 0
         if self.start_time:
             current_time = self.end_time if self.end_time else datetime.now()
             elapsed_time = (current_time - self.start_time).total_seconds()
         
-        remaining_time = max(0, self.time_limit - elapsed_time)
-        
         # 計算類別名稱
-        category_name = ""
-        if self.category and self.category in thai_data['categories']:
-            category_name = thai_data['categories'][self.category]['name']
-        
-        return {
-            'cards': self.cards,
-            'flipped_cards': [c['id'] for c in self.flipped_cards],
-            'matched_pairs': [[c['id'] for c in pair] for pair in self.matched_pairs],
-            'attempts': self.attempts,
-            'elapsed_time': elapsed_time,
-            'remaining_time': remaining_time,
-            'is_completed': len(self.matched_pairs) * 2 == len(self.cards),
-            'is_timeout': elapsed_time > self.time_limit,
-            'category': self.category,
-            'category_name': category_name,
-            'pending_reset': self.pending_reset
-        }
+        if self.category == ALL_TOPICS:
+            category_name = "Hard Mode · All Topics"
+        else:
+            category_name = vocab_index.category_names.get(self.category, "") if self.category else ""
+        
+        return BoardState(
+            cards=self.cards,
+            flipped=self.flipped_mask,
+            matched=self.matched_mask,
+            attempts=self.attempts,
+            elapsed_time=elapsed_time,
+            remaining_time=max(0, self.time_limit - elapsed_time),
+            is_completed=self.matched_count * 2 == len(self.cards),
+            is_timeout=elapsed_time > self.time_limit,
+            category=self.category,
+            category_name=category_name,
+            pending_reset=self.pending_reset
+        )
     
     def get_end_result(self):
         """獲取遊戲結束結果"""
@@ -2485,7 +2334,7 @@ class MemoryGame:
         
         duration = (self.end_time - self.start_time).total_seconds()
         pairs_count = len(self.cards) // 2
-        matched_count = len(self.matched_pairs)
+        matched_count = self.matched_count
         
         # 計算分數和等級
         if duration > self.time_limit:
@@ -2514,15 +2363,11 @@ def handle_memory_game(user_id, message):
     """處理記憶翻牌遊戲訊息"""
     user_data = user_data_manager.get_user_data(user_id)
     
-    # 初始化遊戲狀態
-    if 'game_state' not in user_data:
-        user_data['game_state'] = {}
-    
     # 檢查是否有活動的遊戲
-    if 'memory_game' not in user_data['game_state']:
-        user_data['game_state']['memory_game'] = MemoryGame()
+    if 'memory_game' not in user_data.game_state:
+        user_data.game_state['memory_game'] = MemoryGame()
     
-    game = user_data['game_state']['memory_game']
+    game = user_data.game_state['memory_game']
     
     # 處理遊戲指令
     if message == "Start MemoryGame":
@@ -2533,43 +2378,40 @@ def handle_memory_game(user_id, message):
                 QuickReplyButton(action=MessageAction(label='🔢Numbers', text='Memory:Numbers')),
                 QuickReplyButton(action=MessageAction(label='🐾Animals', text='Memory:Animals')),
                 QuickReplyButton(action=MessageAction(label='🍜Food', text='Memory:Food')),
-                QuickReplyButton(action=MessageAction(label='🚗Transport', text='Memory:Transportation'))
+                QuickReplyButton(action=MessageAction(label='🚗Transport', text='Memory:Transportation')),
+                QuickReplyButton(action=MessageAction(label='🔥Hard 8×4', text='Memory:Hard Mode'))
             ]
         )
         
         return TextSendMessage(
-          text="🎮 Memory Card Game\n\nGame Rules:\n1. Flip the cards to find matching image and pronunciation pairs\n2. You have 1 minute and 30 seconds to complete the game\n3. The faster you finish, the better your rating\n\nPlease choose a topic to begin:",
+          text="🎮 Memory Card Game\n\nGame Rules:\n1. Flip the cards to find matching image and pronunciation pairs\n2. You have 1 minute and 30 seconds to complete the game (3 minutes in Hard Mode)\n3. The faster you finish, the better your rating\n\nPlease choose a topic to begin:",
             quick_reply=quick_reply
         )
     
+    elif message == "Hard Mode":
+        # 困難模式：16 對卡片，詞彙取自所有主題
+        cards = game.initialize_game(ALL_TOPICS, pairs=HARD_MODE_PAIRS)
+        return create_flex_memory_game(cards, game.get_game_state(), user_id)
+    
     elif message in ["Daily Phrases", "Numbers", "Animals", "Food", "Transportation"]:
         category = message
         logger.info(f"Received memory game topic selection: '{category}'")
         
         # 轉換成英文鍵值
-        category_map = {
-            "Daily Phrases": "daily_phrases",
-            "Numbers": "numbers",
-            "Animals": "animals",
-            "Food": "food",
-            "Transportation": "transportation"
-        }
-        logger.info(f"Available topic mapping: {list(category_map.keys())}")
+        eng_category = vocab_index.category_key(category)
         
-        if category in category_map:
-            eng_category = category_map[category]
+        if eng_category:
             logger.info(f"Topic mapping successful: {category} -> {eng_category}")
             
-            # 檢查 thai_data 是否包含該類別
-            if eng_category in thai_data['categories']:
-                logger.info(f"Found category {eng_category}in thai_data")
+            # 檢查詞彙索引是否包含該類別
+            if vocab_index.category_ids[eng_category]:
                 # 初始化遊戲
-                cards = game.initialize_game(eng_category)
+                cards = game.initialize_game(eng_category, pairs=NORMAL_MODE_PAIRS)
                 
                 # 創建遊戲畫面 (使用 Flex Message)
                 return create_flex_memory_game(cards, game.get_game_state(), user_id)
             else:
-                logger.error(f"Category '{eng_category}' not found in thai_data")
+                logger.error(f"Category '{eng_category}' has no vocabulary")
                 return TextSendMessage(text=f"Sorry, the category '{category}' was not found in the data. Please contact the administrator.")
         else:
             logger.warning(f"Unrecognized topic: {category}")
@@ -2585,9 +2427,7 @@ def handle_memory_game(user_id, message):
             
             # 儲存臨時數據用於訪問遊戲結果
             temp_data = user_data_manager.get_user_data('temp')
-            if 'game_state' not in temp_data:
-                temp_data['game_state'] = {}
-            temp_data['game_state']['memory_game'] = game
+            temp_data.game_state['memory_game'] = game
             
             # 準備回應訊息
             messages = []
@@ -2606,7 +2446,7 @@ def handle_memory_game(user_id, message):
                 )
             
             # 如果遊戲還在進行中且沒有超時
-            if game_state and not game_state.get('is_completed', False) and not game_state.get('is_timeout', False):
+            if game_state and not game_state.is_completed and not game_state.is_timeout:
                 # 返回更新後的遊戲畫面
                 messages.append(create_flex_memory_game(game.cards, game_state, user_id))
                 return messages
@@ -2630,16 +2470,16 @@ def handle_memory_game(user_id, message):
     
     elif message.startswith("Play Audio:"):
         word = message.split(":", 1)[1] if ":" in message else ""
-        if word in thai_data['basic_words']:
-            word_data = thai_data['basic_words'][word]
-            if 'audio_url' in word_data and word_data['audio_url']:
+        word_id = vocab_index.id_of(word)
+        if word_id is not None:
+            if vocab_index.audio_url[word_id]:
                 # 獲取遊戲狀態
                 game_state = game.get_game_state()
                 
                 # 發送音頻後顯示遊戲畫面
                 messages = [
                     AudioSendMessage(
-                        original_content_url=word_data['audio_url'],
+                        original_content_url=vocab_index.audio_url[word_id],
                         duration=3000  # 假設音訊長度為3秒
                     ),
                     create_flex_memory_game(game.cards, game_state, user_id)
@@ -2655,114 +2495,15 @@ def create_flex_memory_game(cards, game_state, user_id):
     """創建 Flex Message 的記憶翻牌遊戲界面"""
     from linebot.models import FlexSendMessage, TextSendMessage
 
-    bubbles = []
     try:
-        attempts = game_state.get('attempts', 0)
-        remaining_time = int(game_state.get('remaining_time', 0))
-        category_name = game_state.get('category_name', 'Unknown')
-        is_completed = game_state.get('is_completed', False)
-        is_timeout = game_state.get('is_timeout', False)
-
-        matched_ids = [c for pair in game_state.get('matched_pairs', []) for c in pair]
-        flipped_ids = game_state.get('flipped_cards', [])
-
-        # 遊戲資訊卡片
-        info_bubble = {
-            "type": "bubble",
-            "header": {
-                "type": "box",
-                "layout": "vertical",
-                "contents": [
-                    {"type": "text", "text": "Thai Memory Card Game", "weight": "bold", "size": "xl", "color": "#ffffff"},
-                    {"type": "text", "text": category_name, "size": "md", "color": "#ffffff"}
-                ],
-                "backgroundColor": "#4A86E8",
-                "paddingBottom": "10px"
-            },
-            "body": {
-                "type": "box",
-                "layout": "vertical",
-                "contents": [
-                    {
-                        "type": "box",
-                        "layout": "horizontal",
-                        "justifyContent":"center",
-                        "contents": [
-                            {"type": "text", "text": "⏱️Time Remaining:", "size": "sm", "color": "#555555", "flex": 2},
-                            {"type": "text", "text": f"{remaining_time} sec", "size": "sm", "color": "#111111", "flex": 1}
-                        ]
-                    }
-                ]
-            }
-        }
-        bubbles.append(info_bubble)
-
-        # 卡片行排列，每列最多 4 張卡
-        card_rows = [cards[i:i+4] for i in range(0, len(cards), 4)]
-        for row_cards in card_rows:
-            card_contents = []
-            for card in row_cards:
-                card_id = card['id']
-                is_matched = card_id in matched_ids
-                is_flipped = card_id in flipped_ids
-
-                if is_matched or is_flipped:
-                    if card['type'] == 'image':
-                        card_box = {
-                            "type": "box",
-                            "layout": "vertical",
-                            "width": "60px",
-                            "height": "80px",
-                            "backgroundColor": "#E6F5FF",
-                            "cornerRadius": "4px",
-                            "borderWidth": "1px",
-                            "borderColor": "#AAAAAA",
-                            "contents": [
-                                {"type": "image", "url": card['content'], "size": "full", "aspectMode": "cover", "aspectRatio": "1:1"},
-                                {"type": "text", "text": card['word'], "size": "xxs", "align": "center", "wrap": True, "maxLines": 2}
-                            ]
-                        }
-                    else:
-                        card_box = {
-                            "type": "box",
-                            "layout": "vertical",
-                            "width": "60px",
-                            "height": "80px",
-                            "backgroundColor": "#FFF4E6",
-                            "cornerRadius": "4px",
-                            "borderWidth": "1px",
-                            "borderColor": "#AAAAAA",
-                            "contents": [
-                                {"type": "text", "text": "🎵", "size": "lg", "align": "center", "color": "#FF6B6E"},
-                                {"type": "text", "text": card['thai'], "size": "xxs", "align": "center", "wrap": True, "maxLines": 2}
-                            ],
-                            "action": {"type": "message", "text": f"Play Audio:{card['word']}"}
-                        }
-                else:
-                    back_icon = "🖼️" if card['type'] == "image" else "🎧"
-                    back_color = "#4A86E8" if card['type'] == "image" else "#FFA94D"
-                    card_box = {
-                        "type": "box",
-                        "layout": "vertical",
-                        "width": "60px",
-                        "height": "80px",
-                        "backgroundColor": back_color,
-                        "cornerRadius": "4px",
-                        "borderWidth": "1px",
-                        "borderColor": "#0B5ED7",
-                        "contents": [
-                            {"type": "text", "text": back_icon, "color": "#FFFFFF", "align": "center", "gravity": "center", "size": "xl"},
-                            {"type": "text", "text": f"{card_id}", "color": "#FFFFFF", "align": "center", "size": "sm"}
-                        ],
-                        "action": {"type": "message", "text": f"Flip Card:{card_id}"}
-                    }
-
-                card_contents.append(card_box)
-
-            row_bubble = {"type": "bubble", "body": {"type": "box", "layout": "horizontal", "contents": card_contents}}
-            bubbles.append(row_bubble)
-
-        flex_message = {"type": "carousel", "contents": bubbles}
+        with timed("memory_board_render"):
+            # 翻開與已配對的卡片都顯示正面
+            flex_message = render_board(
+                cards,
+                game_state.face_up,
+                game_state.category_name or 'Unknown',
+                int(game_state.remaining_time)
+            )
         return FlexSendMessage(alt_text="Thai Memory Card Game", contents=flex_message)
 
     except Exception as e:
@@ -2951,41 +2692,36 @@ import threading
 import time  # ✅ 加上這行
 
 # 定期清理臨時檔案函式
-def cleanup_temp_files():
-    """清理臨時檔案"""
-    try:
-        temp_dir = os.environ.get('TEMP', '/tmp')
-        audio_dir = os.path.join(temp_dir, 'temp_audio')
-        
-        if not os.path.exists(audio_dir):
-            return
-            
-        now = datetime.now()
-        for filename in os.listdir(audio_dir):
-            if not filename.startswith('temp_'):
-                continue
-                
-            file_path = os.path.join(audio_dir, filename)
-            if os.path.isfile(file_path):
-                mtime = datetime.fromtimestamp(os.path.getmtime(file_path))
-                if (now - mtime).total_seconds() > 3600:
-                    try:
-                        os.remove(file_path)
-                        logger.info(f"Cleaned up temporary file: {file_path}")
-                    except:
-                        pass
-    except Exception as e:
-        logger.error(f"Failed to clean up temporary files: {str(e)}")
-
-# 背景執行清理：每 30 分鐘跑一次
-def periodic_cleanup():
-    while True:
-        time.sleep(1800)  # 每 30 分鐘執行
-        cleanup_temp_files()
-
-# 啟動執行緒
-cleanup_thread = threading.Thread(target=periodic_cleanup, daemon=True)
-cleanup_thread.start()
+# 維護工作：暫存音檔依索引過期；leader 每 6 小時完整掃描一次，清除已結束 worker 遺留的檔案
+scheduler.register("temp_audio_expiry", 300, temp_audio.expire)
+scheduler.register("temp_audio_sweep", 6 * 3600, temp_audio.sweep, leader_only=True)
+
+# 連續學習提醒（設定 STREAK_REMINDER_HOUR 時啟用）：leader 每 10 分鐘檢查，
+# 到達指定時刻後執行一次；當天已完成時工作的進度紀錄會直接返回
+STREAK_REMINDER_HOUR = os.environ.get('STREAK_REMINDER_HOUR')
+if STREAK_REMINDER_HOUR:
+    from reminders import StreakReminderJob
+
+    def send_streak_reminders():
+        if datetime.now().hour >= int(STREAK_REMINDER_HOUR):
+            StreakReminderJob(
+                user_data_manager.store,
+                line_bot_api,
+                rate=float(os.environ.get('REMINDER_RATE', 5)),
+                min_streak=int(os.environ.get('REMINDER_MIN_STREAK', 1))
+            ).run()
+
+    scheduler.register("streak_reminders", 600, send_streak_reminders, leader_only=True)
+
+scheduler.start()
+
+# 暖機：worker 開始接受請求後，在背景建立各雲端用戶端（WARM_UP=0 停用，或列出要暖機的項目）
+WARM_UP = os.environ.get('WARM_UP', 'firestore,gcs,google_speech,azure_speech')
+if WARM_UP != '0':
+    warm_up(
+        [name.strip() for name in WARM_UP.split(',') if name.strip()],
+        delay=float(os.environ.get('WARM_UP_DELAY', 1.0))
+    )
 
     # 主程序入口 (放在最後)
 if __name__ == "__main__":
@@ -0,0 +1,211 @@
+# === user_store.py - 使用者狀態的持久化儲存 ===
+# UserData 只在記憶體中保留活躍使用者；其餘使用者的狀態存放在 Firestore（users/{id} 文件欄位）
+# 或本地執行時的 SQLite，第一次存取時才載入。
+# 兩種後端都能依 last_active 日期查詢使用者（連續學習提醒用），並保存排程工作的進度。
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+
+from metrics import counter, timed
+
+logger = logging.getLogger(__name__)
+
+user_store_writes = counter(
+    "user_store_fields_written_total",
+    "User state fields written back to the durable store",
+    label_names=("outcome",),
+)
+
+FIRESTORE_BATCH_LIMIT = 500
+AT_RISK_PAGE_SIZE = 500
+
+# 需要持久化的欄位；game_state 保存的是遊戲物件，只存在於記憶體中
+PERSISTED_FIELDS = (
+    'score', 'current_activity', 'current_vocab', 'current_category',
+    'vocab_mastery', 'learning_progress', 'last_active', 'streak',
+)
+
+
+def serialize_fields(data):
+    """將持久化欄位序列化，用於比對哪些欄位已變更"""
+    return {field: json.dumps(getattr(data, field, None), sort_keys=True, ensure_ascii=False) for field in PERSISTED_FIELDS}
+
+
+def field_digests(serialized):
+    """序列化欄位的雜湊；常駐使用者只保留雜湊比對變更，不保留整份 JSON 副本"""
+    return {field: hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest() for field, text in serialized.items()}
+
+
+class FirestoreUserStore:
+    """將使用者狀態存放在 users/{id} 文件的欄位中"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def load(self, user_id):
+        with timed("firestore_user_load"):
+            snap = self.db.collection("users").document(user_id).get()
+        if not snap.exists:
+            return None
+        data = snap.to_dict() or {}
+        return {field: data[field] for field in PERSISTED_FIELDS if field in data}
+
+    async def load_async(self, async_db, user_id):
+        """以 firestore.AsyncClient 載入（ASGI 模式，不佔用執行緒）"""
+        with timed("firestore_user_load"):
+            snap = await async_db.collection("users").document(user_id).get()
+        if not snap.exists:
+            return None
+        data = snap.to_dict() or {}
+        return {field: data[field] for field in PERSISTED_FIELDS if field in data}
+
+    def save(self, changes):
+        """changes: {user_id: {field: value}}；只覆寫有變更的欄位"""
+        batch, ops = self.db.batch(), 0
+        for user_id, fields in changes.items():
+            if ops >= FIRESTORE_BATCH_LIMIT:
+                batch.commit()
+                batch, ops = self.db.batch(), 0
+            ref = self.db.collection("users").document(user_id)
+            # merge 指定欄位路徑：整個欄位被取代（字典中刪除的鍵也會一併移除）
+            batch.set(ref, fields, merge=list(fields))
+            ops += 1
+        if ops:
+            batch.commit()
+
+    def at_risk(self, last_active, min_streak=1, after=None, page_size=AT_RISK_PAGE_SIZE):
+        """逐頁產生 last_active 為指定日期且 streak >= min_streak 的使用者 (user_id, streak)，依 user_id 排序。
+
+        使用 Firestore 自動建立的 last_active 單欄位索引；只讀取 streak 欄位並在用戶端過濾，避免需要複合索引。
+        """
+        users = self.db.collection("users")
+        query = users.where("last_active", "==", last_active).order_by("__name__").select(["streak"]).limit(page_size)
+        while True:
+            page = query.start_after({"__name__": users.document(after)}) if after else query
+            with timed("firestore_at_risk_query"):
+                snaps = list(page.stream())
+            for snap in snaps:
+                streak = (snap.to_dict() or {}).get("streak") or 0
+                if streak >= min_streak:
+                    yield snap.id, streak
+            if len(snaps) < page_size:
+                return
+            after = snaps[-1].id
+
+    def load_checkpoint(self, job_id):
+        snap = self.db.collection("jobs").document(job_id).get()
+        return snap.to_dict() if snap.exists else None
+
+    def save_checkpoint(self, job_id, state):
+        self.db.collection("jobs").document(job_id).set(state)
+
+
+class SQLiteUserStore:
+    """本地開發用：每個欄位一列，只更新有變更的欄位"""
+
+    def __init__(self, path="user_data.db"):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS user_fields ("
+                "user_id TEXT NOT NULL, field TEXT NOT NULL, value TEXT, "
+                "PRIMARY KEY (user_id, field))"
+            )
+            # 依最後活躍日期查詢使用者的次要索引（由 save 維護）
+            created = not self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_activity'"
+            ).fetchone()
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS user_activity ("
+                "user_id TEXT PRIMARY KEY, last_active TEXT, streak INTEGER NOT NULL DEFAULT 0)"
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS user_activity_by_date ON user_activity (last_active, user_id)"
+            )
+            if created:
+                self.conn.execute(
+                    "INSERT INTO user_activity (user_id, last_active, streak) "
+                    "SELECT user_id, "
+                    "json_extract(MAX(CASE WHEN field = 'last_active' THEN value END), '$'), "
+                    "COALESCE(json_extract(MAX(CASE WHEN field = 'streak' THEN value END), '$'), 0) "
+                    "FROM user_fields GROUP BY user_id"
+                )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_checkpoints (job_id TEXT PRIMARY KEY, state TEXT NOT NULL)"
+            )
+
+    def load(self, user_id):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT field, value FROM user_fields WHERE user_id = ?", (user_id,)
+            ).fetchall()
+        if not rows:
+            return None
+        return {field: json.loads(value) for field, value in rows}
+
+    def save(self, changes):
+        rows = [
+            (user_id, field, json.dumps(value, ensure_ascii=False))
+            for user_id, fields in changes.items()
+            for field, value in fields.items()
+        ]
+        activity = [
+            (user_id, fields.get('last_active'), fields.get('streak'))
+            for user_id, fields in changes.items()
+            if 'last_active' in fields or 'streak' in fields
+        ]
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO user_fields (user_id, field, value) VALUES (?, ?, ?) "
+                "ON CONFLICT(user_id, field) DO UPDATE SET value = excluded.value",
+                rows
+            )
+            self.conn.executemany(
+                "INSERT INTO user_activity (user_id, last_active, streak) VALUES (?1, ?2, COALESCE(?3, 0)) "
+                "ON CONFLICT(user_id) DO UPDATE SET "
+                "last_active = COALESCE(?2, last_active), streak = COALESCE(?3, streak)",
+                activity
+            )
+
+    def at_risk(self, last_active, min_streak=1, after=None, page_size=AT_RISK_PAGE_SIZE):
+        """逐頁產生 last_active 為指定日期且 streak >= min_streak 的使用者 (user_id, streak)，依 user_id 排序"""
+        while True:
+            with self.lock:
+                rows = self.conn.execute(
+                    "SELECT user_id, streak FROM user_activity "
+                    "WHERE last_active = ? AND streak >= ? AND user_id > ? ORDER BY user_id LIMIT ?",
+                    (last_active, min_streak, after or "", page_size)
+                ).fetchall()
+            yield from rows
+            if len(rows) < page_size:
+                return
+            after = rows[-1][0]
+
+    def load_checkpoint(self, job_id):
+        with self.lock:
+            row = self.conn.execute("SELECT state FROM job_checkpoints WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_checkpoint(self, job_id, state):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO job_checkpoints (job_id, state) VALUES (?, ?) "
+                "ON CONFLICT(job_id) DO UPDATE SET state = excluded.state",
+                (job_id, json.dumps(state))
+            )
+
+
+def create_user_store(db=None):
+    """依 USER_STORE 環境變數選擇後端：firestore（預設）或 sqlite"""
+    import os
+
+    kind = os.environ.get('USER_STORE', 'firestore' if db is not None else 'sqlite')
+    if kind == 'sqlite':
+        path = os.environ.get('USER_STORE_PATH', 'user_data.db')
+        logger.info(f"Using SQLite user store at {path}")
+        return SQLiteUserStore(path)
+    logger.info("Using Firestore user store")
+    return FirestoreUserStore(db)
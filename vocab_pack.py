@@ -0,0 +1,333 @@
+# === vocab_pack.py - 版本化詞彙包 ===
+# 詞彙內容存放在 vocab/pack.json（可編輯的原始檔），可再編譯為 vocab/pack.bin 供 mmap 載入。
+#
+#   python vocab_pack.py seal vocab/pack.json                  # 編輯後重新計算校驗碼
+#   python vocab_pack.py compile vocab/pack.json vocab/pack.bin
+#   python vocab_pack.py verify vocab/pack.bin
+#
+# 網址拆成「共用前綴編號 + 檔名」儲存；二進位格式中所有字串放在同一個去重後的字串表，
+# 網址欄位在讀取時才從 mmap 解碼。兩種格式都帶有 SHA-256 校驗碼，載入時驗證。
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+
+from metrics import counter
+from vocabulary import VocabularyIndex
+
+logger = logging.getLogger(__name__)
+
+vocab_reloads = counter(
+    "vocab_pack_reloads_total",
+    "Vocabulary pack reload attempts",
+    label_names=("outcome",),
+)
+
+PACK_FORMAT = 1
+MAGIC = b"TLVP"
+HEADER = struct.Struct("<4sHHI32s")  # magic, format, flags, payload 長度, payload 的 SHA-256
+NONE = 0xFFFFFFFF
+STRING_COLUMNS = ("english", "thai", "pronunciation", "tone")
+URL_COLUMNS = ("image", "audio")
+EXTRA_KEYS = ("tone_guide", "tone_examples", "daily_lessons")
+
+PACK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "vocab")
+
+
+class VocabPackError(Exception):
+    """詞彙包格式錯誤或校驗失敗"""
+
+
+# === JSON 原始檔 ===
+def split_url(url, prefixes, prefix_ids):
+    """將網址拆為 [前綴編號, 檔名]，前綴加入共用清單"""
+    if url is None:
+        return None
+    prefix, _, name = url.rpartition("/")
+    prefix += "/"
+    if prefix not in prefix_ids:
+        prefix_ids[prefix] = len(prefixes)
+        prefixes.append(prefix)
+    return [prefix_ids[prefix], name]
+
+
+def pack_checksum(pack):
+    content = {k: v for k, v in pack.items() if k != "checksum"}
+    canonical = json.dumps(content, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def seal_pack(pack):
+    pack["checksum"] = pack_checksum(pack)
+    return pack
+
+
+def pack_from_thai_data(thai_data, version):
+    """由 thai_data 字典格式建立詞彙包"""
+    prefixes, prefix_ids = [], {}
+    words = list(thai_data["basic_words"])
+    position = {word: i for i, word in enumerate(words)}
+    pack = {
+        "format": PACK_FORMAT,
+        "version": version,
+        "url_prefixes": prefixes,
+        "words": [
+            {
+                "english": word,
+                "thai": entry["thai"],
+                "pronunciation": entry.get("pronunciation"),
+                "tone": entry.get("tone"),
+                "image": split_url(entry.get("image_url"), prefixes, prefix_ids),
+                "audio": split_url(entry.get("audio_url"), prefixes, prefix_ids),
+            }
+            for word, entry in ((w, thai_data["basic_words"][w]) for w in words)
+        ],
+        "categories": [
+            {"key": key, "name": category["name"], "words": [position[w] for w in category["words"] if w in position]}
+            for key, category in thai_data.get("categories", {}).items()
+        ],
+    }
+    for key in EXTRA_KEYS:
+        if key in thai_data:
+            pack[key] = thai_data[key]
+    return seal_pack(pack)
+
+
+def load_pack_json(path):
+    with open(path, encoding="utf-8") as f:
+        pack = json.load(f)
+    if pack.get("format") != PACK_FORMAT:
+        raise VocabPackError(f"Unsupported pack format {pack.get('format')!r} in {path}")
+    if pack.get("checksum") != pack_checksum(pack):
+        raise VocabPackError(f"Checksum mismatch in {path}; run 'python vocab_pack.py seal {path}' after editing")
+    return pack
+
+
+def index_from_pack(pack):
+    prefixes = pack["url_prefixes"]
+
+    def url(value):
+        return prefixes[value[0]] + value[1] if value else None
+
+    words = pack["words"]
+    fields = {
+        "thai": tuple(w["thai"] for w in words),
+        "pronunciation": tuple(w.get("pronunciation") for w in words),
+        "tone": tuple(w.get("tone") for w in words),
+        "image_url": tuple(url(w.get("image")) for w in words),
+        "audio_url": tuple(url(w.get("audio")) for w in words),
+    }
+    categories = [(c["key"], c["name"], c["words"]) for c in pack["categories"]]
+    extras = {key: pack[key] for key in EXTRA_KEYS if key in pack}
+    return VocabularyIndex((w["english"] for w in words), fields, categories, extras, pack["version"])
+
+
+# === 二進位格式 ===
+def compile_pack(pack, path):
+    """將詞彙包編譯為二進位檔；先寫入暫存檔再取代，已 mmap 的舊檔不受影響"""
+    strings, string_ids = [], {}
+
+    def intern(value):
+        if value is None:
+            return NONE
+        if value not in string_ids:
+            string_ids[value] = len(strings)
+            strings.append(value)
+        return string_ids[value]
+
+    words = pack["words"]
+    columns = {name: [intern(w.get(name)) for w in words] for name in STRING_COLUMNS}
+    for name in URL_COLUMNS:
+        columns[name + "_prefix"] = [w[name][0] if w.get(name) else NONE for w in words]
+        columns[name + "_suffix"] = [intern(w[name][1]) if w.get(name) else NONE for w in words]
+
+    meta = {key: pack[key] for key in ("version", "url_prefixes", "categories") + EXTRA_KEYS if key in pack}
+    meta.update(word_count=len(words), string_count=len(strings), columns=list(columns))
+    meta_bytes = json.dumps(meta, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    meta_bytes += b" " * (-len(meta_bytes) % 4)  # 對齊 4 bytes，讓之後的陣列可直接 cast
+
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = [0]
+    for data in encoded:
+        offsets.append(offsets[-1] + len(data))
+
+    payload = b"".join([
+        struct.pack("<I", len(meta_bytes)), meta_bytes,
+        struct.pack(f"<{len(offsets)}I", *offsets),
+        *(struct.pack(f"<{len(words)}I", *values) for values in columns.values()),
+        b"".join(encoded),
+    ])
+    header = HEADER.pack(MAGIC, PACK_FORMAT, 0, len(payload), hashlib.sha256(payload).digest())
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+
+class UrlColumn:
+    """以 ID 索引的網址序列，讀取時才從 mmap 解碼"""
+
+    __slots__ = ("pack", "prefixes", "suffixes")
+
+    def __init__(self, pack, prefixes, suffixes):
+        self.pack = pack
+        self.prefixes = prefixes
+        self.suffixes = suffixes
+
+    def __len__(self):
+        return len(self.suffixes)
+
+    def __getitem__(self, word_id):
+        suffix = self.suffixes[word_id]
+        if suffix == NONE:
+            return None
+        return self.pack.url_prefixes[self.prefixes[word_id]] + self.pack.string(suffix)
+
+
+class MappedPack:
+    """以 mmap 開啟的二進位詞彙包"""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self.buffer)
+        if len(view) < HEADER.size:
+            raise VocabPackError(f"{path} is too short to be a vocabulary pack")
+        magic, pack_format, _, payload_length, digest = HEADER.unpack_from(view)
+        if magic != MAGIC or pack_format != PACK_FORMAT:
+            raise VocabPackError(f"{path} is not a format {PACK_FORMAT} vocabulary pack")
+        payload = view[HEADER.size:HEADER.size + payload_length]
+        if len(payload) != payload_length or hashlib.sha256(payload).digest() != digest:
+            raise VocabPackError(f"Checksum mismatch in {path}")
+
+        (meta_length,) = struct.unpack_from("<I", payload)
+        self.meta = json.loads(bytes(payload[4:4 + meta_length]))
+        self.url_prefixes = self.meta["url_prefixes"]
+        word_count, string_count = self.meta["word_count"], self.meta["string_count"]
+
+        position = 4 + meta_length
+        self.offsets = payload[position:position + 4 * (string_count + 1)].cast("I")
+        position += 4 * (string_count + 1)
+        self.columns = {}
+        for name in self.meta["columns"]:
+            self.columns[name] = payload[position:position + 4 * word_count].cast("I")
+            position += 4 * word_count
+        self.blob = payload[position:]
+
+    def string(self, string_id):
+        if string_id == NONE:
+            return None
+        return str(self.blob[self.offsets[string_id]:self.offsets[string_id + 1]], "utf-8")
+
+    def to_index(self):
+        strings = {name: tuple(self.string(i) for i in self.columns[name]) for name in STRING_COLUMNS}
+        fields = {
+            "thai": strings["thai"],
+            "pronunciation": strings["pronunciation"],
+            "tone": strings["tone"],
+            "image_url": UrlColumn(self, self.columns["image_prefix"], self.columns["image_suffix"]),
+            "audio_url": UrlColumn(self, self.columns["audio_prefix"], self.columns["audio_suffix"]),
+        }
+        categories = [(c["key"], c["name"], c["words"]) for c in self.meta["categories"]]
+        extras = {key: self.meta[key] for key in EXTRA_KEYS if key in self.meta}
+        return VocabularyIndex(strings["english"], fields, categories, extras, self.meta["version"])
+
+
+# === 載入與熱重載 ===
+def default_pack_path():
+    """VOCAB_PACK 環境變數，否則優先使用已編譯的 vocab/pack.bin"""
+    path = os.environ.get("VOCAB_PACK")
+    if path:
+        return path
+    compiled = os.path.join(PACK_DIR, "pack.bin")
+    return compiled if os.path.exists(compiled) else os.path.join(PACK_DIR, "pack.json")
+
+
+def load_vocabulary(path):
+    if path.endswith(".bin"):
+        return MappedPack(path).to_index()
+    return index_from_pack(load_pack_json(path))
+
+
+class VocabularyStore:
+    """保存目前的詞彙索引；檔案變更時在背景重新載入，驗證失敗則保留舊版本"""
+
+    def __init__(self, path=None, reload_interval=0, on_reload=None, preloaded=None):
+        """preloaded: master 預先載入的 (path, mtime, index)；檔案未變更時直接沿用（見 preload.py）"""
+        self.path = path or default_pack_path()
+        self.on_reload = on_reload
+        self.lock = threading.Lock()
+        self.mtime = os.stat(self.path).st_mtime_ns
+        if preloaded and preloaded[:2] == (self.path, self.mtime):
+            self.index = preloaded[2]
+        else:
+            self.index = load_vocabulary(self.path)
+        self.loaded_at = time.time()
+        logger.info(f"Loaded vocabulary pack {self.index.version} ({len(self.index)} words) from {self.path}")
+        if reload_interval:
+            self.reload_interval = reload_interval
+            threading.Thread(target=self._run, daemon=True).start()
+
+    def reload(self, force=False):
+        """檔案有變更（或 force）時重新載入；回傳是否已切換到新版本"""
+        with self.lock:
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+                if mtime == self.mtime and not force:
+                    return False
+                index = load_vocabulary(self.path)
+            except (OSError, ValueError, KeyError, VocabPackError) as e:
+                logger.error(f"❌ Vocabulary pack reload failed, keeping version {self.index.version}: {e}")
+                vocab_reloads.inc(outcome="error")
+                return False
+            self.mtime = mtime
+            self.index = index
+            self.loaded_at = time.time()
+        vocab_reloads.inc(outcome="ok")
+        logger.info(f"✅ Reloaded vocabulary pack {index.version} ({len(index)} words)")
+        if self.on_reload:
+            self.on_reload(index)
+        return True
+
+    def _run(self):
+        while True:
+            time.sleep(self.reload_interval)
+            self.reload()
+
+    def status(self):
+        return {
+            "path": self.path,
+            "version": self.index.version,
+            "words": len(self.index),
+            "loaded_at": self.loaded_at,
+        }
+
+
+if __name__ == "__main__":
+    import sys
+
+    command, *paths = sys.argv[1:] or ["help"]
+    if command == "seal":
+        with open(paths[0], encoding="utf-8") as f:
+            pack = seal_pack(json.load(f))
+        with open(paths[0], "w", encoding="utf-8") as f:
+            json.dump(pack, f, ensure_ascii=False, indent=1)
+            f.write("\n")
+        print(f"Sealed {paths[0]} (version {pack['version']})")
+    elif command == "compile":
+        source = paths[0]
+        target = paths[1] if len(paths) > 1 else os.path.splitext(source)[0] + ".bin"
+        compile_pack(load_pack_json(source), target)
+        print(f"Compiled {source} -> {target}")
+    elif command == "verify":
+        index = load_vocabulary(paths[0])
+        print(f"{paths[0]}: version {index.version}, {len(index)} words, {len(index.category_ids)} categories")
+    else:
+        print("usage: python vocab_pack.py seal|compile|verify PATH [OUTPUT]")
+        sys.exit(1)
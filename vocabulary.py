@@ -0,0 +1,131 @@
+# === vocabulary.py - 啟動時建立一次的不可變詞彙索引 ===
+# 每個詞彙有一個整數 ID（即在 words 中的位置），其餘欄位皆為以 ID 索引的 tuple；
+# 分類以 ID 陣列表示，英文 / 泰文查詢皆為雜湊表，不需再掃描 basic_words。
+import unicodedata
+from array import array
+from types import MappingProxyType
+
+# 泰文輸入中常見的零寬字元
+_ZERO_WIDTH = dict.fromkeys(map(ord, "\u200b\u200c\u200d\ufeff"))
+
+
+def normalize_thai(text):
+    """NFC 正規化並移除空白與零寬字元"""
+    return "".join(unicodedata.normalize("NFC", text).translate(_ZERO_WIDTH).split())
+
+
+def normalize_english(text):
+    """不分大小寫並合併多餘空白"""
+    return " ".join(text.casefold().split())
+
+
+class VocabularyIndex:
+    """唯讀詞彙索引（由詞彙包或 thai_data 建立）"""
+
+    __slots__ = (
+        'version', 'words', 'thai', 'pronunciation', 'tone', 'image_url', 'audio_url',
+        'normalized_english', 'normalized_thai',
+        'by_english', 'by_thai', 'by_normalized_english', 'by_normalized_thai',
+        'category_ids', 'category_words', 'category_names', 'category_by_name', 'categories_by_word',
+        'category_positions',
+        'tone_guide', 'tone_examples', 'daily_lessons',
+    )
+
+    def __init__(self, words, fields, categories, extras=None, version=None):
+        """words: 英文詞彙序列（位置即 ID）；fields: 欄位名稱 -> 以 ID 索引的序列；
+        categories: [(分類鍵, 顯示名稱, [ID, ...]), ...]；extras: tone_guide 等非詞彙內容
+        """
+        words = tuple(words)
+        extras = extras or {}
+        self._set('version', version)
+        self._set('words', words)
+        for field in ('thai', 'pronunciation', 'tone', 'image_url', 'audio_url'):
+            self._set(field, fields[field])
+        self._set('normalized_english', tuple(normalize_english(word) for word in words))
+        self._set('normalized_thai', tuple(normalize_thai(thai) for thai in self.thai))
+
+        self._set('by_english', MappingProxyType({word: i for i, word in enumerate(words)}))
+        self._set('by_thai', MappingProxyType({thai: i for i, thai in reversed(list(enumerate(self.thai)))}))
+        self._set('by_normalized_english', MappingProxyType(
+            {norm: i for i, norm in reversed(list(enumerate(self.normalized_english)))}))
+        self._set('by_normalized_thai', MappingProxyType(
+            {norm: i for i, norm in reversed(list(enumerate(self.normalized_thai)))}))
+
+        category_ids, category_words, category_names, category_by_name, by_word = {}, {}, {}, {}, {}
+        category_positions = {}
+        for key, name, ids in categories:
+            ids = array('I', ids)
+            category_ids[key] = ids
+            category_words[key] = tuple(words[i] for i in ids)
+            category_positions[key] = MappingProxyType({words[i]: pos for pos, i in reversed(list(enumerate(ids)))})
+            category_names[key] = name
+            category_by_name[name] = key
+            for i in ids:
+                by_word.setdefault(words[i], []).append(key)
+        self._set('category_ids', MappingProxyType(category_ids))
+        self._set('category_words', MappingProxyType(category_words))
+        self._set('category_names', MappingProxyType(category_names))
+        self._set('category_by_name', MappingProxyType(category_by_name))
+        self._set('categories_by_word', MappingProxyType({word: tuple(keys) for word, keys in by_word.items()}))
+        # 詞彙在各分類 category_words 中的位置（複習佇列索引未練習的詞用）
+        self._set('category_positions', MappingProxyType(category_positions))
+
+        self._set('tone_guide', MappingProxyType(dict(extras.get('tone_guide', {}))))
+        self._set('tone_examples', tuple(extras.get('tone_examples', ())))
+        self._set('daily_lessons', tuple(extras.get('daily_lessons', ())))
+
+    @classmethod
+    def from_thai_data(cls, thai_data, version=None):
+        """由舊版 thai_data 字典格式建立索引"""
+        basic_words = thai_data['basic_words']
+        words = tuple(basic_words)
+        fields = {
+            field: tuple(basic_words[word].get(field) for word in words)
+            for field in ('thai', 'pronunciation', 'tone', 'image_url', 'audio_url')
+        }
+        position = {word: i for i, word in enumerate(words)}
+        categories = [
+            (key, category['name'], [position[word] for word in category['words'] if word in position])
+            for key, category in thai_data.get('categories', {}).items()
+        ]
+        extras = {key: thai_data[key] for key in ('tone_guide', 'tone_examples', 'daily_lessons') if key in thai_data}
+        return cls(words, fields, categories, extras, version)
+
+    def _set(self, name, value):
+        object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("VocabularyIndex is immutable")
+
+    def __len__(self):
+        return len(self.words)
+
+    def id_of(self, word):
+        """英文詞彙（不分大小寫）的 ID；找不到時回傳 None"""
+        if word is None:
+            return None
+        word_id = self.by_english.get(word)
+        if word_id is None:
+            word_id = self.by_normalized_english.get(normalize_english(word))
+        return word_id
+
+    def find_thai(self, text):
+        """泰文文字對應的 ID；找不到時回傳 None"""
+        if text is None:
+            return None
+        word_id = self.by_thai.get(text)
+        if word_id is None:
+            word_id = self.by_normalized_thai.get(normalize_thai(text))
+        return word_id
+
+    def category_key(self, name):
+        """分類顯示名稱（如 "Daily Phrases"）或分類鍵 -> 分類鍵"""
+        if name in self.category_ids:
+            return name
+        return self.category_by_name.get(name)
+
+    def ids(self, category=None):
+        """分類的 ID 陣列；未指定分類時為全部 ID"""
+        if category:
+            return self.category_ids[category]
+        return range(len(self.words))